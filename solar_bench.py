@@ -0,0 +1,406 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Замеры скорости ядра модели и сравнение с сохранённым эталоном.
+
+Команда run замеряет calculate_force, move_space_object и recalculate_space_objects_positions
+со всеми способами вычисления сил и интеграторами на прилагаемых системах тел,
+а также синтетические диски из 10–10⁵ тел. Для каждого замера сохраняются шаги в секунду,
+вычисления сил в секунду, пиковый объём памяти, выделенной за шаг, и уход полной энергии.
+Результаты пишутся в JSON вместе со сведениями о машине.
+
+Команда startup замеряет время холодного запуска: новый интерпретатор импортирует модули,
+читает систему тел и делает шаг расчёта. Эти же замеры входят в результаты run.
+
+Команда compare сравнивает два файла результатов и отмечает замедления и рост памяти
+больше допустимого; при найденных ухудшениях возвращает код 1.
+
+Пример:
+
+    python solar_bench.py run --output baseline.json
+    python solar_bench.py run --output current.json
+    python solar_bench.py compare baseline.json current.json --threshold 0.1
+    python solar_bench.py startup
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+import solar_input
+import solar_model as model
+import solar_diagnostics
+from solar_objects import SpaceObjects
+
+scenarios = ("solar_system.txt", "double_star.txt", "one_satellite.txt", "one_oval_satellite.txt")
+"""Прилагаемые системы тел"""
+
+synthetic_sizes = (10, 100, 1000, 10000, 100000)
+"""Число тел синтетических дисков"""
+
+pair_limits = {"direct": 2E6, "numpy": 1E9, "parallel": 1E9}
+"""Наибольшее число парных взаимодействий за вычисление сил, при котором прямые способы ещё замеряются;
+способы, которых здесь нет (Барнс — Хат), замеряются при любом числе тел"""
+
+startup_commands = {
+    "python": "pass",
+    "numpy": "import numpy",
+    "parse": "import solar_input; solar_input.read_space_objects_data_from_file({scenario!r})",
+    "headless_step": "import solar_headless; solar_headless.run(solar_headless.parse_arguments([{scenario!r}, "
+                     "'--steps', '1', '--engine', 'numpy']))",
+    "gui_import": "import solar_main",
+    "matplotlib": "import matplotlib.pyplot",
+}
+"""Замеры холодного запуска: название -> код для python -c. "python" и "numpy" — нижние границы,
+"matplotlib" — время, которое экономит отложенная загрузка графиков"""
+
+startup_repeats = 7
+"""Число запусков интерпретатора в одном замере холодного запуска; берётся медиана"""
+
+min_time = 1.0
+"""Наименьшее время одного замера, с"""
+
+max_steps = 1000
+"""Наибольшее число шагов одного замера"""
+
+
+def machine_info():
+    """Возвращает словарь со сведениями о машине, версиях и текущей правке кода."""
+    try:
+        revision = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                  cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        revision = ""
+    return {
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "engine_version": model.engine_version,
+        "revision": revision or None,
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def synthetic_system(n, seed=0):
+    """Создаёт хранилище с диском из **n** тел на круговых орбитах вокруг центрального тела."""
+    import solar_tree
+    x, y, m = solar_tree.random_disc(n, seed=seed)
+    r = np.hypot(x, y)
+    r[0] = 1.0
+    speed = np.sqrt(model.gravitational_constant * m[0] / r)
+    speed[0] = 0.0
+    store = SpaceObjects(capacity=max(16, n))
+    store.append_columns(["star"] + ["planet"] * (n - 1), ["red"] + ["white"] * (n - 1),
+                         m=m, x=x, y=y, Vx=-speed * y / r, Vy=speed * x / r, R=np.full(n, 1.0))
+    return store
+
+
+def total_energy(store, engine):
+    """Полная энергия системы; потенциал вычисляется тем же способом, что и силы."""
+    phi = model.acceleration_engines[engine](store.x, store.y, store.m, potential=True)[2]
+    return solar_diagnostics.conserved_quantities(store, phi)["energy"]
+
+
+def _timed(step, limit_steps=None):
+    """Выполняет **step** не меньше min_time секунд (но не больше max_steps раз).
+    Возвращает пару (число шагов, время)."""
+    limit_steps = limit_steps or max_steps
+    steps = 0
+    started = time.perf_counter()
+    elapsed = 0.0
+    while steps < limit_steps and (steps == 0 or elapsed < min_time):
+        step()
+        steps += 1
+        elapsed = time.perf_counter() - started
+    return steps, elapsed
+
+
+def _peak_memory(step):
+    """Пиковый объём памяти (в байтах), выделенной за один вызов **step**."""
+    tracemalloc.start()
+    try:
+        step()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_calculate_force(store):
+    """Замер calculate_force: силы для всех тел системы по одному телу."""
+
+    def step():
+        for body in store:
+            model.calculate_force(body, store)
+
+    steps, elapsed = _timed(step)
+    return {"steps": steps, "time": elapsed, "steps_per_second": steps / elapsed,
+            "force_evaluations_per_second": steps * len(store) / elapsed, "peak_memory": _peak_memory(step)}
+
+
+def bench_move_space_object(store, dt):
+    """Замер move_space_object: перемещение всех тел системы по одному телу."""
+    for body in store:
+        model.calculate_force(body, store)
+
+    def step():
+        for body in store:
+            model.move_space_object(body, dt, 0, store[0])
+
+    steps, elapsed = _timed(step)
+    return {"steps": steps, "time": elapsed, "steps_per_second": steps / elapsed, "peak_memory": _peak_memory(step)}
+
+
+def bench_recalculate(store, dt, engine, integrator):
+    """Замер recalculate_space_objects_positions с заданными способом вычисления сил и интегратором."""
+    state = model.IntegratorState()
+    initial_energy = total_energy(store, engine)
+    t = [0.0]
+
+    def step():
+        model.recalculate_space_objects_positions(store, dt, t[0], engine, integrator, state)
+        t[0] += dt
+
+    peak = _peak_memory(step)
+    evaluations = state.force_evaluations
+    steps, elapsed = _timed(step)
+    energy = total_energy(store, engine)
+    return {
+        "steps": steps,
+        "time": elapsed,
+        "steps_per_second": steps / elapsed,
+        "force_evaluations_per_second": (state.force_evaluations - evaluations) / elapsed,
+        "peak_memory": peak,
+        "energy_drift": abs(energy - initial_energy) / abs(initial_energy) if initial_energy else 0.0,
+    }
+
+
+def bench_startup(code, repeats=None):
+    """Замер холодного запуска: **repeats** раз запускает новый интерпретатор с кодом **code**
+    в каталоге модели и возвращает медиану и наименьшее время. Если код завершается с ошибкой
+    (например, не установлен matplotlib), замер пропускается.
+    """
+    repeats = repeats or startup_repeats
+    directory = os.path.dirname(os.path.abspath(__file__))
+    times = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        completed = subprocess.run([sys.executable, "-c", code], cwd=directory, stdout=subprocess.DEVNULL,
+                                   stderr=subprocess.PIPE, text=True)
+        times.append(time.perf_counter() - started)
+        if completed.returncode != 0:
+            lines = completed.stderr.strip().splitlines()
+            return {"skipped": lines[-1] if lines else "exit code %d" % completed.returncode}
+    return {"startup_time": statistics.median(times), "min_startup_time": min(times), "repeats": repeats}
+
+
+def run_startup(scenario="solar_system.txt", progress=None):
+    """Выполняет замеры холодного запуска из startup_commands и возвращает словарь {название: результат}.
+
+    Параметры:
+
+    **scenario** — система тел для замеров с чтением файла и шагом расчёта.
+    **progress** — функция, вызываемая с названием и результатом после каждого замера.
+    """
+    results = {}
+    for name, code in startup_commands.items():
+        results["startup/" + name] = bench_startup(code.format(scenario=scenario))
+        if progress is not None:
+            progress("startup/" + name, results["startup/" + name])
+    return results
+
+
+def skip_reason(engine, n):
+    """Возвращает причину пропуска замера способа **engine** на **n** телах или None."""
+    if n * n > pair_limits.get(engine, float("inf")):
+        return "%d bodies exceed pair limit of %s" % (n, engine)
+    return None
+
+
+def integrator_skip_reason(integrator, store):
+    """Возвращает причину пропуска замера интегратора **integrator** на системе тел **store** или None
+    (схема Уиздома — Холмана не считает системы без доминирующего тела)."""
+    if integrator == "wisdom_holman":
+        try:
+            model.dominant_body(store.m)
+        except ValueError as error:
+            return str(error)
+    return None
+
+
+def run_suite(engines, integrators, sizes, synthetic_integrators=("leapfrog",), dt=3600.0, synthetic_dt=3600.0,
+              progress=None):
+    """Выполняет все замеры и возвращает словарь {"machine": ..., "benchmarks": {название: результат}}.
+
+    Параметры:
+
+    **engines** — способы вычисления сил.
+    **integrators** — интеграторы для прилагаемых систем.
+    **sizes** — число тел синтетических дисков.
+    **synthetic_integrators** — интеграторы для синтетических дисков.
+    **dt**, **synthetic_dt** — шаги по времени для прилагаемых систем и дисков.
+    **progress** — функция, вызываемая с названием и результатом после каждого замера.
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    benchmarks = {}
+
+    def record(name, result):
+        benchmarks[name] = result
+        if progress is not None:
+            progress(name, result)
+
+    for scenario in scenarios:
+        path = os.path.join(directory, scenario)
+
+        def load():
+            return solar_input.read_space_objects_data_from_file(path)
+
+        record("calculate_force/%s" % scenario, bench_calculate_force(load()))
+        record("move_space_object/%s" % scenario, bench_move_space_object(load(), dt))
+        for engine in engines:
+            for integrator in integrators:
+                name = "recalculate/%s/%s/%s" % (scenario, engine, integrator)
+                store = load()
+                reason = integrator_skip_reason(integrator, store)
+                if reason is not None:
+                    record(name, {"skipped": reason})
+                    continue
+                record(name, bench_recalculate(store, dt, engine, integrator))
+    for name, result in run_startup(progress=progress).items():
+        benchmarks[name] = result
+    for n in sizes:
+        for engine in engines:
+            for integrator in synthetic_integrators:
+                name = "synthetic/%d/%s/%s" % (n, engine, integrator)
+                reason = skip_reason(engine, n)
+                store = None
+                if reason is None:
+                    store = synthetic_system(n)
+                    reason = integrator_skip_reason(integrator, store)
+                if reason is not None:
+                    record(name, {"skipped": reason})
+                    continue
+                record(name, bench_recalculate(store, synthetic_dt, engine, integrator))
+    return {"machine": machine_info(), "benchmarks": benchmarks}
+
+
+def compare(baseline, current, threshold=0.1):
+    """Сравнивает результаты замеров. Возвращает список словарей со сравнением каждого общего замера:
+    name, metric, baseline, current, change (относительное изменение) и regression.
+    Ухудшением считается падение шагов в секунду или рост пиковой памяти или времени запуска
+    больше чем на **threshold**.
+
+    Параметры:
+
+    **baseline**, **current** — результаты run_suite.
+    **threshold** — допустимое относительное изменение.
+    """
+    rows = []
+    for name, old in baseline["benchmarks"].items():
+        new = current["benchmarks"].get(name)
+        if new is None or "skipped" in old or "skipped" in new:
+            continue
+        for metric, worse in (("steps_per_second", -1), ("peak_memory", 1), ("startup_time", 1)):
+            if metric not in old or metric not in new or not old[metric]:
+                continue
+            change = (new[metric] - old[metric]) / old[metric]
+            rows.append({"name": name, "metric": metric, "baseline": old[metric], "current": new[metric],
+                         "change": change, "regression": change * worse > threshold})
+    return rows
+
+
+def _format_result(name, result):
+    if "skipped" in result:
+        return "%-60s skipped: %s" % (name, result["skipped"])
+    if "startup_time" in result:
+        return "%-60s %12.1f ms startup (min %.1f ms)" % (name, 1E3 * result["startup_time"],
+                                                          1E3 * result["min_startup_time"])
+    text = "%-60s %12.2f steps/s %12.0f B" % (name, result["steps_per_second"], result["peak_memory"])
+    if "energy_drift" in result:
+        text += "  dE/E %.2e" % result["energy_drift"]
+    return text
+
+
+def parse_arguments(argv=None):
+    """Разбирает аргументы командной строки.
+
+    Параметры:
+
+    **argv** — список аргументов (по умолчанию sys.argv[1:]).
+    """
+    parser = argparse.ArgumentParser(description="Замеры скорости модели и поиск ухудшений")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="выполнить замеры")
+    run.add_argument("--output", help="файл JSON для результатов")
+    run.add_argument("--engines", nargs="+", default=sorted(model.force_engines), choices=sorted(model.force_engines))
+    run.add_argument("--integrators", nargs="+", default=sorted(model.integrators), choices=sorted(model.integrators))
+    run.add_argument("--sizes", type=int, nargs="+", default=list(synthetic_sizes), help="число тел дисков")
+    run.add_argument("--min-time", type=float, default=min_time, help="наименьшее время одного замера, с")
+    run.add_argument("--max-steps", type=int, default=max_steps, help="наибольшее число шагов одного замера")
+    startup = commands.add_parser("startup", help="замерить время холодного запуска")
+    startup.add_argument("--scenario", default="solar_system.txt", help="система тел для чтения и шага расчёта")
+    startup.add_argument("--repeats", type=int, default=startup_repeats, help="число запусков в одном замере")
+    startup.add_argument("--output", help="файл JSON для результатов")
+    check = commands.add_parser("compare", help="сравнить результаты с эталоном")
+    check.add_argument("baseline", help="файл JSON с эталонными результатами")
+    check.add_argument("current", help="файл JSON с новыми результатами")
+    check.add_argument("--threshold", type=float, default=0.1, help="допустимое относительное ухудшение")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Точка входа замеров.
+
+    Параметры:
+
+    **argv** — список аргументов (по умолчанию sys.argv[1:]).
+    """
+    global min_time, max_steps, startup_repeats
+    args = parse_arguments(argv)
+    if args.command == "run":
+        min_time, max_steps = args.min_time, args.max_steps
+        results = run_suite(args.engines, args.integrators, args.sizes,
+                            progress=lambda name, result: print(_format_result(name, result), flush=True))
+        if args.output:
+            with open(args.output, "w") as output_file:
+                json.dump(results, output_file, indent=1)
+        return 0
+    if args.command == "startup":
+        startup_repeats = args.repeats
+        results = {"machine": machine_info(),
+                   "benchmarks": run_startup(args.scenario, lambda name, result: print(_format_result(name, result),
+                                                                                      flush=True))}
+        if args.output:
+            with open(args.output, "w") as output_file:
+                json.dump(results, output_file, indent=1)
+        return 0
+    with open(args.baseline) as baseline_file:
+        baseline = json.load(baseline_file)
+    with open(args.current) as current_file:
+        current = json.load(current_file)
+    machines = [{key: results["machine"].get(key) for key in ("platform", "processor", "cpu_count")}
+                for results in (baseline, current)]
+    if machines[0] != machines[1]:
+        print("warning: results come from different machines: %s vs %s" % tuple(machines))
+    rows = compare(baseline, current, args.threshold)
+    for row in rows:
+        print("%-60s %-17s %14.6g -> %14.6g %+7.1f%%%s" % (
+            row["name"], row["metric"], row["baseline"], row["current"], 100 * row["change"],
+            "  REGRESSION" if row["regression"] else ""))
+    regressions = sum(row["regression"] for row in rows)
+    print("%d comparisons, %d regressions (threshold %.0f%%)" % (len(rows), regressions, 100 * args.threshold))
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
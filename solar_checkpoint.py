@@ -0,0 +1,110 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Контрольные точки расчёта.
+Контрольная точка хранит всё, от чего зависит продолжение расчёта: числовые поля тел без потери точности,
+физическое время, шаг, способ вычисления сил, интегратор с его состоянием (запомненные ускорения,
+внутренний шаг, уровни блочных шагов, счётчики), монитор сохраняющихся величин, статистику тел
+и параметры модели. Расчёт, продолженный из контрольной точки, совпадает с непрерывным до последнего бита.
+
+Файл записывается атомарно: сначала во временный файл в том же каталоге, затем переименовывается,
+так что при сбое во время записи остаётся предыдущая контрольная точка.
+"""
+
+import os
+import pickle
+import tempfile
+
+import solar_model as model
+import solar_profile
+
+checkpoint_version = 1
+"""Версия формата контрольной точки"""
+
+model_settings = ("softening_length", "rk45_tolerance", "block_steps_per_orbit", "block_max_level")
+"""Параметры модуля solar_model, влияющие на результат расчёта"""
+
+
+class CheckpointError(ValueError):
+    """Файл не является контрольной точкой известной версии"""
+
+
+def _settings(simulation):
+    """Возвращает словарь параметров модулей, от которых зависит продолжение расчёта."""
+    settings = {"solar_model": {name: getattr(model, name) for name in model_settings}}
+    if simulation.engine == "barnes_hut":
+        import solar_tree
+        settings["solar_tree"] = {"opening_angle": solar_tree.opening_angle, "max_depth": solar_tree.max_depth}
+    return settings
+
+
+def _apply_settings(settings):
+    """Устанавливает параметры модулей, сохранённые в контрольной точке."""
+    for name, value in settings.get("solar_model", {}).items():
+        setattr(model, name, value)
+    if "solar_tree" in settings:
+        import solar_tree
+        for name, value in settings["solar_tree"].items():
+            setattr(solar_tree, name, value)
+
+
+@solar_profile.timed("io")
+def save_checkpoint(path, simulation, stats=None, extra=None):
+    """Атомарно сохраняет контрольную точку расчёта.
+
+    Параметры:
+
+    **path** — имя файла контрольной точки.
+    **simulation** — расчёт solar_model.Simulation.
+    **stats** — статистика solar_stats.SystemStatistics или None.
+    **extra** — словарь с дополнительными данными вызывающей программы (например, счётчиками шагов).
+    """
+    checkpoint = {
+        "version": checkpoint_version,
+        "simulation": simulation,
+        "stats": stats,
+        "settings": _settings(simulation),
+        "extra": extra or {},
+    }
+    directory = os.path.dirname(os.path.abspath(path))
+    descriptor, temporary = tempfile.mkstemp(dir=directory, prefix="." + os.path.basename(path) + ".",
+                                             suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "wb") as checkpoint_file:
+            pickle.dump(checkpoint, checkpoint_file, protocol=pickle.HIGHEST_PROTOCOL)
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+@solar_profile.timed("io")
+def load_checkpoint(path):
+    """Загружает контрольную точку и восстанавливает параметры модели.
+    Возвращает тройку (simulation, stats, extra).
+
+    Параметры:
+
+    **path** — имя файла контрольной точки.
+
+    Файл, который не удаётся разобрать как контрольную точку (обрезанный, чужой pickle или другой формат),
+    вызывает CheckpointError.
+    """
+    with open(path, "rb") as checkpoint_file:
+        try:
+            checkpoint = pickle.load(checkpoint_file)
+        # обрезанный файл или чужой pickle: кроме UnpicklingError и EOFError разбор может остановиться
+        # на неизвестном классе или на испорченных данных
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError, IndexError, KeyError, TypeError,
+                ValueError) as error:
+            raise CheckpointError("%s: not a checkpoint (%s)" % (path, error)) from None
+    if not isinstance(checkpoint, dict) or checkpoint.get("version") != checkpoint_version:
+        raise CheckpointError("%s: unsupported checkpoint version" % path)
+    _apply_settings(checkpoint["settings"])
+    return checkpoint["simulation"], checkpoint["stats"], checkpoint["extra"]
+
+
+if __name__ == "__main__":
+    print("This module is not for direct call!")
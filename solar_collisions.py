@@ -0,0 +1,212 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Поиск сближений и столкновений тел по равномерной сетке.
+После каждого шага тела раскладываются по ячейкам сетки (ключи ячеек сортируются один раз),
+и расстояния проверяются только между телами соседних ячеек, а не между всеми парами.
+
+Столкновение — два тела ближе суммы их радиусов. Политики:
+
+* "merge" — тела сливаются с сохранением массы и импульса, лёгкое тело удаляется из хранилища;
+* "bounce" — упругий отскок вдоль линии центров;
+* "flag" — столкновение только записывается в журнал.
+
+Сближение — тела ближе encounter_distance; оно записывается в журнал один раз, когда пара сходится.
+"""
+
+import collections
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+collision_policies = ("merge", "bounce", "flag")
+"""Допустимые политики обработки столкновений"""
+
+_neighbours = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)]
+
+
+def _cell_hash(cx, cy):
+    """Ключ ячейки сетки. Совпадение ключей разных ячеек даёт лишь лишних кандидатов, а не пропуски."""
+    return cx * np.int64(73856093) ^ cy * np.int64(19349663)
+
+
+def close_pairs(x, y, cell):
+    """Возвращает пару массивов (i, j), i < j, с кандидатами в близкие пары:
+    тела, лежащие в одной или соседних ячейках сетки с шагом **cell**.
+    Любая пара тел на расстоянии меньше **cell** среди кандидатов есть.
+
+    Параметры:
+
+    **x**, **y** — координаты тел.
+    **cell** — размер ячейки сетки.
+    """
+    n = len(x)
+    if n < 2 or not cell > 0:
+        return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+    cx = np.floor(np.asarray(x) / cell).astype(np.int64)
+    cy = np.floor(np.asarray(y) / cell).astype(np.int64)
+    key = _cell_hash(cx, cy)
+    order = np.argsort(key, kind="stable")
+    cells, starts, counts = np.unique(key[order], return_index=True, return_counts=True)
+    found_i, found_j = [], []
+    for dx, dy in _neighbours:
+        neighbour = _cell_hash(cx + dx, cy + dy)
+        position = np.minimum(np.searchsorted(cells, neighbour), len(cells) - 1)
+        bodies = np.flatnonzero(cells[position] == neighbour)
+        if not len(bodies):
+            continue
+        cell_counts = counts[position[bodies]]
+        i = np.repeat(bodies, cell_counts)
+        offsets = np.arange(len(i)) - np.repeat(np.cumsum(cell_counts) - cell_counts, cell_counts)
+        j = order[np.repeat(starts[position[bodies]], cell_counts) + offsets]
+        keep = i < j
+        found_i.append(i[keep])
+        found_j.append(j[keep])
+    if not found_i:
+        return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+    codes = np.unique(np.concatenate(found_i).astype(np.int64) * n + np.concatenate(found_j))
+    return codes // n, codes % n
+
+
+class CollisionDetector:
+    """Поиск и обработка столкновений и сближений после каждого шага расчёта solar_model.Simulation."""
+
+    def __init__(self, policy="merge", radius=None, meters_per_pixel=None, encounter_distance=0.0, history=1024):
+        """
+        Параметры:
+
+        **policy** — политика обработки столкновений из collision_policies.
+        **radius** — физический радиус всех тел в метрах.
+        **meters_per_pixel** — если **radius** не задан, радиус тела — его экранный радиус R,
+        умноженный на это число (тела сталкиваются, когда касаются их изображения).
+        **encounter_distance** — расстояние, ближе которого сближение записывается в журнал (0 — не записывать).
+        **history** — сколько последних событий хранить.
+        """
+        if policy not in collision_policies:
+            raise ValueError("unknown collision policy: %r" % policy)
+        if radius is None and meters_per_pixel is None:
+            raise ValueError("either radius or meters_per_pixel is required")
+        self.policy = policy
+        self.radius = radius
+        self.meters_per_pixel = meters_per_pixel
+        self.encounter_distance = encounter_distance
+        self.events = collections.deque(maxlen=history)
+        """Последние события: словари с полями t, kind ("collision" или "encounter"), ids, distance, policy"""
+        self.counts = collections.Counter()
+        """Число событий каждого вида"""
+        self._close = set()
+        self._touching = set()
+
+    def radii(self, space_objects):
+        """Возвращает физические радиусы тел хранилища."""
+        if self.radius is not None:
+            return np.full(len(space_objects), float(self.radius))
+        return space_objects.R * self.meters_per_pixel
+
+    def after_step(self, simulation):
+        """Находит столкновения и сближения в текущем положении тел и применяет политику.
+        Возвращает список представлений тел, удалённых из хранилища при слиянии.
+
+        Параметры:
+
+        **simulation** — расчёт solar_model.Simulation.
+        """
+        store = simulation.space_objects
+        radii = self.radii(store)
+        reach = 2 * float(radii.max()) if len(radii) else 0.0
+        i, j = close_pairs(store.x, store.y, max(reach, self.encounter_distance))
+        distance = np.hypot(store.x[j] - store.x[i], store.y[j] - store.y[i])
+        colliding = distance < radii[i] + radii[j]
+        self._record_encounters(simulation, store, i[~colliding], j[~colliding], distance[~colliding])
+        ids = store.ids
+        previous = self._touching
+        self._touching = set(zip(ids[i[colliding]].tolist(), ids[j[colliding]].tolist()))
+        if not colliding.any():
+            return []
+        order = np.argsort(distance[colliding], kind="stable")
+        pairs = [(a, b, d, (int(ids[a]), int(ids[b])) not in previous)
+                 for a, b, d in zip(i[colliding][order], j[colliding][order], distance[colliding][order])]
+        return getattr(self, "_" + self.policy)(simulation, store, pairs)
+
+    def _event(self, simulation, kind, store, a, b, distance):
+        event = {"t": simulation.physical_time, "kind": kind, "ids": (int(store.ids[a]), int(store.ids[b])),
+                 "distance": float(distance), "policy": self.policy if kind == "collision" else None}
+        self.events.append(event)
+        self.counts[kind] += 1
+        logger.info("%s of bodies %d and %d at t=%g, distance %g", kind, event["ids"][0], event["ids"][1],
+                    event["t"], event["distance"])
+
+    def _record_encounters(self, simulation, store, i, j, distance):
+        """Записывает сближения пар, которые сошлись ближе encounter_distance на этом шаге."""
+        if not self.encounter_distance:
+            return
+        close = distance < self.encounter_distance
+        ids = store.ids
+        current = set()
+        for a, b, d in zip(i[close], j[close], distance[close]):
+            pair = (int(ids[a]), int(ids[b]))
+            current.add(pair)
+            if pair not in self._close:
+                self._event(simulation, "encounter", store, a, b, d)
+        self._close = current
+
+    def _flag(self, simulation, store, pairs):
+        """Только запись в журнал; пара, остающаяся в касании, записывается один раз."""
+        for a, b, d, new in pairs:
+            if new:
+                self._event(simulation, "collision", store, a, b, d)
+        return []
+
+    def _bounce(self, simulation, store, pairs):
+        """Упругий отскок: составляющие скоростей вдоль линии центров обмениваются как у шаров."""
+        for a, b, d, new in pairs:
+            if new:
+                self._event(simulation, "collision", store, a, b, d)
+            nx, ny = store.x[b] - store.x[a], store.y[b] - store.y[a]
+            norm = np.hypot(nx, ny)
+            if norm == 0:
+                continue
+            nx, ny = nx / norm, ny / norm
+            approach = (store.Vx[a] - store.Vx[b]) * nx + (store.Vy[a] - store.Vy[b]) * ny
+            if approach <= 0:
+                continue  # тела уже расходятся
+            ma, mb = store.m[a], store.m[b]
+            store.Vx[a] -= 2 * mb / (ma + mb) * approach * nx
+            store.Vy[a] -= 2 * mb / (ma + mb) * approach * ny
+            store.Vx[b] += 2 * ma / (ma + mb) * approach * nx
+            store.Vy[b] += 2 * ma / (ma + mb) * approach * ny
+        return []
+
+    def _merge(self, simulation, store, pairs):
+        """Слияние: тяжёлое тело получает суммарную массу, положение центра масс и суммарный импульс,
+        площадь его изображения равна сумме площадей; лёгкое тело удаляется из хранилища."""
+        consumed = set()
+        absorbed = []
+        for a, b, d, new in pairs:
+            if a in consumed or b in consumed:
+                continue  # тело уже слилось на этом шаге, остальное — на следующих
+            consumed.update((a, b))
+            self._event(simulation, "collision", store, a, b, d)
+            keep, gone = (a, b) if store.m[a] >= store.m[b] else (b, a)
+            mk, mg = store.m[keep], store.m[gone]
+            total = mk + mg
+            for name in ("x", "y", "Vx", "Vy"):
+                values = store.arrays[name]
+                values[keep] = (mk * values[keep] + mg * values[gone]) / total
+            store.m[keep] = total
+            store.R[keep] = np.hypot(store.R[keep], store.R[gone])
+            absorbed.append(gone)
+        removed = [store.remove_at(index) for index in sorted(absorbed, reverse=True)]
+        if removed and simulation.monitor is not None:
+            simulation.monitor.initial = None  # слияние неупруго: уход энергии отсчитывается заново
+        return removed
+
+    def summary(self):
+        """Возвращает словарь с числом событий каждого вида и последними событиями."""
+        return {"counts": dict(self.counts), "events": list(self.events)[-20:]}
+
+
+if __name__ == "__main__":
+    print("This module is not for direct call!")
@@ -0,0 +1,159 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Контроль сохранения энергии, импульса и момента импульса.
+Потенциальная энергия берётся из того же прохода, в котором вычисляются силы,
+поэтому отдельный попарный перебор не нужен: на шагах замера интегратор просит движок
+вернуть потенциал вместе с ускорениями.
+"""
+
+import collections
+import warnings
+import numpy as np
+import solar_model as model
+
+sample_cadence = 100
+"""Через сколько шагов делать замер"""
+
+energy_drift_budget = 1E-6
+"""Допустимый относительный уход полной энергии"""
+
+minimum_time_step = 1E-3
+"""Наименьший шаг по времени, до которого монитор может уменьшить шаг"""
+
+
+class EnergyDriftWarning(RuntimeWarning):
+    """Предупреждение о том, что уход энергии превысил допустимый"""
+
+
+def conserved_quantities(space_objects, potential):
+    """Возвращает словарь с кинетической (kinetic), потенциальной (potential) и полной (energy) энергией,
+    импульсом (px, py) и моментом импульса относительно начала координат (angular_momentum),
+    а также масштабами, относительно которых считается уход импульса и момента импульса
+    (momentum_scale — сумма модулей импульсов тел, angular_momentum_scale — сумма модулей моментов).
+
+    Параметры:
+
+    **space_objects** — хранилище SpaceObjects.
+    **potential** — гравитационный потенциал в точках тел.
+    """
+    m, x, y, vx, vy = space_objects.m, space_objects.x, space_objects.y, space_objects.Vx, space_objects.Vy
+    kinetic = 0.5 * float((m * (vx * vx + vy * vy)).sum())
+    potential_energy = 0.5 * float((m * potential).sum())
+    return {
+        "kinetic": kinetic,
+        "potential": potential_energy,
+        "energy": kinetic + potential_energy,
+        "px": float((m * vx).sum()),
+        "py": float((m * vy).sum()),
+        "angular_momentum": float((m * (x * vy - y * vx)).sum()),
+        "momentum_scale": float((m * np.hypot(vx, vy)).sum()),
+        "angular_momentum_scale": float((m * np.abs(x * vy - y * vx)).sum()),
+    }
+
+
+class ConservationMonitor:
+    """Монитор сохраняющихся величин.
+    Каждые **cadence** шагов вычисляет энергию, импульс и момент импульса и их уход от начальных значений.
+    Если уход энергии больше допустимого, по политике "warn" выдаёт предупреждение,
+    по политике "reduce" — уменьшает шаг по времени вдвое и отсчитывает уход от текущего значения.
+    """
+
+    def __init__(self, cadence=sample_cadence, budget=energy_drift_budget, policy="warn", history=1024):
+        """
+        Параметры:
+
+        **cadence** — через сколько шагов делать замер.
+        **budget** — допустимый относительный уход энергии.
+        **policy** — "warn" или "reduce".
+        **history** — сколько последних замеров хранить.
+        """
+        if policy not in ("warn", "reduce"):
+            raise ValueError("unknown drift policy: %r" % policy)
+        self.cadence = cadence
+        self.budget = budget
+        self.policy = policy
+        self.initial = None
+        """Значения сохраняющихся величин, от которых отсчитывается уход"""
+        self.last = None
+        """Последний замер"""
+        self.samples = collections.deque(maxlen=history)
+        """Последние замеры"""
+        self.reductions = 0
+        """Сколько раз шаг по времени уменьшался"""
+        self.max_drift = 0.0
+        """Наибольший замеченный уход энергии"""
+        self._warning_level = budget
+
+    def before_step(self, simulation):
+        """Просит интегратор вычислить потенциал, если после этого шага будет замер.
+
+        Параметры:
+
+        **simulation** — расчёт solar_model.Simulation.
+        """
+        if self.initial is None:
+            self.sample(simulation)
+        simulation.state.want_potential = (simulation.state.steps + 1) % self.cadence == 0
+
+    def after_step(self, simulation):
+        """Делает замер, если подошла его очередь.
+
+        Параметры:
+
+        **simulation** — расчёт solar_model.Simulation.
+        """
+        if simulation.state.steps % self.cadence == 0:
+            self.sample(simulation)
+        simulation.state.want_potential = False
+
+    def sample(self, simulation):
+        """Вычисляет сохраняющиеся величины и их уход, применяет политику. Возвращает замер.
+
+        Параметры:
+
+        **simulation** — расчёт solar_model.Simulation.
+        """
+        state = simulation.state
+        potential = model.current_potential(simulation.space_objects, simulation.engine, state)
+        quantities = conserved_quantities(simulation.space_objects, potential)
+        quantities["t"] = simulation.physical_time
+        quantities["dt"] = simulation.dt
+        if self.initial is None:
+            self.initial = quantities
+        scale = abs(self.initial["energy"]) or 1.0
+        quantities["energy_drift"] = abs(quantities["energy"] - self.initial["energy"]) / scale
+        quantities["momentum_drift"] = np.hypot(quantities["px"] - self.initial["px"],
+                                                quantities["py"] - self.initial["py"]) \
+            / (self.initial["momentum_scale"] or 1.0)
+        quantities["angular_momentum_drift"] = abs(quantities["angular_momentum"] - self.initial["angular_momentum"]) \
+            / (self.initial["angular_momentum_scale"] or 1.0)
+        self.max_drift = max(self.max_drift, quantities["energy_drift"])
+        self.last = quantities
+        self.samples.append(quantities)
+        if quantities["energy_drift"] > self.budget:
+            self._exceeded(simulation, quantities)
+        return quantities
+
+    def _exceeded(self, simulation, quantities):
+        """Применяет политику при превышении допустимого ухода энергии.
+        Предупреждение повторяется, только когда уход вырастает вдвое с прошлого предупреждения."""
+        if self.policy == "reduce" and simulation.dt / 2 >= minimum_time_step:
+            simulation.dt /= 2
+            self.reductions += 1
+            self.initial = quantities
+            return
+        if quantities["energy_drift"] <= self._warning_level:
+            return
+        self._warning_level = 2 * quantities["energy_drift"]
+        warnings.warn("energy drift %.3g exceeds budget %.3g at t=%g" % (quantities["energy_drift"], self.budget,
+                                                                      quantities["t"]), EnergyDriftWarning)
+
+    def summary(self):
+        """Возвращает словарь с последним замером, наибольшим уходом энергии и числом уменьшений шага."""
+        return {"last": self.last, "max_energy_drift": self.max_drift, "reductions": self.reductions,
+                "samples": len(self.samples)}
+
+
+if __name__ == "__main__":
+    print("This module is not for direct call!")
@@ -0,0 +1,206 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Расчёт без графического интерфейса.
+Загружает систему тел из файла, считает заданное число шагов или до заданного момента времени
+с максимальной скоростью и сохраняет конечное состояние и статистику расчёта.
+Не загружает tkinter и matplotlib, если не попросить сохранить графики.
+
+Пример:
+
+    python solar_headless.py solar_system.txt --dt 3600 --until 3.15E7 --integrator leapfrog --engine numpy
+
+Долгий расчёт можно периодически сохранять в контрольную точку и продолжить после сбоя той же командой
+с ключом --resume; продолженный расчёт совпадает с непрерывным до последнего бита:
+
+    python solar_headless.py solar_system.txt --dt 3600 --until 3.15E9 --checkpoint run.ckpt --checkpoint-every 10000
+    python solar_headless.py --resume run.ckpt --until 3.15E9 --checkpoint run.ckpt --checkpoint-every 10000
+"""
+
+import argparse
+import json
+import sys
+import time
+
+import solar_input
+import solar_model as model
+
+
+def parse_arguments(argv=None):
+    """Разбирает аргументы командной строки.
+
+    Параметры:
+
+    **argv** — список аргументов (по умолчанию sys.argv[1:]).
+    """
+    parser = argparse.ArgumentParser(description="Расчёт движения системы тел без графического интерфейса")
+    parser.add_argument("scenario", nargs="?", help="файл с описанием системы тел")
+    parser.add_argument("--dt", type=float, default=1.0, help="шаг по времени, с")
+    limit = parser.add_mutually_exclusive_group(required=True)
+    limit.add_argument("--steps", type=int, help="число шагов (при продолжении — вместе с уже сделанными)")
+    limit.add_argument("--until", type=float, help="момент физического времени, до которого считать, с")
+    parser.add_argument("--engine", choices=sorted(model.force_engines),
+                        help="способ вычисления сил (по умолчанию direct)")
+    parser.add_argument("--integrator", choices=sorted(model.integrators),
+                        help="интегратор уравнений движения (по умолчанию euler)")
+    parser.add_argument("--output", help="файл для конечного состояния системы")
+    parser.add_argument("--stats", help="файл JSON для статистики расчёта")
+    parser.add_argument("--record", help="файл .npy для записи траекторий всех тел")
+    parser.add_argument("--record-every", type=int, default=1, help="записывать каждый N-й шаг")
+    parser.add_argument("--monitor-every", type=int, default=0,
+                        help="каждые N шагов проверять сохранение энергии, импульса и момента импульса")
+    parser.add_argument("--drift-budget", type=float, default=1E-6, help="допустимый относительный уход энергии")
+    parser.add_argument("--drift-policy", default="warn", choices=("warn", "reduce"),
+                        help="предупреждать или уменьшать шаг при превышении ухода энергии")
+    parser.add_argument("--collisions", choices=("merge", "bounce", "flag"),
+                        help="обрабатывать столкновения тел: слиянием, отскоком или только записью в журнал")
+    parser.add_argument("--collision-radius", type=float, help="физический радиус тел для столкновений, м")
+    parser.add_argument("--encounter-distance", type=float, default=0.0,
+                        help="записывать в журнал сближения тел ближе этого расстояния, м")
+    parser.add_argument("--checkpoint", help="файл контрольной точки, сохраняемой в конце расчёта")
+    parser.add_argument("--checkpoint-every", type=int, default=0, help="сохранять контрольную точку каждые N шагов")
+    parser.add_argument("--resume", help="продолжить расчёт из контрольной точки вместо файла с системой тел "
+                             "(шаг, способ вычисления сил и интегратор берутся из неё; --monitor-every "
+                             "и --collisions заменяют сохранённые в ней)")
+    parser.add_argument("--profile", help="замерять время участков расчёта и сохранить трассировку в этот файл JSON "
+                             "(формат Chrome Trace Event: chrome://tracing, ui.perfetto.dev)")
+    parser.add_argument("--plot", action="store_true", help="сохранить графики для второго тела (нужен matplotlib)")
+    parser.add_argument("--plot-dir", help="сохранить графики всех тел в этот каталог (нужен matplotlib)")
+    parser.add_argument("--plot-jobs", type=int,
+                        help="число процессов для построения графиков (по умолчанию число ядер)")
+    args = parser.parse_args(argv)
+    if (args.scenario is None) == (args.resume is None):
+        parser.error("either a scenario file or --resume is required")
+    if args.resume and (args.engine or args.integrator):
+        # состояние интегратора в контрольной точке относится к сохранённому интегратору и способу вычисления сил
+        parser.error("--engine and --integrator are taken from the checkpoint and cannot be used with --resume")
+    args.engine = args.engine or "direct"
+    args.integrator = args.integrator or "euler"
+    if args.collisions and not args.collision_radius:
+        parser.error("--collisions requires --collision-radius")
+    if args.checkpoint_every and not args.checkpoint:
+        parser.error("--checkpoint-every requires --checkpoint")
+    return args
+
+
+def run(args):
+    """Выполняет расчёт по разобранным аргументам и возвращает словарь со статистикой.
+
+    Параметры:
+
+    **args** — результат parse_arguments.
+    """
+    if args.profile:
+        import solar_profile
+        solar_profile.enable()
+    if args.resume:
+        import solar_checkpoint
+        simulation, statistics, extra = solar_checkpoint.load_checkpoint(args.resume)
+        total_steps = extra.get("steps", 0)
+    else:
+        space_objects = solar_input.read_space_objects_data_from_file(args.scenario)
+        simulation = model.Simulation(space_objects, args.dt, args.engine, args.integrator,
+                                      solar_input.read_physical_time_from_file(args.scenario))
+        statistics = None
+        if args.plot or args.plot_dir or args.stats or args.checkpoint:
+            import solar_stats
+            statistics = solar_stats.SystemStatistics(simulation.space_objects)
+        total_steps = 0
+    if args.monitor_every:
+        import solar_diagnostics
+        if args.resume:
+            print("--monitor-every: conservation is monitored from the resumed state; "
+                  "the monitor saved in the checkpoint is replaced")
+        simulation.monitor = solar_diagnostics.ConservationMonitor(args.monitor_every, args.drift_budget,
+                                                                   args.drift_policy)
+    if args.collisions:
+        import solar_collisions
+        if args.resume:
+            print("--collisions: collision handling saved in the checkpoint is replaced")
+        simulation.collisions = solar_collisions.CollisionDetector(
+            args.collisions, radius=args.collision_radius, encounter_distance=args.encounter_distance)
+    if args.checkpoint:
+        import solar_checkpoint
+    recorder = None
+    if args.record:
+        import solar_trajectory
+        recorder = solar_trajectory.TrajectoryWriter(args.record, simulation.space_objects,
+                                                     simulation.dt * args.record_every, simulation.physical_time)
+        recorder.record(simulation.physical_time, simulation.space_objects)
+    initial_dt = simulation.dt  # при продолжении шаг берётся из контрольной точки, а не из --dt
+    started = time.perf_counter()
+    steps = 0
+    while (args.steps is None or total_steps < args.steps) \
+            and (args.until is None or simulation.physical_time < args.until):
+        simulation.step()
+        if statistics is not None:
+            statistics.update(simulation.space_objects, simulation.physical_time)
+        steps += 1
+        total_steps += 1
+        if recorder is not None and steps % args.record_every == 0:
+            recorder.record(simulation.physical_time, simulation.space_objects)
+        if args.checkpoint_every and total_steps % args.checkpoint_every == 0:
+            solar_checkpoint.save_checkpoint(args.checkpoint, simulation, statistics, {"steps": total_steps})
+    elapsed = time.perf_counter() - started
+    if recorder is not None:
+        recorder.close()
+    if args.checkpoint:
+        solar_checkpoint.save_checkpoint(args.checkpoint, simulation, statistics, {"steps": total_steps})
+
+    if args.output:
+        solar_input.write_space_objects_data_to_file(args.output, simulation.space_objects, simulation.physical_time)
+    if args.plot:
+        solar_input.made_graphics(statistics)
+    if args.plot_dir:
+        import solar_plots
+        solar_plots.export_plots(statistics, args.plot_dir, jobs=args.plot_jobs)
+    if args.profile:
+        solar_profile.profiler.write_trace(args.profile)
+    return {
+        "scenario": args.scenario or args.resume,
+        "engine": simulation.engine,
+        "integrator": simulation.integrator,
+        "dt": initial_dt,
+        "final_dt": simulation.dt,
+        "steps": steps,
+        "total_steps": total_steps,
+        "physical_time": simulation.physical_time,
+        "wall_time": elapsed,
+        "steps_per_second": steps / elapsed if elapsed > 0 else float("inf"),
+        "force_evaluations": simulation.state.force_evaluations,
+        "pair_evaluations": simulation.state.pair_evaluations,
+        "bodies": [
+            {"type": body.type, "color": body.color, "m": body.m, "x": body.x, "y": body.y,
+             "Vx": body.Vx, "Vy": body.Vy}
+            for body in simulation.space_objects
+        ],
+        "statistics": statistics.summary() if statistics is not None else None,
+        "conservation": simulation.monitor.summary() if simulation.monitor is not None else None,
+        "collisions": simulation.collisions.summary() if simulation.collisions is not None else None,
+        "profile": solar_profile.profiler.summary() if args.profile else None,
+    }
+
+
+def main(argv=None):
+    """Точка входа расчёта без графического интерфейса.
+
+    Параметры:
+
+    **argv** — список аргументов (по умолчанию sys.argv[1:]).
+    """
+    args = parse_arguments(argv)
+    summary = run(args)
+    print("%d steps, %.6g s simulated in %.3f s: %.1f steps/s, %d force evaluations" % (
+        summary["steps"], summary["physical_time"], summary["wall_time"], summary["steps_per_second"],
+        summary["force_evaluations"]))
+    if args.profile:
+        import solar_profile
+        print("\n".join(solar_profile.overlay_lines(summary["profile"])))
+    if args.stats:
+        with open(args.stats, "w") as stats_file:
+            json.dump(summary, stats_file, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,93 +1,155 @@
 # coding: utf-8
 # license: GPLv3
 
-from solar_objects import Star, Planet
-import matplotlib.pyplot as plt
+import numpy as np
+import solar_profile
+from solar_objects import Star, Planet, SpaceObjects
 
+object_types = {"star": Star.type, "planet": Planet.type}
+"""Допустимые типы объектов во входном файле"""
 
+binary_dtype = np.dtype([("type", "U8"), ("color", "U24"), ("R", "f8"), ("m", "f8"),
+                         ("x", "f8"), ("y", "f8"), ("Vx", "f8"), ("Vy", "f8")])
+"""Тип записи двоичного файла системы тел (.npy), по одной записи на тело"""
+
+
+class ScenarioFormatError(ValueError):
+    """Ошибка в строке входного файла"""
+
+    def __init__(self, filename, line_number, message):
+        super().__init__("%s:%d: %s" % (filename, line_number, message))
+        self.filename = filename
+        self.line_number = line_number
+
+
+@solar_profile.timed("io")
 def read_space_objects_data_from_file(input_filename):
     """
     Считывает данные о космических объектах из файла, создаёт сами объекты
-    и вызывает создание их графических образов
+    и вызывает создание их графических образов.
+    Файлы с расширением .npy читаются как двоичные (см. read_space_objects_binary).
+    Каждая строка текстового файла разбивается на слова один раз, значения копятся по столбцам
+    и переносятся в хранилище одним действием.
+    Возвращает хранилище SpaceObjects. При ошибке в строке бросает ScenarioFormatError с номером строки.
 
     Параметры:
 
     **input_filename** — имя входного файла
     """
+    if input_filename.endswith(".npy"):
+        return read_space_objects_binary(input_filename)
 
-    objects = []
+    types = []
+    colors = []
+    numbers = []
     with open(input_filename) as input_file:
-        for line in input_file:
-            if len(line.strip()) == 0 or line[0] == '#':
+        for line_number, line in enumerate(input_file, 1):
+            words = line.split()
+            if not words or words[0].startswith('#'):
                 continue  # пустые строки и строки-комментарии пропускаем
-            object_type = line.split()[0].lower()
-            if object_type == "star" and len(line.split()) == 8:
-                star = Star()
-                parse_star_parameters(line, star)
-                objects.append(star)
-            elif object_type == "planet" and len(line.split()) == 8:
-                planet = Planet()
-                parse_planet_parameters(line, planet)
-                objects.append(planet)
-            else:
-                print("Unknown space object")
-
-    return objects
-
-
-def parse_star_parameters(line, star):
-    """Считывает данные о звезде из строки.
-    Входная строка должна иметь слеюущий формат:
-    Star <радиус в пикселах> <цвет> <масса> <x> <y> <Vx> <Vy>
-
-    Здесь (x, y) — координаты зведы, (Vx, Vy) — скорость.
-    Пример строки:
-    Star 10 red 1000 1 2 3 4
+            object_type = object_types.get(words[0].lower())
+            if object_type is None:
+                if words[0] == "Time:":
+                    continue  # заголовок с моментом сохранения, см. write_space_objects_data_to_file
+                raise ScenarioFormatError(input_filename, line_number, "unknown space object %r" % words[0])
+            if len(words) != 8:
+                raise ScenarioFormatError(input_filename, line_number,
+                                          "expected 8 fields for %s, got %d" % (words[0], len(words)))
+            types.append(object_type)
+            colors.append(words[2])
+            numbers += words[3:]
+            numbers.append(words[1])
+
+    try:
+        columns = np.array(list(map(float, numbers))).reshape(-1, 6)
+    except ValueError:
+        _raise_number_error(input_filename)
+        raise
+    space_objects = SpaceObjects(capacity=max(16, len(types)))
+    space_objects.append_columns(types, colors, m=columns[:, 0], x=columns[:, 1], y=columns[:, 2],
+                                 Vx=columns[:, 3], Vy=columns[:, 4], R=columns[:, 5])
+    return space_objects
+
+
+def read_physical_time_from_file(input_filename):
+    """Возвращает момент времени из заголовка "Time: <t> seconds", который пишет write_space_objects_data_to_file,
+    или 0, если заголовка нет.
 
     Параметры:
 
-    **line** — строка с описание звезды.
-    **star** — объект звезды.
+    **input_filename** — имя входного файла
     """
+    if input_filename.endswith(".npy"):
+        return 0.0
+    with open(input_filename) as input_file:
+        for line in input_file:
+            words = line.split()
+            if not words or words[0].startswith('#'):
+                continue
+            if words[0] == "Time:" and len(words) > 1:
+                return float(words[1])
+            return 0.0
+    return 0.0
 
-    star.R = float(line.split()[1])
-    star.color = line.split()[2]
-    star.m = float(line.split()[3])
-    star.x = float(line.split()[4])
-    star.y = float(line.split()[5])
-    star.Vx = float(line.split()[6])
-    star.Vy = float(line.split()[7])
 
+def _raise_number_error(input_filename):
+    """Находит в файле первое поле, которое не является числом, и бросает ScenarioFormatError с номером строки."""
+    with open(input_filename) as input_file:
+        for line_number, line in enumerate(input_file, 1):
+            words = line.split()
+            if not words or words[0].startswith('#') or words[0] == "Time:":
+                continue
+            for word in words[1:2] + words[3:]:
+                try:
+                    float(word)
+                except ValueError:
+                    raise ScenarioFormatError(input_filename, line_number, "not a number: %r" % word) from None
+
+
+@solar_profile.timed("io")
+def read_space_objects_binary(input_filename, mmap=True):
+    """Считывает систему тел из двоичного файла .npy (см. binary_dtype).
+    По умолчанию файл отображается в память и числовые столбцы копируются в хранилище без разбора текста.
+    Возвращает хранилище SpaceObjects.
+
+    Параметры:
+
+    **input_filename** — имя входного файла
+    **mmap** — отображать ли файл в память вместо чтения целиком
+    """
+    records = np.load(input_filename, mmap_mode="r" if mmap else None)
+    if records.dtype != binary_dtype:
+        raise ScenarioFormatError(input_filename, 0, "unexpected record type %s" % records.dtype)
+    space_objects = SpaceObjects(capacity=max(16, len(records)))
+    space_objects.append_columns(records["type"].tolist(), records["color"].tolist(),
+                                 **{name: records[name] for name in ("R", "m", "x", "y", "Vx", "Vy")})
+    return space_objects
 
-def parse_planet_parameters(line, planet):
-    """Считывает данные о планете из строки.
-    Входная строка должна иметь слеюущий формат:
-    Planet <радиус в пикселах> <цвет> <масса> <x> <y> <Vx> <Vy>
 
-    Здесь (x, y) — координаты планеты, (Vx, Vy) — скорость.
-    Пример строки:
-    Planet 10 red 1000 1 2 3 4
+@solar_profile.timed("io")
+def write_space_objects_binary(output_filename, space_objects):
+    """Сохраняет систему тел в двоичный файл .npy (см. binary_dtype).
 
     Параметры:
 
-    **line** — строка с описание планеты.
-    **planet** — объект планеты.
+    **output_filename** — имя выходного файла
+    **space_objects** — хранилище или список космических объектов
     """
-
-    planet.R = float(line.split()[1])
-    planet.color = line.split()[2]
-    planet.m = float(line.split()[3])
-    planet.x = float(line.split()[4])
-    planet.y = float(line.split()[5])
-    planet.Vx = float(line.split()[6])
-    planet.Vy = float(line.split()[7])
+    records = np.zeros(len(space_objects), dtype=binary_dtype)
+    records["type"] = [obj.type for obj in space_objects]
+    records["color"] = [obj.color for obj in space_objects]
+    for name in ("R", "m", "x", "y", "Vx", "Vy"):
+        records[name] = [getattr(obj, name) for obj in space_objects]
+    np.save(output_filename, records)
 
 
+@solar_profile.timed("io")
 def write_space_objects_data_to_file(output_filename, space_objects, time):
     """Сохраняет данные о космических объектах в файл.
     Строки должны иметь следующий формат:
     Star <радиус в пикселах> <цвет> <масса> <x> <y> <Vx> <Vy>
     Planet <радиус в пикселах> <цвет> <масса> <x> <y> <Vx> <Vy>
+    Числа записываются в кратчайшем виде, который читается обратно без потери точности.
 
     Параметры:
 
@@ -99,44 +161,24 @@ def write_space_objects_data_to_file(output_filename, space_objects, time):
         print("Time:", time, "seconds", file=out_file)
         print("", file=out_file)
         for obj in space_objects:
-            print(obj.type[0].upper() + obj.type[1::], obj.color, obj.m, obj.x, obj.y, obj.Vx, obj.Vy, file=out_file)
+            print(obj.type[0].upper() + obj.type[1::], obj.R, obj.color, obj.m, obj.x, obj.y, obj.Vx, obj.Vy,
+                  file=out_file)
             print("", file=out_file)
 
 
-def made_graphics(stats):
-    """Сохраняет графики.
+def made_graphics(stats, body=1, directory="."):
+    """Сохраняет графики Speed_time, Distance_time и Speed_distance одного тела (см. solar_plots).
 
     Параметры:
 
-    **stats** — список статистики
+    **stats** — статистика solar_stats.SystemStatistics или список статистики [скорость, расстояние, время]
+    **body** — строка статистики тела, для которого строятся графики (для SystemStatistics)
+    **directory** — каталог для файлов графиков
     """
-    speeds = []
-    lengths = []
-    times = []
-    for i in range(len(stats)):
-        speeds.append(stats[i][0])
-        lengths.append(stats[i][1])
-        times.append(stats[i][2])
-    plt.plot(times, speeds, color="red")
-    plt.grid()
-    plt.xlabel("Time, s")
-    plt.ylabel("Total velocity, m/s")
-    plt.savefig(r"Speed_time")
-    plt.clf()
-
-    plt.plot(times, lengths, color="black")
-    plt.grid()
-    plt.xlabel("Time, s")
-    plt.ylabel("Distance to sun, m")
-    plt.savefig(r"Distance_time")
-    plt.clf()
-
-    plt.plot(lengths, speeds, color="blue")
-    plt.grid()
-    plt.xlabel("Distance to sun, m")
-    plt.ylabel("Total velocity, m/s")
-    plt.savefig(r"Speed_distance")
-    plt.clf()
+    import solar_plots
+
+    rows = [body] if hasattr(stats, "speed_history") else [0]
+    return solar_plots.export_plots(stats, directory, rows, jobs=1, pattern="{plot}.png")
 
 
 if __name__ == "__main__":
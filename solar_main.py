@@ -1,10 +1,81 @@
 # coding: utf-8
 # license: GPLv3
 
-import tkinter.filedialog
+import os
+import time
+import tkinter
+import numpy as np
 import solar_vis as vis
 import solar_input
 import solar_model as model
+import solar_diagnostics
+import solar_profile
+import solar_stats
+import solar_worker
+
+frame_rate = 30
+"""Частота кадров отрисовки"""
+
+overlay_every = 15
+"""Через сколько кадров обновляется вывод замеров времени на холсте"""
+
+
+def report_plots(future):
+    """Сообщает о завершении фонового построения графиков."""
+    try:
+        print("Saved %d plots." % len(future.result()))
+    except Exception as error:
+        print("Plots were not saved: %s" % error)
+
+
+class FrameScheduler:
+    """Планировщик кадров.
+    Решает, сколько шагов расчёта выполнить за один кадр: столько, сколько задано ползунком скорости,
+    но не больше, чем поток расчёта успевает за время кадра. Если к следующему кадру выданные шаги
+    не выполнены, кадр считается перегруженным и число шагов уменьшается, иначе постепенно растёт.
+    """
+
+    def __init__(self, rate=frame_rate):
+        """
+        Параметры:
+
+        **rate** — желаемая частота кадров.
+        """
+        self.frame_budget = 1 / rate
+        """Время на один кадр в секундах"""
+        self.allowed_steps = 1
+        """Сколько шагов на кадр поток расчёта успевает выполнить"""
+        self.granted_steps = 0
+        """Сколько шагов выдано на текущий кадр"""
+        self.overruns = 0
+        """Число перегруженных кадров"""
+
+    def steps_for_frame(self, requested, pending):
+        """Возвращает число шагов расчёта, которое нужно выдать на следующий кадр.
+
+        Параметры:
+
+        **requested** — число шагов на кадр, заданное ползунком.
+        **pending** — сколько выданных на прошлый кадр шагов не успели выполниться.
+        """
+        done = self.granted_steps - pending
+        if pending > 0:
+            self.overruns += 1
+            self.allowed_steps = max(1, min(self.allowed_steps, done))
+        elif self.allowed_steps < requested:
+            self.allowed_steps += max(1, self.allowed_steps // 4)
+        self.allowed_steps = min(self.allowed_steps, requested)
+        self.granted_steps = self.allowed_steps
+        return self.granted_steps
+
+    def delay_ms(self, frame_started):
+        """Возвращает задержку до следующего кадра в мс с учётом времени, ушедшего на этот кадр.
+
+        Параметры:
+
+        **frame_started** — момент начала кадра по time.perf_counter().
+        """
+        return max(1, int(1000 * (self.frame_budget - (time.perf_counter() - frame_started))))
 
 
 class Cosmos:
@@ -28,8 +99,8 @@ class Cosmos:
         """Физическое время от начала расчёта.
         Тип: float"""
 
-        self.stats = []
-        """Хранение данных для графиков"""
+        self.stats = None
+        """Статистика тел для графиков (solar_stats.SystemStatistics)"""
 
         # космическое пространство отображается на холсте типа Canvas
         self.space = tkinter.Canvas(root, width=vis.window_width, height=vis.window_height, bg="black")
@@ -53,14 +124,92 @@ class Cosmos:
         self.time_speed = tkinter.DoubleVar()
         scale = tkinter.Scale(frame, variable=self.time_speed, orient=tkinter.HORIZONTAL, label="time speed")
         scale.pack(side=tkinter.LEFT)
-        """Шкала с ползунком для увеличения скорости обработки заданных в окошке шагов времени"""
+        """Шкала с ползунком для увеличения скорости обработки заданных в окошке шагов времени:
+        за кадр выполняется 1 + <значение ползунка> шагов расчёта"""
+
+        self.scheduler = FrameScheduler()
+        """Планировщик числа шагов расчёта на кадр"""
+
+        self.engine = tkinter.StringVar()
+        self.engine.set("direct")
+        engine_menu = tkinter.OptionMenu(frame, self.engine, *model.force_engines)
+        engine_menu.pack(side=tkinter.LEFT)
+        """Способ вычисления сил.
+        Тип: переменная tkinter"""
+
+        self.integrator = tkinter.StringVar()
+        self.integrator.set("euler")
+        integrator_menu = tkinter.OptionMenu(frame, self.integrator, *model.integrators)
+        integrator_menu.pack(side=tkinter.LEFT)
+        """Интегратор уравнений движения.
+        Тип: переменная tkinter"""
+
+        self.simulation = None
+        """Расчёт загруженной модели"""
+
+        self.buffer = solar_worker.SnapshotBuffer()
+        """Буфер снимков положений, публикуемых потоком расчёта"""
+
+        self.worker = None
+        """Поток расчёта"""
+
+        self.drawn_version = 0
+        """Номер последнего отрисованного снимка"""
+
+        self.renderer = None
+        """Пакетная отрисовка тел на холсте"""
 
         load_file_button = tkinter.Button(frame, text="Open file...", command=self.open_file_dialog)
         load_file_button.pack(side=tkinter.LEFT)
         save_file_button = tkinter.Button(frame, text="Save to file...", command=self.save_file_dialog)
         save_file_button.pack(side=tkinter.LEFT)
-        """Кнопки открытия новой модели и сохранения текущих значений модели в файл с одновременным созданием графиков
-        движения для самой ближней к Солнцу планеты"""
+        replay_button = tkinter.Button(frame, text="Replay...", command=self.open_replay_dialog)
+        replay_button.pack(side=tkinter.LEFT)
+        """Кнопки открытия новой модели, сохранения текущих значений модели в файл с одновременным созданием графиков
+        движения планет и воспроизведения записанной траектории"""
+
+        self.replay = None
+        """Указатель времени воспроизводимой траектории (solar_trajectory.TrajectoryIndex) или None, если идёт расчёт"""
+
+        self.replay_position = tkinter.DoubleVar()
+        self.replay_frame = tkinter.Frame(root)
+        replay_scale = tkinter.Scale(self.replay_frame, variable=self.replay_position, orient=tkinter.HORIZONTAL,
+                                     from_=0, to=1, resolution=0.001, showvalue=False, length=vis.window_width,
+                                     command=self.scrub)
+        replay_scale.pack(side=tkinter.LEFT)
+        """Ползунок положения в воспроизводимой траектории: доля от начала до конца записи.
+        Показывается только при воспроизведении"""
+
+        self.reduce_time_step = tkinter.BooleanVar()
+        self.reduce_time_step.set(False)
+        reduce_button = tkinter.Checkbutton(frame, text="auto dt", variable=self.reduce_time_step)
+        reduce_button.pack(side=tkinter.LEFT)
+        """Уменьшать ли шаг по времени, когда уход энергии превышает допустимый"""
+
+        self.merge_bodies = tkinter.BooleanVar()
+        self.merge_bodies.set(False)
+        merge_button = tkinter.Checkbutton(frame, text="merge", variable=self.merge_bodies)
+        merge_button.pack(side=tkinter.LEFT)
+        """Сливать ли тела, изображения которых касаются. Без отметки столкновения только записываются в журнал"""
+
+        self.show_profile = tkinter.BooleanVar()
+        self.show_profile.set(False)
+        profile_button = tkinter.Checkbutton(frame, text="profile", variable=self.show_profile,
+                                             command=self.toggle_profile)
+        profile_button.pack(side=tkinter.LEFT)
+        """Замерять ли время участков расчёта и отрисовки и выводить ли замеры на холсте"""
+
+        self.profile_overlay = 0
+        """Текст с замерами времени на холсте"""
+
+        self.frames = 0
+        """Число отрисованных кадров"""
+
+        self.displayed_diagnostics = tkinter.StringVar()
+        diagnostics_label = tkinter.Label(frame, textvariable=self.displayed_diagnostics, width=16)
+        diagnostics_label.pack(side=tkinter.RIGHT)
+        """Отображаемый на экране уход полной энергии.
+        Тип: переменная tkinter"""
 
         self.displayed_time = tkinter.StringVar()
         self.displayed_time.set(str(self.physical_time) + " seconds gone")
@@ -80,104 +229,299 @@ class Cosmos:
         print('Modelling finished!')
 
     def execution(self):
-        """Функция исполнения -- выполняется циклически, вызывая обработку всех небесных тел,
-        а также обновляя их положение на экране.
-        Цикличность выполнения зависит от значения глобальной переменной perform_execution.
-        При perform_execution == True функция запрашивает вызов самой себя по таймеру через от 1 мс до 100 мс.
+        """Функция отрисовки -- выполняется циклически с постоянной частотой кадров и переносит
+        на экран последний снимок положений, опубликованный потоком расчёта.
+        Сам расчёт идёт в отдельном потоке (см. solar_worker), поэтому тяжёлый шаг не замораживает окно.
+        Число шагов расчёта на следующий кадр выбирает планировщик по положению ползунка time speed.
+        Цикличность выполнения зависит от значения переменной perform_execution.
         При некорректном введенном в окно значении, которое нельзя интерпретировать как число, выдается ошибка и
         для пересчета используется последнее корректное значение.
+        При воспроизведении траектории за кадр проходится столько же физического времени, сколько за
+        (1 + <значение ползунка>) шагов расчёта, и ничего не пересчитывается.
         """
         if self.perform_execution:
-            fixed_time_step = self.time_step.get()
-            if fixed_time_step != "" and fixed_time_step.isnumeric():
-                self.last_correct_time_step = float(fixed_time_step)
-            else:
-                print('Wrong data format')
-                self.time_step.set(self.last_correct_time_step)
-            if self.have_model:
-                self.stats.append(
-                    model.recalculate_space_objects_positions(self.space_objects, self.last_correct_time_step,
-                                                              self.physical_time))
-            for body in self.space_objects:
-                vis.update_object_position(self.space, body, self.scale_factor)
-            self.physical_time += self.last_correct_time_step
-            self.displayed_time.set("%.1f" % self.physical_time + " seconds gone")
-            root.update()
-            self.space.after(101 - int(self.last_correct_time_step), self.execution)
+            frame_started = time.perf_counter()
+            with solar_profile.timer("frame"):
+                self.read_time_step()
+                requested = 1 + int(self.time_speed.get())
+                if self.replay is not None:
+                    self.seek(self.physical_time + requested * self.last_correct_time_step)
+                    if self.physical_time >= self.replay.t_end:
+                        self.stop_execution()
+                        return
+                else:
+                    self.draw_latest_snapshot()
+                    if self.worker.error is not None:
+                        self.report_simulation_error(self.worker.error)
+                        return
+                    self.worker.grant(self.scheduler.steps_for_frame(requested, self.worker.pending))
+            self.frames += 1
+            if self.show_profile.get() and self.frames % overlay_every == 0:
+                self.profile_overlay = vis.update_profile_overlay(self.space, solar_profile.overlay_lines(),
+                                                                  self.profile_overlay)
+            self.space.after(self.scheduler.delay_ms(frame_started), self.execution)
+
+    def read_time_step(self):
+        """Читает шаг по времени из поля ввода и передаёт его расчёту."""
+        if self.simulation is not None and self.simulation.dt != self.last_correct_time_step:
+            self.last_correct_time_step = self.simulation.dt  # шаг уменьшен монитором сохранения энергии
+            self.time_step.set(self.last_correct_time_step)
+        try:
+            fixed_time_step = float(self.time_step.get())
+        except ValueError:
+            fixed_time_step = 0
+        if fixed_time_step > 0:
+            self.last_correct_time_step = fixed_time_step
+        else:
+            print('Wrong data format')
+            self.time_step.set(self.last_correct_time_step)
+        if self.simulation is not None:
+            self.simulation.dt = self.last_correct_time_step
+            self.simulation.monitor.policy = "reduce" if self.reduce_time_step.get() else "warn"
+            self.simulation.collisions.policy = "merge" if self.merge_bodies.get() else "flag"
+
+    def draw_latest_snapshot(self):
+        """Перемещает изображения тел в положения из последнего снимка, если он новый."""
+        snapshot = self.buffer.latest()
+        if snapshot is None or snapshot.version == self.drawn_version:
+            return
+        with solar_profile.timer("render"):
+            self.renderer.sync(snapshot.ids)
+            self.renderer.render(snapshot.x, snapshot.y)
+        self.drawn_version = snapshot.version
+        self.physical_time = snapshot.physical_time
+        self.displayed_time.set("%.1f" % self.physical_time + " seconds gone")
+        if self.simulation.monitor.last is not None:
+            self.displayed_diagnostics.set("dE/E = %.2e" % self.simulation.monitor.last["energy_drift"])
+
+    def seek(self, t):
+        """Переносит изображения тел в положения из воспроизводимой траектории в момент **t**
+        (прижимается к началу или концу записи).
+        """
+        self.physical_time = min(max(t, self.replay.t_start), self.replay.t_end)
+        x, y = self.replay.positions(self.physical_time)
+        outside = 10 * vis.window_width / self.scale_factor  # удалённые тела прячутся за краем окна
+        with solar_profile.timer("render"):
+            self.renderer.render(np.nan_to_num(x, nan=outside), np.nan_to_num(y, nan=outside))
+        self.displayed_time.set("%.1f" % self.physical_time + " seconds gone")
+        duration = self.replay.t_end - self.replay.t_start
+        self.replay_position.set((self.physical_time - self.replay.t_start) / duration if duration > 0 else 0.0)
+
+    def scrub(self, value):
+        """Обработчик ползунка положения в траектории: переходит к выбранному моменту."""
+        if self.replay is None:
+            return
+        duration = self.replay.t_end - self.replay.t_start
+        current = (self.physical_time - self.replay.t_start) / duration if duration > 0 else 0.0
+        if abs(float(value) - current) >= 0.0005:  # ползунок сдвинут пользователем, а не воспроизведением
+            self.seek(self.replay.t_start + float(value) * duration)
 
     def start_execution(self):
         """Обработчик события нажатия на кнопку Start.
-        Запускает циклическое исполнение функции execution, если есть открытая модель.
+        Запускает поток расчёта и циклическое исполнение функции execution, если есть открытая модель,
+        или воспроизведение траектории (с начала, если она доиграна до конца).
         """
+        if self.replay is not None:
+            if self.physical_time >= self.replay.t_end:
+                self.seek(self.replay.t_start)
+            self.perform_execution = True
+            self.start_button['text'] = "Pause"
+            self.start_button['command'] = self.stop_execution
+            self.execution()
+            print('Started replay...')
+            return
         if not self.have_model:
             print('You should open model')
             return
         self.perform_execution = True
         self.start_button['text'] = "Pause"
         self.start_button['command'] = self.stop_execution
-        root.update()
+        self.read_time_step()
+        self.simulation.engine = self.engine.get()
+        self.simulation.integrator = self.integrator.get()
+        self.scheduler = FrameScheduler()
+        self.worker.grant(0)
+        self.worker.resume()
 
         self.execution()
         print('Started execution...')
-        # if self.time_step.get() != "" and self.time_step.get().isnumeric():
-        #
-        # else:
-        #     print('Wrong data format')
 
     def stop_execution(self):
         """Обработчик события нажатия на кнопку Start.
-        Останавливает циклическое исполнение функции execution.
+        Приостанавливает поток расчёта и циклическое исполнение функции execution.
+        После возврата расчёт стоит, и состояние модели можно читать.
         """
         self.perform_execution = False
+        if self.worker is not None:
+            self.worker.pause()
+            self.draw_latest_snapshot()
         self.start_button['text'] = "Start"
         self.start_button['command'] = self.start_execution
         print('Paused execution.')
 
+    def report_simulation_error(self, error):
+        """Останавливает исполнение после ошибки в потоке расчёта и показывает её в окне сообщения.
+
+        Параметры:
+
+        **error** — исключение из SimulationWorker.error.
+        """
+        import tkinter.messagebox  # окно сообщения нужно только при ошибке
+
+        self.stop_execution()
+        print("Simulation failed: %s" % error)
+        self.displayed_diagnostics.set("simulation failed")
+        tkinter.messagebox.showerror("Simulation failed", "%s: %s" % (type(error).__name__, error))
+
+    def toggle_profile(self):
+        """Обработчик флажка profile: включает замеры времени или выключает их и убирает вывод с холста."""
+        solar_profile.enable(self.show_profile.get())
+        if self.show_profile.get():
+            solar_profile.profiler.reset()
+        elif self.profile_overlay != 0:
+            self.space.delete(self.profile_overlay)
+            self.profile_overlay = 0
+
+    def close(self):
+        """Останавливает поток расчёта и закрывает окно."""
+        if self.worker is not None:
+            self.worker.stop()
+        root.destroy()
+
     def open_file_dialog(self):
         """Открывает диалоговое окно выбора имени файла и вызывает
         функцию считывания параметров системы небесных тел из данного файла.
-        Считанные объекты сохраняются в глобальный список space_objects
+        Считанные объекты сохраняются в глобальный список space_objects.
+        Из файла с расширением .ckpt расчёт продолжается с контрольной точки.
         """
+        import tkinter.filedialog  # диалоги, контрольные точки и столкновения загружаются при первом открытии файла
+        import solar_checkpoint
+        import solar_collisions
+
         self.stop_execution()
-        in_filename = tkinter.filedialog.askopenfilename(filetypes=(("Text file", ".txt"),))
+        in_filename = tkinter.filedialog.askopenfilename(filetypes=(("Text file", ".txt"), ("NumPy file", ".npy"),
+                                                                    ("Checkpoint", ".ckpt")))
         if in_filename != '':
+            try:
+                if in_filename.endswith(".ckpt"):
+                    simulation, stats, extra = solar_checkpoint.load_checkpoint(in_filename)
+                else:
+                    space_objects = solar_input.read_space_objects_data_from_file(in_filename)
+                    simulation = model.Simulation(space_objects, self.last_correct_time_step,
+                                                  physical_time=solar_input.read_physical_time_from_file(in_filename))
+                    stats = None
+            except (solar_input.ScenarioFormatError, solar_checkpoint.CheckpointError) as error:
+                print(error)
+                return
+            self.remove_model()
             self.have_model = True
-            for i in range(len(self.space_objects)):
-                self.space.delete(self.space_objects[-1].image)  # удаление старых изображений планет
-                self.space_objects.pop()
-            self.space_objects = solar_input.read_space_objects_data_from_file(in_filename)
+            self.space_objects = simulation.space_objects
             max_distance = max([max(abs(obj.x), abs(obj.y)) for obj in self.space_objects])
             self.scale_factor = vis.calculate_scale_factor(max_distance)
             self.space_writing = vis.update_system_name(self.space, in_filename.split("/")[-1].split(".")[0],
                                                         self.space_writing)
-            self.stats = []
-            self.physical_time = 0
+            self.stats = stats if stats is not None else solar_stats.SystemStatistics(self.space_objects)
+            self.physical_time = simulation.physical_time
             self.displayed_time.set(str(self.physical_time) + " seconds gone")
+            self.simulation = simulation
+            if simulation.monitor is None:
+                simulation.monitor = solar_diagnostics.ConservationMonitor()
+            # касание изображений тел только записывается в журнал, слияние включается отметкой merge
+            simulation.collisions = solar_collisions.CollisionDetector("flag", meters_per_pixel=1 / self.scale_factor)
+            self.engine.set(simulation.engine)
+            self.integrator.set(simulation.integrator)
+            self.last_correct_time_step = simulation.dt
+            self.time_step.set(simulation.dt)
+            self.displayed_diagnostics.set("")
+            self.buffer = solar_worker.SnapshotBuffer()
+            self.worker = solar_worker.SimulationWorker(self.simulation, self.buffer, self.stats)
+            self.drawn_version = 0
 
-            for obj in self.space_objects:
-                if obj.type == 'star':
-                    vis.create_star_image(self.space, obj, self.scale_factor)
-                elif obj.type == 'planet':
-                    vis.create_planet_image(self.space, obj, self.scale_factor)
-                else:
-                    raise AssertionError()
+            self.renderer = vis.CanvasRenderer(self.space, self.scale_factor)
+            self.renderer.create_images(self.space_objects)
+
+    def open_replay_dialog(self):
+        """Открывает диалоговое окно выбора файла траектории, записанной solar_headless.py --record,
+        и переходит в режим воспроизведения: кнопка Start проигрывает запись, ползунок под холстом
+        переносит к любому её моменту. Расчёт при этом не выполняется.
+        В поле шага подставляется шаг записи, так что за кадр проходится столько записей, сколько шагов
+        расчёта задано ползунком скорости.
+        """
+        import tkinter.filedialog
+        import solar_trajectory
+
+        self.stop_execution()
+        in_filename = tkinter.filedialog.askopenfilename(filetypes=(("Trajectory", ".npy"),))
+        if in_filename == '':
+            return
+        try:
+            replay = solar_trajectory.TrajectoryIndex(solar_trajectory.TrajectoryReader(in_filename))
+        except (OSError, ValueError, KeyError) as error:
+            print("%s: not a trajectory (%s)" % (in_filename, error))
+            return
+        if len(replay.reader) == 0:
+            print("%s: empty trajectory" % in_filename)
+            return
+        self.remove_model()
+        self.replay = replay
+        self.space_objects = replay.space_objects()
+        max_distance = max([max(abs(obj.x), abs(obj.y)) for obj in self.space_objects])
+        self.scale_factor = vis.calculate_scale_factor(max_distance)
+        self.space_writing = vis.update_system_name(self.space, in_filename.split("/")[-1].split(".")[0],
+                                                    self.space_writing)
+        # шаг воспроизведения берётся из записи: без этого скорость проигрывания зависела бы от
+        # шага, оставшегося в окне от прошлого расчёта
+        recorded_dt = replay.reader.metadata.get("dt")
+        if not recorded_dt and len(replay.reader) > 1:
+            recorded_dt = (replay.t_end - replay.t_start) / (len(replay.reader) - 1)
+        if recorded_dt:
+            self.last_correct_time_step = recorded_dt
+            self.time_step.set(recorded_dt)
+        self.displayed_diagnostics.set("")
+        self.renderer = vis.CanvasRenderer(self.space, self.scale_factor)
+        self.renderer.create_images(self.space_objects)
+        self.replay_frame.pack(side=tkinter.BOTTOM)
+        self.seek(replay.t_start)
+
+    def remove_model(self):
+        """Останавливает поток расчёта или воспроизведение и удаляет изображения тел с холста."""
+        for i in range(len(self.space_objects)):
+            self.space.delete(self.space_objects[-1].image)  # удаление старых изображений планет
+            self.space_objects.pop()
+        if self.worker is not None:
+            self.worker.stop()
+            self.worker = None
+        self.simulation = None
+        self.have_model = False
+        self.replay = None
+        self.replay_frame.pack_forget()
 
     def save_file_dialog(self):
         """Открывает диалоговое окно выбора имени файла и сохранияет статистику в выбранный файл.
-        Создает 3 файла с графиками зависимостей параметров первой от звезды планеты
+        В каталоге этого файла в фоне создаются графики скорости и расстояния до звезды для всех планет
+        (см. solar_plots); окно при этом не ждёт их построения.
+        Файл с расширением .ckpt сохраняется как контрольная точка расчёта (см. solar_checkpoint).
         Выходит, если еще нет открытой модели
         """
         if not self.have_model:
             print('You should open model')
             return
+        import tkinter.filedialog
+        import solar_checkpoint
+
         self.stop_execution()
-        out_filename = tkinter.filedialog.asksaveasfilename(filetypes=(("Text file", ".txt"),))
-        if out_filename != '':
+        out_filename = tkinter.filedialog.asksaveasfilename(filetypes=(("Text file", ".txt"), ("Checkpoint", ".ckpt")))
+        if out_filename.endswith(".ckpt"):
+            solar_checkpoint.save_checkpoint(out_filename, self.simulation, self.stats)
+        elif out_filename != '':
             solar_input.write_space_objects_data_to_file(out_filename, self.space_objects, self.physical_time)
-            solar_input.made_graphics(self.stats)
+            import solar_plots
+            future = solar_plots.export_plots_in_background(self.stats, os.path.dirname(out_filename))
+            future.add_done_callback(report_plots)
 
 
 if __name__ == "__main__":
     root = tkinter.Tk()
     cosmos = Cosmos()
+    root.protocol("WM_DELETE_WINDOW", cosmos.close)
     root.mainloop()
@@ -1,9 +1,29 @@
 # coding: utf-8
 # license: GPLv3
 
+import numpy as np
+import solar_profile
+from solar_objects import as_space_objects
+
+engine_version = 4
+"""Версия физических движков и интеграторов. Увеличивается при любом изменении, меняющем результаты расчёта;
+по ней, в частности, становятся недействительными сохранённые результаты прогонов (см. solar_sweep)."""
+
 gravitational_constant = 6.67408E-11
 """Гравитационная постоянная Ньютона G"""
 
+softening_length = 0.0
+"""Длина сглаживания гравитационного потенциала (в метрах).
+При ненулевом значении совпадающие тела не дают деления на ноль."""
+
+scalar_bodies = 32
+"""Наибольшее число тел, при котором 1000 малых шагов исходной схемы (move_space_objects) выполняются
+над числами Python для каждого тела отдельно; для больших систем шаги выполняются над массивами"""
+
+block_elements = 1 << 22
+"""Максимальное число парных взаимодействий, вычисляемых за один векторный проход.
+Ограничивает объём временных массивов при большом числе тел."""
+
 
 def calculate_force(body, space_objects):
     """Вычисляет силу, действующую на тело.
@@ -23,6 +43,337 @@ def calculate_force(body, space_objects):
         body.Fy += gravitational_constant * obj.m * body.m / r ** 3 * (obj.y - body.y)
 
 
+def calculate_accelerations(x, y, m, softening=None, targets=None, potential=False):
+    """Вычисляет гравитационные ускорения тел одним векторным проходом.
+    Возвращает пару массивов (ax, ay) для тел из **targets**,
+    а при **potential** — тройку (ax, ay, phi), где phi — гравитационный потенциал в точках тел,
+    вычисленный в том же проходе.
+
+    Параметры:
+
+    **x**, **y** — массивы координат всех тел.
+    **m** — массив масс всех тел.
+    **softening** — длина сглаживания, по умолчанию берётся softening_length.
+    **targets** — индексы тел, для которых нужны ускорения (по умолчанию все тела).
+    **potential** — вычислить ли также потенциал.
+    """
+    if softening is None:
+        softening = softening_length
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    m = np.asarray(m, dtype=float)
+    if targets is None:
+        targets = np.arange(len(x))
+    else:
+        targets = np.asarray(targets, dtype=np.intp)
+    ax = np.empty(len(targets))
+    ay = np.empty(len(targets))
+    phi = np.empty(len(targets)) if potential else None
+    gm = gravitational_constant * m
+    eps2 = softening ** 2
+    block = max(1, block_elements // max(1, len(x)))
+    for start in range(0, len(targets), block):
+        rows = targets[start:start + block]
+        dx = x[np.newaxis, :] - x[rows, np.newaxis]
+        dy = y[np.newaxis, :] - y[rows, np.newaxis]
+        r2 = dx * dx + dy * dy + eps2
+        r2[np.arange(len(rows)), rows] = np.inf  # тело не действует гравитационной силой на само себя!
+        gm_r = gm / np.sqrt(r2)
+        factor = gm_r / r2
+        ax[start:start + block] = (factor * dx).sum(axis=1)
+        ay[start:start + block] = (factor * dy).sum(axis=1)
+        if potential:
+            phi[start:start + block] = -gm_r.sum(axis=1)
+    if potential:
+        return ax, ay, phi
+    return ax, ay
+
+
+def calculate_forces_direct(space_objects):
+    """Вычисляет силы, действующие на все тела, попарным перебором в цикле, так же как calculate_force.
+    Координаты и массы один раз переводятся в числа Python: чтение полей через представления тел
+    во внутреннем цикле в несколько раз медленнее.
+
+    Параметры:
+
+    **space_objects** — хранилище или список объектов, для которых нужно вычислить силы.
+    """
+    store = as_space_objects(space_objects)
+    x, y, m = store.x.tolist(), store.y.tolist(), store.m.tolist()
+    n = len(x)
+    for i in range(n):
+        xi, yi, mi = x[i], y[i], m[i]
+        fx = fy = 0
+        for j in range(n):
+            if i == j:
+                continue  # тело не действует гравитационной силой на само себя!
+            r = ((xi - x[j]) ** 2 + (yi - y[j]) ** 2) ** 0.5
+            fx += gravitational_constant * m[j] * mi / r ** 3 * (x[j] - xi)
+            fy += gravitational_constant * m[j] * mi / r ** 3 * (y[j] - yi)
+        store.Fx[i] = fx
+        store.Fy[i] = fy
+    store.copy_to(space_objects)
+
+
+def calculate_forces_numpy(space_objects, softening=None):
+    """Вычисляет силы, действующие на все тела, с помощью векторных операций NumPy.
+    Результат совпадает с calculate_forces_direct с точностью до ошибок округления.
+
+    Параметры:
+
+    **space_objects** — хранилище или список объектов, для которых нужно вычислить силы.
+    **softening** — длина сглаживания, по умолчанию берётся softening_length.
+    """
+    store = as_space_objects(space_objects)
+    ax, ay = calculate_accelerations(store.x, store.y, store.m, softening)
+    store.Fx[:] = store.m * ax
+    store.Fy[:] = store.m * ay
+    store.copy_to(space_objects)
+
+
+def calculate_forces_barnes_hut(space_objects):
+    """Вычисляет силы, действующие на все тела, методом Барнса — Хата (см. модуль solar_tree).
+
+    Параметры:
+
+    **space_objects** — список объектов, для которых нужно вычислить силы.
+    """
+    import solar_tree
+    solar_tree.calculate_forces_barnes_hut(space_objects)
+
+
+def calculate_forces_parallel(space_objects):
+    """Вычисляет силы, действующие на все тела, на нескольких ядрах (см. модуль solar_parallel).
+
+    Параметры:
+
+    **space_objects** — список объектов, для которых нужно вычислить силы.
+    """
+    import solar_parallel
+    solar_parallel.calculate_forces_parallel(space_objects)
+
+
+force_engines = {
+    "direct": calculate_forces_direct,
+    "numpy": calculate_forces_numpy,
+    "barnes_hut": calculate_forces_barnes_hut,
+    "parallel": calculate_forces_parallel,
+}
+"""Доступные способы вычисления сил: название -> функция, заполняющая Fx и Fy всех тел"""
+
+
+def direct_accelerations(x, y, m, softening=None, targets=None, potential=False):
+    """Вычисляет ускорения тел попарным перебором в цикле, так же как calculate_force.
+    Возвращает пару массивов (ax, ay) для тел из **targets**
+    или тройку (ax, ay, phi) вместе с потенциалом при **potential**.
+
+    Параметры:
+
+    **x**, **y** — массивы координат всех тел.
+    **m** — массив масс всех тел.
+    **softening** — длина сглаживания, по умолчанию берётся softening_length.
+    **targets** — индексы тел, для которых нужны ускорения (по умолчанию все тела).
+    **potential** — вычислить ли также потенциал.
+    """
+    if softening is None:
+        softening = softening_length
+    x, y, m = list(map(float, x)), list(map(float, y)), list(map(float, m))
+    if targets is None:
+        targets = range(len(x))
+    eps2 = softening ** 2
+    ax = np.zeros(len(targets))
+    ay = np.zeros(len(targets))
+    phi = np.zeros(len(targets))
+    for k, i in enumerate(targets):
+        for j in range(len(x)):
+            if i == j:
+                continue  # тело не действует гравитационной силой на само себя!
+            r = ((x[i] - x[j]) ** 2 + (y[i] - y[j]) ** 2 + eps2) ** 0.5
+            ax[k] += gravitational_constant * m[j] / r ** 3 * (x[j] - x[i])
+            ay[k] += gravitational_constant * m[j] / r ** 3 * (y[j] - y[i])
+            phi[k] -= gravitational_constant * m[j] / r
+    if potential:
+        return ax, ay, phi
+    return ax, ay
+
+
+def barnes_hut_accelerations(x, y, m, softening=None, targets=None, potential=False):
+    """Вычисляет ускорения тел методом Барнса — Хата (см. модуль solar_tree).
+    При **potential** возвращает также потенциал в точках тел.
+
+    Параметры:
+
+    **x**, **y** — массивы координат всех тел.
+    **m** — массив масс всех тел.
+    **softening** — длина сглаживания, по умолчанию берётся softening_length.
+    **targets** — индексы тел, для которых нужны ускорения (по умолчанию все тела).
+    **potential** — вычислить ли также потенциал.
+    """
+    import solar_tree
+    return solar_tree.tree_accelerations(x, y, m, softening=softening, targets=targets, potential=potential)
+
+
+def parallel_accelerations(x, y, m, softening=None, targets=None, potential=False):
+    """Вычисляет ускорения тел пулом процессов (см. модуль solar_parallel).
+    Результат совпадает с calculate_accelerations побитно при любом числе процессов.
+
+    Параметры:
+
+    **x**, **y** — массивы координат всех тел.
+    **m** — массив масс всех тел.
+    **softening** — длина сглаживания, по умолчанию берётся softening_length.
+    **targets** — индексы тел, для которых нужны ускорения (по умолчанию все тела).
+    **potential** — вычислить ли также потенциал.
+    """
+    import solar_parallel
+    return solar_parallel.parallel_accelerations(x, y, m, softening, targets, potential)
+
+
+acceleration_engines = {
+    "direct": direct_accelerations,
+    "numpy": calculate_accelerations,
+    "barnes_hut": barnes_hut_accelerations,
+    "parallel": parallel_accelerations,
+}
+"""Те же способы вычисления сил в виде функций (x, y, m, softening, targets, potential) -> (ax, ay[, phi])"""
+
+
+class IntegratorState:
+    """Состояние интегратора, сохраняемое между шагами.
+    Содержит ускорения, вычисленные в конце прошлого шага, счётчики вычислений сил
+    и текущий внутренний шаг адаптивного интегратора.
+    """
+
+    ax = None
+    """Ускорения тел по оси **x** в точке (cache_x, cache_y)"""
+
+    ay = None
+    """Ускорения тел по оси **y** в точке (cache_x, cache_y)"""
+
+    cache_x = None
+    """Координаты **x**, для которых вычислены ax и ay"""
+
+    cache_y = None
+    """Координаты **y**, для которых вычислены ax и ay"""
+
+    cache_m = None
+    """Массы, для которых вычислены ax и ay"""
+
+    potential = None
+    """Потенциал в точках тел, вычисленный вместе с ax и ay (None, если не вычислялся)"""
+
+    want_potential = False
+    """Вычислять ли потенциал при следующих вычислениях сил для всех тел"""
+
+    h = None
+    """Внутренний шаг адаптивного интегратора"""
+
+    force_evaluations = 0
+    """Число вычислений сил (одно вычисление — силы для всех или части тел)"""
+
+    pair_evaluations = 0
+    """Число вычисленных парных взаимодействий"""
+
+    steps = 0
+    """Число выполненных шагов"""
+
+    levels = None
+    """Уровни блочных шагов тел: тело уровня k движется с шагом dt / 2 ** k"""
+
+    interaction = None
+    """Ускорения планет от взаимодействия друг с другом для схемы Уиздома — Холмана:
+    кортеж (x, y, m, ax, ay) с координатами и массами, для которых они вычислены"""
+
+    reference_pair_evaluations = 0
+    """Число парных взаимодействий, которое потребовалось бы при общем для всех тел шаге,
+    равном самому мелкому из блочных шагов"""
+
+
+def evaluate_accelerations(space_objects, engine, state, targets=None):
+    """Вычисляет ускорения тел хранилища и учитывает вычисление в счётчиках состояния.
+
+    Параметры:
+
+    **space_objects** — хранилище SpaceObjects.
+    **engine** — название способа вычисления сил.
+    **state** — состояние интегратора IntegratorState.
+    **targets** — индексы тел, для которых нужны ускорения (по умолчанию все тела).
+    """
+    n = len(space_objects)
+    with_potential = state.want_potential and targets is None
+    with solar_profile.timer("force"):
+        result = acceleration_engines[engine](space_objects.x, space_objects.y, space_objects.m, targets=targets,
+                                              potential=with_potential)
+    state.force_evaluations += 1
+    state.pair_evaluations += (n if targets is None else len(targets)) * (n - 1)
+    state.potential = result[2] if with_potential else None
+    return result[0], result[1]
+
+
+def _cache_matches(space_objects, state):
+    """Проверяет, вычислены ли запомненные ускорения для текущего положения и масс тел."""
+    return state.ax is not None and len(state.ax) == len(space_objects) \
+        and np.array_equal(state.cache_x, space_objects.x) and np.array_equal(state.cache_y, space_objects.y) \
+        and np.array_equal(state.cache_m, space_objects.m)
+
+
+def current_accelerations(space_objects, engine, state):
+    """Возвращает ускорения всех тел в текущем положении.
+    Повторно использует ускорения с конца прошлого шага, если тела с тех пор не менялись.
+
+    Параметры:
+
+    **space_objects** — хранилище SpaceObjects.
+    **engine** — название способа вычисления сил.
+    **state** — состояние интегратора IntegratorState.
+    """
+    if _cache_matches(space_objects, state):
+        return state.ax, state.ay
+    return remember_accelerations(space_objects, state, *evaluate_accelerations(space_objects, engine, state))
+
+
+def current_potential(space_objects, engine, state):
+    """Возвращает потенциал в точках тел для текущего положения.
+    Если последнее вычисление сил было сделано в этом же положении и с потенциалом, новых вычислений нет,
+    иначе силы и потенциал вычисляются одним проходом и запоминаются для следующего шага.
+
+    Параметры:
+
+    **space_objects** — хранилище SpaceObjects.
+    **engine** — название способа вычисления сил.
+    **state** — состояние интегратора IntegratorState.
+    """
+    if _cache_matches(space_objects, state) and state.potential is not None:
+        return state.potential
+    want_potential = state.want_potential
+    state.want_potential = True
+    ax, ay = evaluate_accelerations(space_objects, engine, state)
+    state.want_potential = want_potential
+    potential = state.potential
+    remember_accelerations(space_objects, state, ax, ay)
+    state.potential = potential
+    return potential
+
+
+def remember_accelerations(space_objects, state, ax, ay):
+    """Запоминает ускорения для текущего положения тел и записывает соответствующие силы в Fx, Fy.
+    Возвращает пару (ax, ay).
+
+    Параметры:
+
+    **space_objects** — хранилище SpaceObjects.
+    **state** — состояние интегратора IntegratorState.
+    **ax**, **ay** — ускорения тел.
+    """
+    state.ax, state.ay = ax, ay
+    state.cache_x = space_objects.x.copy()
+    state.cache_y = space_objects.y.copy()
+    state.cache_m = space_objects.m.copy()
+    space_objects.Fx[:] = space_objects.m * ax
+    space_objects.Fy[:] = space_objects.m * ay
+    return ax, ay
+
+
 def move_space_object(body, dt, t, sun):
     """Перемещает тело в соответствии с действующей на него силой.
 
@@ -45,26 +396,803 @@ def move_space_object(body, dt, t, sun):
     return [(body.Vx ** 2 + body.Vy ** 2) ** (1 / 2), ((sun.x - body.x) ** 2 + (sun.y - body.y) ** 2) ** (1 / 2), t]
 
 
-def recalculate_space_objects_positions(space_objects, dt, t):
+def move_space_objects(space_objects, dt):
+    """Перемещает все тела хранилища в соответствии с действующими на них силами.
+    Выполняет те же вычисления, что и move_space_object, но сразу над массивами.
+
+    Параметры:
+
+    **space_objects** — хранилище SpaceObjects.
+    **dt** - величина малого промежутка времени, перемещение за которое рассматривается
+    """
+    small_time_factor = 1000
+    small_dt = dt / small_time_factor
+    x, y, vx, vy = space_objects.x, space_objects.y, space_objects.Vx, space_objects.Vy
+    ax = space_objects.Fx / space_objects.m
+    ay = space_objects.Fy / space_objects.m
+    if len(x) <= scalar_bodies:
+        # на массивах из нескольких элементов каждая операция NumPy стоит дороже, чем весь расчёт
+        for k, (bx, by, bvx, bvy, bax, bay) in enumerate(zip(x.tolist(), y.tolist(), vx.tolist(), vy.tolist(),
+                                                              ax.tolist(), ay.tolist())):
+            for i in range(small_time_factor):
+                bx += bvx * small_dt
+                bvx += bax * small_dt
+                by += bvy * small_dt
+                bvy += bay * small_dt
+            x[k], y[k], vx[k], vy[k] = bx, by, bvx, bvy
+        return
+    for i in range(small_time_factor):
+        x += vx * small_dt
+        vx += ax * small_dt
+        y += vy * small_dt
+        vy += ay * small_dt
+
+
+def body_stats(space_objects, index, t):
+    """Возвращает статистику тела: [модуль скорости, расстояние до первого тела, время].
+
+    Параметры:
+
+    **space_objects** — хранилище SpaceObjects.
+    **index** — индекс тела.
+    **t** - момент времени
+    """
+    body, sun = space_objects[index], space_objects[0]
+    return [(body.Vx ** 2 + body.Vy ** 2) ** (1 / 2), ((sun.x - body.x) ** 2 + (sun.y - body.y) ** 2) ** (1 / 2), t]
+
+
+def integrate_euler(space_objects, dt, engine, state):
+    """Исходная схема: силы вычисляются один раз в начале шага,
+    затем шаг делится на 1000 явных шагов Эйлера (см. move_space_objects).
+
+    Параметры:
+
+    **space_objects** — хранилище SpaceObjects.
+    **dt** — шаг по времени.
+    **engine** — название способа вычисления сил.
+    **state** — состояние интегратора IntegratorState.
+    """
+    force_engines[engine](space_objects)
+    state.force_evaluations += 1
+    state.pair_evaluations += len(space_objects) * (len(space_objects) - 1)
+    move_space_objects(space_objects, dt)
+
+
+def integrate_leapfrog(space_objects, dt, engine, state):
+    """Схема «толчок — сдвиг — толчок» (leapfrog, скоростной метод Верле), второй порядок.
+    Симплектична, поэтому энергия не уходит систематически.
+    Ускорения конца шага используются в начале следующего: одно вычисление сил на шаг.
+
+    Параметры:
+
+    **space_objects** — хранилище SpaceObjects.
+    **dt** — шаг по времени.
+    **engine** — название способа вычисления сил.
+    **state** — состояние интегратора IntegratorState.
+    """
+    ax, ay = current_accelerations(space_objects, engine, state)
+    space_objects.Vx += ax * (dt / 2)
+    space_objects.Vy += ay * (dt / 2)
+    space_objects.x += space_objects.Vx * dt
+    space_objects.y += space_objects.Vy * dt
+    ax, ay = remember_accelerations(space_objects, state, *evaluate_accelerations(space_objects, engine, state))
+    space_objects.Vx += ax * (dt / 2)
+    space_objects.Vy += ay * (dt / 2)
+
+
+yoshida_w1 = 1 / (2 - 2 ** (1 / 3))
+yoshida_w0 = -2 ** (1 / 3) / (2 - 2 ** (1 / 3))
+yoshida_drifts = (yoshida_w1 / 2, (yoshida_w0 + yoshida_w1) / 2, (yoshida_w0 + yoshida_w1) / 2, yoshida_w1 / 2)
+"""Доли шага для сдвигов схемы Йошиды 4-го порядка"""
+yoshida_kicks = (yoshida_w1, yoshida_w0, yoshida_w1)
+"""Доли шага для толчков схемы Йошиды 4-го порядка"""
+
+
+def integrate_yoshida4(space_objects, dt, engine, state):
+    """Симплектическая схема Йошиды 4-го порядка: композиция трёх шагов leapfrog.
+    Три вычисления сил на шаг.
+
+    Параметры:
+
+    **space_objects** — хранилище SpaceObjects.
+    **dt** — шаг по времени.
+    **engine** — название способа вычисления сил.
+    **state** — состояние интегратора IntegratorState.
+    """
+    for drift, kick in zip(yoshida_drifts, yoshida_kicks + (None,)):
+        space_objects.x += space_objects.Vx * (drift * dt)
+        space_objects.y += space_objects.Vy * (drift * dt)
+        if kick is not None:
+            ax, ay = remember_accelerations(space_objects, state, *evaluate_accelerations(space_objects, engine, state))
+            space_objects.Vx += ax * (kick * dt)
+            space_objects.Vy += ay * (kick * dt)
+
+
+dormand_prince_c = (0, 1 / 5, 3 / 10, 4 / 5, 8 / 9, 1, 1)
+dormand_prince_a = (
+    (),
+    (1 / 5,),
+    (3 / 40, 9 / 40),
+    (44 / 45, -56 / 15, 32 / 9),
+    (19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729),
+    (9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656),
+    (35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84),
+)
+"""Коэффициенты метода Дормана — Принса 5(4)"""
+dormand_prince_error = (71 / 57600, 0, -71 / 16695, 71 / 1920, -17253 / 339200, 22 / 525, -1 / 40)
+"""Разность весов решений 5-го и 4-го порядка — оценка локальной ошибки"""
+
+rk45_tolerance = 1E-9
+"""Допустимая относительная локальная ошибка адаптивного интегратора"""
+
+
+def integrate_rk45(space_objects, dt, engine, state):
+    """Адаптивный метод Рунге — Кутты — Дормана — Принса 5(4) с контролем ошибки.
+    Шаг dt проходится внутренними шагами, длина которых подбирается так,
+    чтобы оценка локальной ошибки не превышала rk45_tolerance.
+    Подобранный шаг сохраняется в состоянии и используется на следующем шаге.
+
+    Параметры:
+
+    **space_objects** — хранилище SpaceObjects.
+    **dt** — шаг по времени.
+    **engine** — название способа вычисления сил.
+    **state** — состояние интегратора IntegratorState.
+    """
+    n = len(space_objects)
+    position = np.concatenate((space_objects.x, space_objects.y))
+    velocity = np.concatenate((space_objects.Vx, space_objects.Vy))
+
+    def derivative(pos, vel):
+        space_objects.x[:] = pos[:n]
+        space_objects.y[:] = pos[n:]
+        ax, ay = evaluate_accelerations(space_objects, engine, state)
+        return vel, np.concatenate((ax, ay))
+
+    h = min(state.h or dt, dt)
+    done = 0.0
+    k_first = None
+    while dt - done > 4 * np.finfo(float).eps * dt:  # остаток в несколько ULP не проходится
+        step = min(h, dt - done)
+        if k_first is None:
+            k_first = derivative(position, velocity)
+        k = [k_first]
+        for stage in range(1, 7):
+            a = dormand_prince_a[stage]
+            pos = position + step * sum(coef * kv[0] for coef, kv in zip(a, k) if coef)
+            vel = velocity + step * sum(coef * kv[1] for coef, kv in zip(a, k) if coef)
+            k.append(derivative(pos, vel))
+        err_pos = step * sum(coef * kv[0] for coef, kv in zip(dormand_prince_error, k) if coef)
+        err_vel = step * sum(coef * kv[1] for coef, kv in zip(dormand_prince_error, k) if coef)
+        scale_pos = rk45_tolerance * max(np.abs(position).max(), np.abs(pos).max(), 1.0)
+        scale_vel = rk45_tolerance * max(np.abs(velocity).max(), np.abs(vel).max(), 1E-300)
+        error = max(np.abs(err_pos).max() / scale_pos, np.abs(err_vel).max() / scale_vel)
+        factor = 0.9 * error ** -0.2 if error > 0 else 5.0
+        proposed = step * min(5.0, max(0.2, factor))
+        if error <= 1:
+            final = step == dt - done
+            done = dt if final else done + step
+            position, velocity = pos, vel
+            k_first = k[6]  # последняя стадия совпадает с первой стадией следующего шага
+            if final and step < h:
+                proposed = max(proposed, h)  # укороченный до конца интервала шаг не уменьшает следующий
+        h = proposed
+        if h < dt * 1E-12:
+            raise ArithmeticError("rk45 step size underflow")
+    state.h = h
+    space_objects.x[:] = position[:n]
+    space_objects.y[:] = position[n:]
+    space_objects.Vx[:] = velocity[:n]
+    space_objects.Vy[:] = velocity[n:]
+    remember_accelerations(space_objects, state, k_first[1][:n], k_first[1][n:])
+
+
+block_steps_per_orbit = 200
+"""Желаемое число блочных шагов тела на один оборот по орбите"""
+
+block_max_level = 12
+"""Наибольший уровень блочного шага: шаг тела не бывает меньше dt / 2 ** block_max_level"""
+
+
+def block_time_step_levels(space_objects, dt, ax, ay):
+    """Выбирает для каждого тела уровень k, так что его шаг dt / 2 ** k не больше
+    2π |v| / |a| / block_steps_per_orbit. Для круговой орбиты |v| / |a| = T / 2π,
+    то есть тело делает около block_steps_per_orbit шагов за период.
+    Скорости берутся относительно центра масс системы.
+
+    Параметры:
+
+    **space_objects** — хранилище SpaceObjects.
+    **dt** — основной шаг по времени.
+    **ax**, **ay** — текущие ускорения тел.
+    """
+    m = space_objects.m
+    vx = space_objects.Vx - (m * space_objects.Vx).sum() / m.sum()
+    vy = space_objects.Vy - (m * space_objects.Vy).sum() / m.sum()
+    a = np.hypot(ax, ay)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        wanted = 2 * np.pi * np.hypot(vx, vy) / a / block_steps_per_orbit
+        levels = np.ceil(np.log2(dt / wanted))
+    levels[~np.isfinite(levels) & (a == 0)] = 0
+    levels[~np.isfinite(levels)] = block_max_level
+    return np.clip(levels, 0, block_max_level).astype(np.int64)
+
+
+def integrate_block(space_objects, dt, engine, state):
+    """Схема leapfrog с иерархическими (блочными) шагами по времени.
+    Каждое тело получает шаг dt / 2 ** k (см. block_time_step_levels).
+    Сдвигаются все тела на самом мелком шаге, а силы пересчитываются
+    только для тел, у которых на этом подшаге заканчивается свой шаг.
+    Экономия вычислений видна по block_time_step_report.
+
+    Параметры:
+
+    **space_objects** — хранилище SpaceObjects.
+    **dt** — шаг по времени.
+    **engine** — название способа вычисления сил.
+    **state** — состояние интегратора IntegratorState.
+    """
+    n = len(space_objects)
+    ax, ay = current_accelerations(space_objects, engine, state)
+    ax, ay = ax.copy(), ay.copy()
+    levels = block_time_step_levels(space_objects, dt, ax, ay)
+    state.levels = levels
+    substeps = 1 << int(levels.max())
+    h = dt / substeps
+    stride = 1 << (levels.max() - levels)
+    for s in range(substeps):
+        starting = np.flatnonzero(s % stride == 0)
+        space_objects.Vx[starting] += ax[starting] * (stride[starting] * h / 2)
+        space_objects.Vy[starting] += ay[starting] * (stride[starting] * h / 2)
+        space_objects.x += space_objects.Vx * h
+        space_objects.y += space_objects.Vy * h
+        ending = np.flatnonzero((s + 1) % stride == 0)
+        ax[ending], ay[ending] = evaluate_accelerations(space_objects, engine, state,
+                                                        None if len(ending) == n else ending)
+        space_objects.Vx[ending] += ax[ending] * (stride[ending] * h / 2)
+        space_objects.Vy[ending] += ay[ending] * (stride[ending] * h / 2)
+    state.reference_pair_evaluations += substeps * n * (n - 1)
+    remember_accelerations(space_objects, state, ax, ay)
+
+
+def block_time_step_report(state):
+    """Возвращает словарь с числом вычисленных парных взаимодействий (pair_evaluations),
+    числом, которое потребовалось бы при общем самом мелком шаге (reference_pair_evaluations),
+    и долей сэкономленных вычислений (saved).
+
+    Параметры:
+
+    **state** — состояние интегратора IntegratorState после расчёта с интегратором "block".
+    """
+    reference = state.reference_pair_evaluations
+    return {
+        "pair_evaluations": state.pair_evaluations,
+        "reference_pair_evaluations": reference,
+        "saved": 1 - state.pair_evaluations / reference if reference else 0.0,
+    }
+
+
+kepler_tolerance = 1E-13
+"""Относительная точность решения уравнения Кеплера в универсальных переменных"""
+
+kepler_iterations = 50
+"""Наибольшее число итераций Ньютона при решении уравнения Кеплера"""
+
+kepler_halvings = 8
+"""Сколько раз время переноса делится пополам для тел, у которых уравнение Кеплера не решилось"""
+
+wisdom_holman_mass_ratio = 1E-2
+"""Наибольшее отношение суммарной массы планет к массе доминирующего тела для схемы Уиздома — Холмана"""
+
+
+def _stumpff(z):
+    """Функции Штумпфа C(z) и S(z) для массива **z** (рядом Тейлора вблизи нуля)."""
+    small = np.abs(z) < 1E-4
+    root = np.sqrt(np.abs(np.where(small, 1.0, z)))
+    zz = np.where(small, 1.0, z)
+    with np.errstate(over="ignore", invalid="ignore"):
+        c = np.where(z > 0, (1 - np.cos(root)) / zz, (np.cosh(root) - 1) / -zz)
+        s = np.where(z > 0, (root - np.sin(root)) / root ** 3, (np.sinh(root) - root) / root ** 3)
+    c = np.where(small, 1 / 2 - z / 24 + z ** 2 / 720, c)
+    s = np.where(small, 1 / 6 - z / 120 + z ** 2 / 5040, s)
+    return c, s
+
+
+def kepler_drift(x, y, vx, vy, gm, dt, halvings=None):
+    """Точно переносит тела по кеплеровым орбитам вокруг неподвижного центра за время **dt**
+    (уравнение Кеплера в универсальных переменных решается методом Ньютона для всех тел сразу,
+    годится для эллиптических и гиперболических орбит). Возвращает четвёрку (x, y, vx, vy).
+    Тела, для которых метод Ньютона не сошёлся за kepler_iterations итераций, переносятся
+    двумя переносами на половину времени; если не помогает и это, возбуждается ArithmeticError.
+
+    Параметры:
+
+    **x**, **y** — координаты тел относительно центра.
+    **vx**, **vy** — скорости тел.
+    **gm** — гравитационный параметр центра G·M.
+    **dt** — время переноса (число или массив по телам).
+    **halvings** — сколько ещё раз можно делить время пополам, по умолчанию kepler_halvings.
+    """
+    if halvings is None:
+        halvings = kepler_halvings
+    r0 = np.hypot(x, y)
+    alpha = 2 / r0 - (vx ** 2 + vy ** 2) / gm
+    sqrt_gm = np.sqrt(gm)
+    sigma0 = (x * vx + y * vy) / sqrt_gm
+    bound = alpha > 0
+    period = 2 * np.pi / (sqrt_gm * np.where(bound, alpha, 1.0) ** 1.5)
+    dt = np.where(bound, np.fmod(dt, period), dt)  # по замкнутой орбите достаточно остатка от периода
+    chi = np.where(bound, sqrt_gm * dt * alpha, sqrt_gm * dt / r0)
+    for _ in range(kepler_iterations):
+        z = alpha * chi ** 2
+        c, s = _stumpff(z)
+        r = chi ** 2 * c + sigma0 * chi * (1 - z * s) + r0 * (1 - z * c)
+        correction = (sigma0 * chi ** 2 * c + (1 - alpha * r0) * chi ** 3 * s + r0 * chi - sqrt_gm * dt) / r
+        chi = chi - correction
+        converged = np.abs(correction) <= kepler_tolerance * np.maximum(np.abs(chi), 1E-300)
+        if np.all(converged):
+            break
+    z = alpha * chi ** 2
+    c, s = _stumpff(z)
+    f = 1 - chi ** 2 * c / r0
+    g = dt - chi ** 3 * s / sqrt_gm
+    new_x = f * x + g * vx
+    new_y = f * y + g * vy
+    r = np.hypot(new_x, new_y)
+    f_dot = sqrt_gm / (r * r0) * chi * (z * s - 1)
+    g_dot = 1 - chi ** 2 * c / r
+    result = (new_x, new_y, f_dot * x + g_dot * vx, f_dot * y + g_dot * vy)
+    failed = ~converged
+    if failed.any():
+        if halvings <= 0:
+            raise ArithmeticError("Kepler equation did not converge for %d bodies" % np.count_nonzero(failed))
+        half = dt[failed] / 2
+        moved = kepler_drift(x[failed], y[failed], vx[failed], vy[failed], gm, half, halvings - 1)
+        moved = kepler_drift(*moved, gm, half, halvings - 1)
+        for target, value in zip(result, moved):
+            target[failed] = value
+    return result
+
+
+def _interaction_accelerations(x, y, m, engine, state):
+    """Ускорения планет от притяжения друг друга (без центрального тела); повторно использует
+    ускорения с конца прошлого шага, если планеты с тех пор не сдвинулись.
+
+    Параметры:
+
+    **x**, **y**, **m** — координаты и массы планет.
+    **engine** — название способа вычисления сил.
+    **state** — состояние интегратора IntegratorState.
+    """
+    if len(x) < 2:
+        return np.zeros(len(x)), np.zeros(len(x))
+    cache = state.interaction
+    if cache is not None and len(cache[0]) == len(x) and np.array_equal(cache[0], x) \
+            and np.array_equal(cache[1], y) and np.array_equal(cache[2], m):
+        return cache[3], cache[4]
+    ax, ay = acceleration_engines[engine](x, y, m)[:2]
+    state.force_evaluations += 1
+    state.pair_evaluations += len(x) * (len(x) - 1)
+    state.interaction = (x.copy(), y.copy(), m.copy(), ax, ay)
+    return ax, ay
+
+
+def dominant_body(m):
+    """Возвращает индекс доминирующего по массе тела. Если суммарная масса остальных тел больше
+    wisdom_holman_mass_ratio от его массы, схема Уиздома — Холмана неприменима и возбуждается ValueError.
+
+    Параметры:
+
+    **m** — массив масс тел.
+    """
+    star = int(np.argmax(m))
+    ratio = (m.sum() - m[star]) / m[star]
+    if ratio > wisdom_holman_mass_ratio:
+        raise ValueError("wisdom_holman needs a dominant body: planets to star mass ratio %.3g exceeds %.3g"
+                         % (ratio, wisdom_holman_mass_ratio))
+    return star
+
+
+def integrate_wisdom_holman(space_objects, dt, engine, state):
+    """Смешанная симплектическая схема Уиздома — Холмана в демократических гелиоцентрических координатах
+    для систем с одним доминирующим по массе телом, второй порядок.
+    Движение каждой планеты вокруг доминирующего тела переносится точно по кеплеровой орбите
+    (kepler_drift), а притяжение планет друг к другу и движение самого тела добавляются толчками
+    и сдвигами на половину шага. Ошибка пропорциональна отношению масс планет и звезды,
+    поэтому шаг может быть во много раз больше, чем у leapfrog при той же точности.
+    Если отношение больше wisdom_holman_mass_ratio (например, у двойной звезды), возбуждается ValueError.
+    Способ вычисления сил используется только для взаимодействия планет.
+
+    Параметры:
+
+    **space_objects** — хранилище SpaceObjects.
+    **dt** — шаг по времени.
+    **engine** — название способа вычисления сил.
+    **state** — состояние интегратора IntegratorState.
+    """
+    m = space_objects.m
+    star = dominant_body(m)
+    planets = np.arange(len(m)) != star
+    m_star, m_planets, total = m[star], m[planets], m.sum()
+    x, y, vx, vy = space_objects.x, space_objects.y, space_objects.Vx, space_objects.Vy
+    vcm_x, vcm_y = np.dot(m, vx) / total, np.dot(m, vy) / total
+    xcm, ycm = np.dot(m, x) / total + vcm_x * dt, np.dot(m, y) / total + vcm_y * dt
+    qx, qy = x[planets] - x[star], y[planets] - y[star]
+    ux, uy = vx[planets] - vcm_x, vy[planets] - vcm_y
+
+    ax, ay = _interaction_accelerations(x[planets], y[planets], m_planets, engine, state)
+    ux += ax * (dt / 2)
+    uy += ay * (dt / 2)
+    qx += np.dot(m_planets, ux) / m_star * (dt / 2)
+    qy += np.dot(m_planets, uy) / m_star * (dt / 2)
+    qx, qy, ux, uy = kepler_drift(qx, qy, ux, uy, gravitational_constant * m_star, dt)
+    qx += np.dot(m_planets, ux) / m_star * (dt / 2)
+    qy += np.dot(m_planets, uy) / m_star * (dt / 2)
+    x[star] = xcm - np.dot(m_planets, qx) / total
+    y[star] = ycm - np.dot(m_planets, qy) / total
+    x[planets] = qx + x[star]
+    y[planets] = qy + y[star]
+    ax, ay = _interaction_accelerations(x[planets], y[planets], m_planets, engine, state)
+    ux += ax * (dt / 2)
+    uy += ay * (dt / 2)
+    vx[star] = vcm_x - np.dot(m_planets, ux) / m_star
+    vy[star] = vcm_y - np.dot(m_planets, uy) / m_star
+    vx[planets] = ux + vcm_x
+    vy[planets] = uy + vcm_y
+
+
+integrators = {
+    "euler": integrate_euler,
+    "leapfrog": integrate_leapfrog,
+    "yoshida4": integrate_yoshida4,
+    "rk45": integrate_rk45,
+    "block": integrate_block,
+    "wisdom_holman": integrate_wisdom_holman,
+}
+"""Доступные интеграторы: название -> функция (space_objects, dt, engine, state)"""
+
+
+def recalculate_space_objects_positions(space_objects, dt, t, engine="direct", integrator="euler", state=None):
     """Пересчитывает координаты объектов.
+    Возвращает статистику второго тела (см. body_stats) или 0, если тел меньше двух.
 
     Параметры:
 
-    **space_objects** — список оьъектов, для которых нужно пересчитать координаты.
+    **space_objects** — хранилище или список оьъектов, для которых нужно пересчитать координаты.
     **dt** — шаг по времени
     **t** - момент времени
+    **engine** - название способа вычисления сил из force_engines
+    **integrator** - название интегратора из integrators
+    **state** - состояние интегратора IntegratorState; его стоит передавать между шагами,
+    чтобы не вычислять силы повторно
+    """
+    store = as_space_objects(space_objects)
+    if state is None:
+        state = IntegratorState()
+    with solar_profile.timer("integrate"):
+        integrators[integrator](store, dt, engine, state)
+    state.steps += 1
+    store.copy_to(space_objects)
+    if len(store) < 2:
+        return 0
+    return body_stats(store, 1, t)
+
+
+class Simulation:
+    """Расчёт движения системы тел: сами тела, физическое время
+    и параметры интегрирования, общие для всех шагов.
+    """
+
+    def __init__(self, space_objects, dt=1.0, engine="direct", integrator="euler", physical_time=0.0):
+        """
+        Параметры:
+
+        **space_objects** — хранилище или список космических объектов.
+        **dt** — шаг по времени.
+        **engine** — название способа вычисления сил из force_engines.
+        **integrator** — название интегратора из integrators.
+        **physical_time** — начальное физическое время.
+        """
+        self.space_objects = as_space_objects(space_objects)
+        """Хранилище космических объектов"""
+        self.dt = dt
+        """Шаг по времени"""
+        self.engine = engine
+        """Способ вычисления сил"""
+        self.integrator = integrator
+        """Интегратор уравнений движения"""
+        self.physical_time = physical_time
+        """Физическое время от начала расчёта"""
+        self.state = IntegratorState()
+        """Состояние интегратора между шагами"""
+        self.last_stats = 0
+        """Статистика второго тела после последнего шага (см. body_stats)"""
+        self.monitor = None
+        """Монитор сохраняющихся величин (solar_diagnostics.ConservationMonitor) или None"""
+        self.collisions = None
+        """Поиск столкновений (solar_collisions.CollisionDetector) или None"""
+
+    def step(self):
+        """Выполняет один шаг по времени и возвращает статистику второго тела."""
+        if self.monitor is not None:
+            self.monitor.before_step(self)
+        self.last_stats = recalculate_space_objects_positions(self.space_objects, self.dt, self.physical_time,
+                                                              self.engine, self.integrator, self.state)
+        self.physical_time += self.dt
+        if self.collisions is not None:
+            with solar_profile.timer("collisions"):
+                self.collisions.after_step(self)
+        if self.monitor is not None:
+            self.monitor.after_step(self)
+        return self.last_stats
+
+    def run(self, steps=None, until=None):
+        """Выполняет **steps** шагов или считает, пока физическое время не достигнет **until**.
+        Возвращает число выполненных шагов.
+
+        Параметры:
+
+        **steps** — число шагов.
+        **until** — момент физического времени, до которого нужно считать.
+        """
+        done = 0
+        while (steps is None or done < steps) and (until is None or self.physical_time < until):
+            if steps is None and until is None:
+                break
+            self.step()
+            done += 1
+        return done
+
+
+def ensemble_accelerations(x, y, m, softening=None, potential=False):
+    """Вычисляет ускорения тел сразу для многих независимых систем.
+    Массивы имеют форму (K, N): K систем по N тел; тела разных систем друг на друга не действуют.
+    Для каждой системы вычисления те же, что в calculate_accelerations.
+    Возвращает пару массивов (ax, ay) формы (K, N), а при **potential** — тройку (ax, ay, phi).
+
+    Параметры:
+
+    **x**, **y** — координаты тел, форма (K, N).
+    **m** — массы тел, форма (K, N).
+    **softening** — длина сглаживания, по умолчанию берётся softening_length.
+    **potential** — вычислить ли также потенциал.
+    """
+    if softening is None:
+        softening = softening_length
+    count, n = x.shape
+    ax = np.empty((count, n))
+    ay = np.empty((count, n))
+    phi = np.empty((count, n)) if potential else None
+    gm = gravitational_constant * m
+    eps2 = softening ** 2
+    diagonal = np.arange(n)
+    block = max(1, block_elements // max(1, n * n))
+    for start in range(0, count, block):
+        systems = slice(start, start + block)
+        dx = x[systems, np.newaxis, :] - x[systems, :, np.newaxis]
+        dy = y[systems, np.newaxis, :] - y[systems, :, np.newaxis]
+        r2 = dx * dx + dy * dy + eps2
+        r2[:, diagonal, diagonal] = np.inf  # тело не действует гравитационной силой на само себя!
+        gm_r = gm[systems, np.newaxis, :] / np.sqrt(r2)
+        factor = gm_r / r2
+        ax[systems] = (factor * dx).sum(axis=2)
+        ay[systems] = (factor * dy).sum(axis=2)
+        if potential:
+            phi[systems] = -gm_r.sum(axis=2)
+    if potential:
+        return ax, ay, phi
+    return ax, ay
+
+
+def integrate_ensemble_leapfrog(x, y, vx, vy, m, dt, ax, ay):
+    """Шаг leapfrog для ансамбля систем (см. integrate_leapfrog); массивы формы (K, N) меняются на месте.
+    **ax**, **ay** — ускорения в начале шага. Возвращает тройку (ax, ay, phi) в конце шага.
+    """
+    vx += ax * (dt / 2)
+    vy += ay * (dt / 2)
+    x += vx * dt
+    y += vy * dt
+    ax, ay, phi = ensemble_accelerations(x, y, m, potential=True)
+    vx += ax * (dt / 2)
+    vy += ay * (dt / 2)
+    return ax, ay, phi
+
+
+def integrate_ensemble_yoshida4(x, y, vx, vy, m, dt, ax, ay):
+    """Шаг схемы Йошиды 4-го порядка для ансамбля систем (см. integrate_yoshida4).
+    Ускорения начала шага не нужны; возвращает тройку (None, None, None):
+    последнее вычисление сил сделано не в конечном положении тел.
+    """
+    for drift, kick in zip(yoshida_drifts, yoshida_kicks + (None,)):
+        x += vx * (drift * dt)
+        y += vy * (drift * dt)
+        if kick is not None:
+            ax, ay = ensemble_accelerations(x, y, m)
+            vx += ax * (kick * dt)
+            vy += ay * (kick * dt)
+    return None, None, None
+
+
+ensemble_integrators = {
+    "leapfrog": integrate_ensemble_leapfrog,
+    "yoshida4": integrate_ensemble_yoshida4,
+}
+"""Интеграторы ансамбля систем"""
+
+ensemble_status = ("running", "finished", "diverged")
+"""Состояния систем ансамбля: считается, досчитана, разошлась"""
+
+
+class Ensemble:
+    """Ансамбль из K независимых систем по N тел, которые считаются вместе:
+    поля тел хранятся в массивах формы (K, N), и один шаг продвигает все системы одним векторным проходом.
+    Досчитанные и разошедшиеся системы исключаются из расчёта маской active.
     """
-    count = 0
-    new_stats = 0
-    for body in space_objects:
-        calculate_force(body, space_objects)
-    for body in space_objects:
-        if count == 1:
-            new_stats = move_space_object(body, dt, t, space_objects[0])
-        else:
-            move_space_object(body, dt, t, space_objects[0])
-        count += 1
-    return new_stats
+
+    def __init__(self, m, x, y, Vx, Vy, dt=1.0, integrator="leapfrog", escape_distance=None,
+                 max_energy_drift=None):
+        """
+        Параметры:
+
+        **m**, **x**, **y**, **Vx**, **Vy** — поля тел, массивы формы (K, N).
+        **dt** — шаг по времени, общий для всех систем.
+        **integrator** — название интегратора из ensemble_integrators.
+        **escape_distance** — система считается разошедшейся, если тело удалилось от её центра масс
+        дальше этого расстояния (None — не проверять).
+        **max_energy_drift** — система считается разошедшейся, если относительный уход её полной энергии
+        больше этого значения (None — не проверять).
+        """
+        if integrator not in ensemble_integrators:
+            raise ValueError("unknown ensemble integrator: %r" % integrator)
+        self.m = np.array(m, dtype=float)
+        """Массы тел, форма (K, N)"""
+        self.x = np.array(x, dtype=float)
+        """Координаты тел по оси **x**"""
+        self.y = np.array(y, dtype=float)
+        """Координаты тел по оси **y**"""
+        self.Vx = np.array(Vx, dtype=float)
+        """Скорости тел по оси **x**"""
+        self.Vy = np.array(Vy, dtype=float)
+        """Скорости тел по оси **y**"""
+        self.dt = dt
+        """Шаг по времени"""
+        self.integrator = integrator
+        """Интегратор"""
+        self.escape_distance = escape_distance
+        """Расстояние от центра масс системы, за которым тело считается ушедшим (None — не проверять)"""
+        self.max_energy_drift = max_energy_drift
+        """Наибольший допустимый относительный уход полной энергии системы (None — не проверять)"""
+        count = len(self.m)
+        self.active = np.ones(count, dtype=bool)
+        """Маска систем, которые ещё считаются"""
+        self.status = np.zeros(count, dtype=np.int8)
+        """Состояние каждой системы: индекс в ensemble_status"""
+        self.steps = np.zeros(count, dtype=np.int64)
+        """Число шагов, сделанных каждой системой"""
+        self.physical_time = np.zeros(count)
+        """Физическое время каждой системы"""
+        self.force_evaluations = 0
+        """Число вычислений сил (одно вычисление — для всех считающихся систем)"""
+        self.initial_energy = None
+        """Полная энергия каждой системы в начале расчёта (вычисляется перед первым шагом,
+        поэтому поля тел можно менять после создания ансамбля)"""
+        self._ax = self._ay = None
+
+    @classmethod
+    def from_space_objects(cls, space_objects, count, **options):
+        """Создаёт ансамбль из **count** копий системы тел; копии затем можно возмутить через массивы ансамбля.
+
+        Параметры:
+
+        **space_objects** — хранилище или список космических объектов.
+        **count** — число систем.
+        **options** — остальные параметры Ensemble (dt, integrator, ...).
+        """
+        store = as_space_objects(space_objects)
+        return cls(*(np.tile(store.arrays[name], (count, 1)) for name in ("m", "x", "y", "Vx", "Vy")), **options)
+
+    def __len__(self):
+        return len(self.m)
+
+    def _energy(self, rows, phi):
+        """Полная энергия систем **rows** по потенциалу **phi** в точках тел."""
+        m, vx, vy = self.m[rows], self.Vx[rows], self.Vy[rows]
+        return 0.5 * (m * (vx * vx + vy * vy)).sum(axis=1) + 0.5 * (m * phi).sum(axis=1)
+
+    def step(self):
+        """Делает один шаг по времени для всех считающихся систем и проверяет, не разошлись ли они.
+        Возвращает число считающихся систем."""
+        if not self.active.any():
+            return 0
+        if self.initial_energy is None:
+            self._ax, self._ay, phi = ensemble_accelerations(self.x, self.y, self.m, potential=True)
+            self.force_evaluations += 1
+            self.initial_energy = self._energy(slice(None), phi)
+        rows = slice(None) if self.active.all() else np.flatnonzero(self.active)
+        x, y, vx, vy, m = self.x[rows], self.y[rows], self.Vx[rows], self.Vy[rows], self.m[rows]
+        ax, ay, phi = ensemble_integrators[self.integrator](x, y, vx, vy, m, self.dt, self._ax[rows], self._ay[rows])
+        self.force_evaluations += 1 if self.integrator == "leapfrog" else len(yoshida_kicks)
+        if not isinstance(rows, slice):
+            self.x[rows], self.y[rows], self.Vx[rows], self.Vy[rows] = x, y, vx, vy
+        if ax is None:
+            phi = None
+            if self.max_energy_drift is not None:
+                ax, ay, phi = ensemble_accelerations(x, y, m, potential=True)
+                self.force_evaluations += 1
+        self._ax[rows], self._ay[rows] = ax, ay
+        self.steps[rows] += 1
+        self.physical_time[rows] += self.dt
+        self._check(rows, phi)
+        return int(self.active.sum())
+
+    def _check(self, rows, phi):
+        """Исключает из расчёта системы **rows**, которые разошлись: с бесконечными или неопределёнными
+        координатами, с телом дальше escape_distance от центра масс или с уходом энергии больше допустимого."""
+        x, y, m = self.x[rows], self.y[rows], self.m[rows]
+        diverged = ~(np.isfinite(x).all(axis=1) & np.isfinite(y).all(axis=1))
+        if self.escape_distance is not None:
+            total = m.sum(axis=1, keepdims=True)
+            cx = (m * x).sum(axis=1, keepdims=True) / total
+            cy = (m * y).sum(axis=1, keepdims=True) / total
+            diverged |= (np.hypot(x - cx, y - cy) > self.escape_distance).any(axis=1)
+        if self.max_energy_drift is not None:
+            diverged |= self._drift(rows, phi) > self.max_energy_drift
+        self.deactivate(np.arange(len(self))[rows][diverged], "diverged")
+
+    def deactivate(self, systems, status="finished"):
+        """Исключает системы из расчёта.
+
+        Параметры:
+
+        **systems** — индексы или маска систем.
+        **status** — новое состояние систем из ensemble_status.
+        """
+        self.status[systems] = ensemble_status.index(status)
+        self.active[systems] = False
+
+    def run(self, steps=None, until=None):
+        """Выполняет **steps** шагов или считает, пока физическое время систем не достигнет **until**
+        (числа или массива длины K); досчитанные системы исключаются из расчёта.
+        Возвращает число выполненных шагов.
+
+        Параметры:
+
+        **steps** — число шагов.
+        **until** — момент физического времени, до которого нужно считать.
+        """
+        done = 0
+        while steps is None or done < steps:
+            if until is not None:
+                self.deactivate(self.active & (self.physical_time >= until))
+            elif steps is None:
+                break
+            if not self.step():
+                break
+            done += 1
+        return done
+
+    def _drift(self, rows, phi):
+        """Относительный уход полной энергии систем **rows** по потенциалу **phi** в точках тел."""
+        initial = self.initial_energy[rows]
+        return np.abs(self._energy(rows, phi) - initial) / np.where(initial != 0, np.abs(initial), 1.0)
+
+    def energy_drift(self):
+        """Вычисляет относительный уход полной энергии каждой системы в текущем положении."""
+        if self.initial_energy is None:
+            return np.zeros(len(self))
+        phi = ensemble_accelerations(self.x, self.y, self.m, potential=True)[2]
+        return self._drift(slice(None), phi)
+
+    def results(self):
+        """Возвращает список словарей с итогом для каждой системы: состояние, число шагов, время,
+        уход энергии и конечные положения и скорости тел."""
+        drift = self.energy_drift()
+        return [
+            {"system": k, "status": ensemble_status[self.status[k]], "steps": int(self.steps[k]),
+             "physical_time": float(self.physical_time[k]), "energy_drift": float(drift[k]),
+             "x": self.x[k].tolist(), "y": self.y[k].tolist(), "Vx": self.Vx[k].tolist(), "Vy": self.Vy[k].tolist()}
+            for k in range(len(self))
+        ]
 
 
 if __name__ == "__main__":
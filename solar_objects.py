@@ -1,6 +1,9 @@
 # coding: utf-8
 # license: GPLv3
 
+import itertools
+import numpy as np
+
 
 class Star:
     """Тип данных, описывающий звезду.
@@ -80,3 +83,301 @@ class Planet:
 
     image = None
     """Изображение планеты"""
+
+
+def _numeric_property(name, doc):
+    """Создаёт свойство представления тела, читающее и записывающее числовое поле хранилища."""
+
+    def getter(self):
+        return float(self._store._data[name][self._index])
+
+    def setter(self, value):
+        self._store._data[name][self._index] = value
+
+    return property(getter, setter, doc=doc)
+
+
+def _table_property(name, doc):
+    """Создаёт свойство представления тела, читающее и записывающее поле из таблицы хранилища."""
+
+    def getter(self):
+        return getattr(self._store, name)[self._index]
+
+    def setter(self, value):
+        getattr(self._store, name)[self._index] = value
+
+    return property(getter, setter, doc=doc)
+
+
+def _array_property(name, doc):
+    """Создаёт свойство хранилища, выдающее числовое поле всех тел как массив без копирования.
+    Присваивание записывает значения в этот массив."""
+
+    def getter(self):
+        return self._data[name][:self._n]
+
+    def setter(self, value):
+        self._data[name][:self._n] = value
+
+    return property(getter, setter, doc=doc)
+
+
+class SpaceObject:
+    """Лёгкое представление одного тела из хранилища SpaceObjects.
+    Само не хранит данных: все поля читаются из массивов хранилища по индексу тела.
+    """
+
+    __slots__ = ("_store", "_index")
+
+    def __init__(self, store, index):
+        self._store = store
+        self._index = index
+
+    m = _numeric_property("m", "Масса тела")
+    x = _numeric_property("x", "Координата по оси **x**")
+    y = _numeric_property("y", "Координата по оси **y**")
+    Vx = _numeric_property("Vx", "Скорость по оси **x**")
+    Vy = _numeric_property("Vy", "Скорость по оси **y**")
+    Fx = _numeric_property("Fx", "Сила по оси **x**")
+    Fy = _numeric_property("Fy", "Сила по оси **y**")
+    R = _numeric_property("R", "Радиус тела в пикселах")
+    type = _table_property("types", "Признак объекта: \"star\" или \"planet\"")
+    color = _table_property("colors", "Цвет тела")
+    image = _table_property("images", "Изображение тела")
+
+    @property
+    def index(self):
+        """Положение тела в массивах хранилища"""
+        return self._index
+
+    @property
+    def id(self):
+        """Постоянный номер тела, не меняющийся при удалении других тел"""
+        return int(self._store.ids[self._index])
+
+    def __repr__(self):
+        return "<%s %s m=%g x=%g y=%g>" % (self.type, self.color, self.m, self.x, self.y)
+
+
+class SpaceObjects:
+    """Хранилище космических объектов в виде структуры массивов.
+    Числовые поля всех тел (m, x, y, Vx, Vy, Fx, Fy, R) лежат в непрерывных массивах NumPy,
+    тип, цвет и изображение — в списках. Ведёт себя как список тел: поддерживает
+    индексирование, перебор, append и pop, выдавая представления SpaceObject.
+    Физический движок работает напрямую с массивами, не копируя их.
+    """
+
+    numeric_fields = ("m", "x", "y", "Vx", "Vy", "Fx", "Fy", "R")
+    """Числовые поля тел"""
+
+    def __init__(self, bodies=(), capacity=16):
+        """Создаёт хранилище и добавляет в него тела.
+
+        Параметры:
+
+        **bodies** — тела (объекты с полями Star/Planet), которыми заполняется хранилище.
+        **capacity** — начальный размер массивов.
+        """
+        self._n = 0
+        self._next_id = 0
+        self._data = {name: np.zeros(capacity) for name in self.numeric_fields}
+        self._ids = np.zeros(capacity, dtype=np.int64)
+        self.types = []
+        """Типы тел"""
+        self.colors = []
+        """Цвета тел"""
+        self.images = []
+        """Изображения тел на холсте"""
+        self._views = []
+        self.extend(bodies)
+
+    @property
+    def arrays(self):
+        """Словарь числовых полей: название -> массив длины len(self) (представление без копирования)"""
+        return {name: array[:self._n] for name, array in self._data.items()}
+
+    m = _array_property("m", "Массы тел")
+    x = _array_property("x", "Координаты тел по оси **x**")
+    y = _array_property("y", "Координаты тел по оси **y**")
+    Vx = _array_property("Vx", "Скорости тел по оси **x**")
+    Vy = _array_property("Vy", "Скорости тел по оси **y**")
+    Fx = _array_property("Fx", "Силы по оси **x**")
+    Fy = _array_property("Fy", "Силы по оси **y**")
+    R = _array_property("R", "Радиусы тел в пикселах")
+    ids = property(lambda self: self._ids[:self._n], doc="Постоянные номера тел")
+
+    def _reserve(self, size):
+        """Увеличивает массивы так, чтобы в них помещалось **size** тел."""
+        capacity = len(self._ids)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        for name, array in self._data.items():
+            grown = np.zeros(capacity)
+            grown[:self._n] = array[:self._n]
+            self._data[name] = grown
+        grown = np.zeros(capacity, dtype=np.int64)
+        grown[:self._n] = self._ids[:self._n]
+        self._ids = grown
+
+    def append(self, body):
+        """Добавляет тело в хранилище и возвращает его представление.
+
+        Параметры:
+
+        **body** — объект с полями type, color, image и числовыми полями Star/Planet.
+        """
+        self._reserve(self._n + 1)
+        for name in self.numeric_fields:
+            self._data[name][self._n] = getattr(body, name)
+        self._ids[self._n] = self._next_id
+        self._next_id += 1
+        self.types.append(body.type)
+        self.colors.append(body.color)
+        self.images.append(body.image)
+        view = SpaceObject(self, self._n)
+        self._views.append(view)
+        self._n += 1
+        return view
+
+    def append_columns(self, types, colors, **columns):
+        """Добавляет сразу много тел из столбцов значений, не создавая объекты тел по одному.
+
+        Параметры:
+
+        **types** — список типов тел ("star" или "planet").
+        **colors** — список цветов тел.
+        **columns** — массивы числовых полей (m, x, y, Vx, Vy, R; отсутствующие Fx и Fy заполняются нулями).
+        """
+        count = len(types)
+        start = self._n
+        self._reserve(start + count)
+        for name in self.numeric_fields:
+            self._data[name][start:start + count] = columns.get(name, 0.0)
+        self._ids[start:start + count] = np.arange(self._next_id, self._next_id + count)
+        self._next_id += count
+        self.types.extend(types)
+        self.colors.extend(colors)
+        self.images.extend([None] * count)
+        self._views.extend(map(SpaceObject, itertools.repeat(self, count), range(start, start + count)))
+        self._n += count
+
+    def extend(self, bodies):
+        """Добавляет в хранилище несколько тел.
+
+        Параметры:
+
+        **bodies** — добавляемые тела.
+        """
+        for body in bodies:
+            self.append(body)
+
+    def remove_at(self, index):
+        """Удаляет тело за O(1): на его место переносится последнее тело.
+        Возвращает представление удалённого тела, отвязанное от хранилища.
+
+        Параметры:
+
+        **index** — индекс удаляемого тела.
+        """
+        if index < 0:
+            index += self._n
+        if not 0 <= index < self._n:
+            raise IndexError("space object index out of range")
+        removed = self._views[index]
+        detached = SpaceObjects([removed], capacity=1)
+        detached._ids[0] = self._ids[index]
+        last = self._n - 1
+        if index != last:
+            for array in self._data.values():
+                array[index] = array[last]
+            self._ids[index] = self._ids[last]
+            for table in (self.types, self.colors, self.images):
+                table[index] = table[last]
+            moved = self._views[last]
+            moved._index = index
+            self._views[index] = moved
+        for table in (self.types, self.colors, self.images, self._views):
+            table.pop()
+        self._n -= 1
+        removed._store = detached
+        removed._index = 0
+        detached._views[0] = removed
+        return removed
+
+    def copy_to(self, bodies):
+        """Переписывает числовые поля тел хранилища в тела списка **bodies** (в том же порядке).
+        Ничего не делает, если **bodies** — это само хранилище.
+
+        Параметры:
+
+        **bodies** — список тел.
+        """
+        if bodies is self:
+            return
+        for index, body in enumerate(bodies):
+            for name in self.numeric_fields:
+                setattr(body, name, float(self._data[name][index]))
+
+    def pop(self, index=-1):
+        """Удаляет и возвращает тело (по умолчанию последнее).
+        Порядок остальных тел сохраняется только при удалении последнего тела.
+
+        Параметры:
+
+        **index** — индекс удаляемого тела.
+        """
+        return self.remove_at(index)
+
+    def clear(self):
+        """Удаляет все тела."""
+        while self._n:
+            self.remove_at(self._n - 1)
+
+    def __len__(self):
+        return self._n
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._views[index]
+        if index < 0:
+            index += self._n
+        if not 0 <= index < self._n:
+            raise IndexError("space object index out of range")
+        return self._views[index]
+
+    def __iter__(self):
+        return iter(list(self._views))
+
+    def __getstate__(self):
+        """Состояние для pickle: числовые поля, постоянные номера, типы и цвета тел.
+        Изображения не сохраняются — они принадлежат холсту, на котором были созданы."""
+        return {
+            "arrays": {name: array.copy() for name, array in self.arrays.items()},
+            "ids": self.ids.copy(),
+            "next_id": self._next_id,
+            "types": list(self.types),
+            "colors": list(self.colors),
+        }
+
+    def __setstate__(self, state):
+        count = len(state["types"])
+        self.__init__(capacity=max(16, count))
+        self.append_columns(state["types"], state["colors"], **state["arrays"])
+        self._ids[:count] = state["ids"]
+        self._next_id = state["next_id"]
+
+
+def as_space_objects(bodies):
+    """Возвращает хранилище SpaceObjects с данными тел.
+    Если **bodies** уже является хранилищем, возвращает его без копирования,
+    иначе создаёт новое хранилище; изменения переносятся обратно методом copy_to.
+
+    Параметры:
+
+    **bodies** — хранилище или список тел.
+    """
+    if isinstance(bodies, SpaceObjects):
+        return bodies
+    return SpaceObjects(bodies)
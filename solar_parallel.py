@@ -0,0 +1,235 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Вычисление гравитационных сил на нескольких ядрах.
+Тела-мишени делятся на плитки по tile_rows тел, плитки считаются пулом процессов.
+Координаты, массы и результаты лежат в общей памяти (multiprocessing.shared_memory),
+так что на каждом шаге процессам передаются только границы плиток, а не массивы.
+
+Каждое ускорение целиком считается одним процессом теми же операциями, что и в
+solar_model.calculate_accelerations, поэтому результат не зависит от числа процессов
+и совпадает с движком "numpy" до последнего бита.
+"""
+
+import atexit
+import multiprocessing
+import os
+import queue
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+import solar_model as model
+
+workers = os.cpu_count() or 1
+"""Число процессов пула по умолчанию"""
+
+tile_rows = 256
+"""Число тел-мишеней в одной плитке. Не зависит от числа процессов, чтобы разбиение было одинаковым"""
+
+_float_fields = ("x", "y", "m", "ax", "ay", "phi")
+
+
+def _shared_views(buffer, capacity):
+    """Возвращает словарь массивов, размещённых в общей памяти **buffer**: поля _float_fields и targets."""
+    views = {}
+    for k, name in enumerate(_float_fields):
+        views[name] = np.ndarray(capacity, dtype=np.float64, buffer=buffer, offset=8 * k * capacity)
+    views["targets"] = np.ndarray(capacity, dtype=np.intp, buffer=buffer, offset=8 * len(_float_fields) * capacity)
+    return views
+
+
+def _worker_loop(memory_name, capacity, tasks, done):
+    """Цикл процесса пула: берёт плитку из очереди, считает её ускорения и пишет их в общую память."""
+    memory = shared_memory.SharedMemory(name=memory_name)
+    try:
+        views = _shared_views(memory.buf, capacity)
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            n, start, stop, softening, potential = task
+            result = model.calculate_accelerations(views["x"][:n], views["y"][:n], views["m"][:n], softening,
+                                                   targets=views["targets"][start:stop], potential=potential)
+            views["ax"][start:stop] = result[0]
+            views["ay"][start:stop] = result[1]
+            if potential:
+                views["phi"][start:stop] = result[2]
+            done.put(start)
+        del views
+    finally:
+        memory.close()
+
+
+class TiledForcePool:
+    """Пул процессов, вычисляющих ускорения тел по плиткам в общей памяти."""
+
+    def __init__(self, processes=None, capacity=1024):
+        """
+        Параметры:
+
+        **processes** — число процессов (по умолчанию workers).
+        **capacity** — наибольшее число тел, для которого выделяется общая память.
+        """
+        self.processes = processes or workers
+        self.capacity = capacity
+        self._memory = shared_memory.SharedMemory(create=True, size=8 * (len(_float_fields) + 1) * capacity)
+        self._views = _shared_views(self._memory.buf, capacity)
+        context = multiprocessing.get_context("spawn")
+        self._tasks = context.Queue()
+        self._done = context.Queue()
+        self._workers = [
+            context.Process(target=_worker_loop, args=(self._memory.name, capacity, self._tasks, self._done),
+                            daemon=True)
+            for _ in range(self.processes)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def accelerations(self, x, y, m, softening=None, targets=None, potential=False):
+        """Вычисляет ускорения тел; параметры и результат те же, что у solar_model.calculate_accelerations."""
+        if softening is None:
+            softening = model.softening_length
+        n = len(x)
+        if n > self.capacity:
+            raise ValueError("%d bodies exceed pool capacity %d" % (n, self.capacity))
+        views = self._views
+        views["x"][:n] = x
+        views["y"][:n] = y
+        views["m"][:n] = m
+        count = n if targets is None else len(targets)
+        views["targets"][:count] = np.arange(n) if targets is None else targets
+        tiles = range(0, count, tile_rows)
+        for start in tiles:
+            self._tasks.put((n, start, min(start + tile_rows, count), softening, potential))
+        for _ in tiles:
+            self._wait()
+        result = (views["ax"][:count].copy(), views["ay"][:count].copy())
+        if potential:
+            return result + (views["phi"][:count].copy(),)
+        return result
+
+    def _wait(self):
+        """Дожидается окончания одной плитки; если процесс пула завершился, бросает RuntimeError."""
+        while True:
+            try:
+                return self._done.get(timeout=1.0)
+            except queue.Empty:
+                if not all(worker.is_alive() for worker in self._workers):
+                    raise RuntimeError("force worker process exited unexpectedly") from None
+
+    def close(self):
+        """Останавливает процессы и освобождает общую память."""
+        for _ in self._workers:
+            self._tasks.put(None)
+        for worker in self._workers:
+            worker.join()
+        self._views = None
+        self._memory.close()
+        self._memory.unlink()
+
+
+_pool = None
+
+
+def get_pool(bodies, processes=None):
+    """Возвращает общий пул процессов, достаточный для **bodies** тел; при нехватке памяти
+    или другом числе процессов пул создаётся заново.
+
+    Параметры:
+
+    **bodies** — число тел.
+    **processes** — число процессов (по умолчанию workers).
+    """
+    global _pool
+    processes = processes or workers
+    if _pool is None or _pool.capacity < bodies or _pool.processes != processes:
+        shutdown()
+        _pool = TiledForcePool(processes, max(1024, 2 * bodies))
+    return _pool
+
+
+def shutdown():
+    """Останавливает общий пул процессов, если он был создан."""
+    global _pool
+    if _pool is not None:
+        _pool.close()
+        _pool = None
+
+
+atexit.register(shutdown)
+
+
+def parallel_accelerations(x, y, m, softening=None, targets=None, potential=False, processes=None):
+    """Вычисляет ускорения тел пулом процессов; параметры и результат те же,
+    что у solar_model.calculate_accelerations. При одном процессе считает в текущем процессе.
+
+    Параметры:
+
+    **processes** — число процессов (по умолчанию workers).
+    """
+    processes = processes or workers
+    if processes <= 1 or len(x) <= tile_rows:
+        return model.calculate_accelerations(x, y, m, softening, targets, potential)
+    return get_pool(len(x), processes).accelerations(x, y, m, softening, targets, potential)
+
+
+def calculate_forces_parallel(space_objects):
+    """Вычисляет силы, действующие на все тела, пулом процессов.
+
+    Параметры:
+
+    **space_objects** — хранилище или список объектов, для которых нужно вычислить силы.
+    """
+    store = model.as_space_objects(space_objects)
+    ax, ay = parallel_accelerations(store.x, store.y, store.m)
+    store.Fx[:] = store.m * ax
+    store.Fy[:] = store.m * ay
+    store.copy_to(space_objects)
+
+
+def scaling_report(x, y, m, process_counts, repeats=3):
+    """Сравнивает время вычисления ускорений пулом из разного числа процессов с однопроцессным
+    движком "numpy" и проверяет, что результаты совпадают побитно.
+    Возвращает список словарей с полями processes, time, single_time, speedup, identical.
+
+    Параметры:
+
+    **x**, **y**, **m** — координаты и массы тел.
+    **process_counts** — числа процессов.
+    **repeats** — число повторов; берётся наименьшее время.
+    """
+
+    def best_time(function):
+        best, result = float("inf"), None
+        for _ in range(repeats):
+            started = time.perf_counter()
+            result = function()
+            best = min(best, time.perf_counter() - started)
+        return best, result
+
+    single_time, (ax, ay) = best_time(lambda: model.calculate_accelerations(x, y, m))
+    report = []
+    for processes in process_counts:
+        get_pool(len(x), processes)  # процессы запускаются до замера
+        elapsed, (pax, pay) = best_time(lambda: get_pool(len(x), processes).accelerations(x, y, m))
+        report.append({"processes": processes, "time": elapsed, "single_time": single_time,
+                       "speedup": single_time / elapsed,
+                       "identical": bool(np.array_equal(ax, pax) and np.array_equal(ay, pay))})
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+    import solar_tree
+
+    parser = argparse.ArgumentParser(description="Ускорение многопроцессного вычисления сил по сравнению с одним ядром")
+    parser.add_argument("-n", type=int, default=20000, help="число тел синтетического диска")
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4, workers])
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+    bodies = solar_tree.random_disc(args.n)
+    print("%9s %10s %10s %9s %9s" % ("processes", "pool, s", "single, s", "speedup", "identical"))
+    for row in scaling_report(*bodies, process_counts=args.processes, repeats=args.repeats):
+        print("%9d %10.4f %10.4f %9.2f %9s" % (row["processes"], row["time"], row["single_time"], row["speedup"],
+                                               row["identical"]))
@@ -0,0 +1,204 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Сохранение графиков движения тел в файлы.
+Графики строятся без окна: matplotlib с бэкендом Agg через объекты Figure, без общего состояния pyplot.
+Статистика переводится в массивы один раз, каждый ряд прореживается до ширины графика в пикселах
+с сохранением пиков. Графики разных тел строятся параллельно в пуле процессов,
+а export_plots_in_background выполняет построение в фоновом потоке, не задерживая окно.
+
+Пример:
+
+    future = solar_plots.export_plots_in_background(stats, "plots")
+    ...
+    paths = future.result()
+"""
+
+import concurrent.futures
+import multiprocessing
+import os
+
+import numpy as np
+
+plot_width = 800
+"""Ширина графика в пикселах"""
+
+plot_height = 600
+"""Высота графика в пикселах"""
+
+plot_dpi = 100
+"""Разрешение графика, точек на дюйм"""
+
+file_pattern = "body{id}_{plot}.png"
+"""Шаблон имени файла графика: id — постоянный номер тела, plot — название графика"""
+
+plots = (
+    ("Speed_time", "time", "speed", "red", "Time, s", "Total velocity, m/s"),
+    ("Distance_time", "time", "distance", "black", "Time, s", "Distance to sun, m"),
+    ("Speed_distance", "distance", "paired_speed", "blue", "Distance to sun, m", "Total velocity, m/s"),
+)
+"""Графики каждого тела: название, величины по осям x и y, цвет линии, подписи осей.
+Фазовый график строится по скорости paired_speed, взятой в те же моменты, что и расстояние"""
+
+_background = None
+
+
+def decimate(x, y, buckets):
+    """Прореживает ломаную (x, y) до **buckets** групп подряд идущих точек. В каждой группе остаются
+    первая и последняя точки и точки с наименьшими и наибольшими x и y, в исходном порядке,
+    поэтому ни один пик не теряется. Короткие ряды возвращаются без изменений.
+
+    Параметры:
+
+    **x**, **y** — координаты точек ломаной.
+    **buckets** — число групп (обычно ширина графика в пикселах).
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if n <= 6 * buckets:
+        return x, y
+    size = -(-n // buckets)
+    rows = -(-n // size)
+    starts = np.arange(rows) * size
+    keep = [starts, np.minimum(starts + size, n) - 1]
+    for values in (x, y):
+        table = np.full(rows * size, np.nan)
+        table[:n] = values
+        table = table.reshape(rows, size)
+        keep.append(starts + np.nanargmin(table, axis=1))
+        keep.append(starts + np.nanargmax(table, axis=1))
+    chosen = np.unique(np.concatenate(keep))
+    return x[chosen], y[chosen]
+
+
+def statistics_series(stats):
+    """Переводит статистику в массивы. Возвращает пятёрку (ids, t, speed, distance, paired_speed):
+    постоянные номера тел, общие моменты времени и двумерные массивы скорости и расстояния
+    (строка — тело). Прореженная история разворачивается в минимумы и максимумы интервалов.
+    Минимумы и максимумы скорости и расстояния достигаются в разные моменты, поэтому для фазового графика
+    возвращается также paired_speed — скорость в моменты минимумов и максимумов расстояния.
+
+    Параметры:
+
+    **stats** — статистика solar_stats.SystemStatistics или список статистики [скорость, расстояние, время]
+    второго тела.
+    """
+    if hasattr(stats, "speed_history"):
+        t, speed_low, speed_high = stats.speed_history.arrays()
+        _, distance_low, distance_high = stats.distance_history.arrays()
+        paired_low, paired_high = stats.distance_history.paired_arrays()
+        rows = len(stats.ids)
+        speed = np.stack((speed_low, speed_high), axis=2).reshape(rows, -1)
+        distance = np.stack((distance_low, distance_high), axis=2).reshape(rows, -1)
+        paired_speed = np.stack((paired_low, paired_high), axis=2).reshape(rows, -1)
+        return stats.ids.copy(), np.repeat(t, 2), speed, distance, paired_speed
+    columns = np.asarray(stats, dtype=float).reshape(-1, 3)
+    return np.array([1]), columns[:, 2], columns[None, :, 0], columns[None, :, 1], columns[None, :, 0]
+
+
+def plot_tasks(stats, directory, rows=None, width=plot_width, height=plot_height, pattern=file_pattern):
+    """Готовит задания на построение графиков: по одному на тело, со своими прореженными рядами.
+    Задание — словарь с размерами графика и списком графиков (имя файла, x, y, цвет, подписи осей).
+
+    Параметры:
+
+    **stats** — статистика (см. statistics_series).
+    **directory** — каталог для файлов графиков.
+    **rows** — строки статистики, для которых строятся графики; по умолчанию все тела, кроме первого
+    (расстояния отсчитываются от него).
+    **width**, **height** — размеры графика в пикселах.
+    **pattern** — шаблон имени файла (см. file_pattern).
+    """
+    ids, t, speed, distance, paired_speed = statistics_series(stats)
+    if rows is None:
+        rows = range(1, len(ids)) if len(ids) > 1 else range(len(ids))
+    tasks = []
+    for row in rows:
+        series = {"time": t, "speed": speed[row], "distance": distance[row], "paired_speed": paired_speed[row]}
+        present = ~(np.isnan(series["speed"]) | np.isnan(series["distance"]))
+        if present.sum() < 2:
+            continue  # тело удалено в самом начале расчёта
+        figures = []
+        for name, x_name, y_name, color, x_label, y_label in plots:
+            x, y = decimate(series[x_name][present], series[y_name][present], width)
+            path = os.path.join(directory, pattern.format(id=int(ids[row]), plot=name))
+            figures.append((path, x, y, color, x_label, y_label))
+        tasks.append({"size": (width, height, plot_dpi), "figures": figures})
+    return tasks
+
+
+def render_task(task):
+    """Строит и сохраняет графики одного задания. Возвращает список имён файлов.
+    Выполняется в процессе пула, поэтому получает только простые данные.
+
+    Параметры:
+
+    **task** — задание из plot_tasks.
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg  # загружается только при сохранении графиков
+    from matplotlib.figure import Figure
+
+    width, height, dpi = task["size"]
+    paths = []
+    for path, x, y, color, x_label, y_label in task["figures"]:
+        figure = Figure(figsize=(width / dpi, height / dpi), dpi=dpi)
+        FigureCanvasAgg(figure)
+        axes = figure.add_subplot()
+        axes.plot(x, y, color=color)
+        axes.grid()
+        axes.set_xlabel(x_label)
+        axes.set_ylabel(y_label)
+        figure.savefig(path)
+        paths.append(path)
+    return paths
+
+
+def render_tasks(tasks, jobs=None):
+    """Строит графики всех заданий и возвращает список имён файлов в порядке заданий.
+
+    Параметры:
+
+    **tasks** — задания из plot_tasks.
+    **jobs** — число процессов (по умолчанию число ядер); при 1 или одном задании графики
+    строятся в текущем процессе.
+    """
+    jobs = min(jobs or os.cpu_count() or 1, len(tasks))
+    if jobs <= 1:
+        return [path for task in tasks for path in render_task(task)]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs,
+                                                mp_context=multiprocessing.get_context("spawn")) as pool:
+        return [path for paths in pool.map(render_task, tasks) for path in paths]
+
+
+def export_plots(stats, directory, rows=None, jobs=None, **options):
+    """Сохраняет графики тел в каталог **directory** (создаётся при необходимости).
+    Возвращает список имён файлов.
+
+    Параметры:
+
+    **stats** — статистика (см. statistics_series).
+    **directory** — каталог для файлов графиков.
+    **rows** — строки статистики (см. plot_tasks).
+    **jobs** — число процессов (см. render_tasks).
+    **options** — размеры графика и шаблон имени файла (см. plot_tasks).
+    """
+    os.makedirs(directory, exist_ok=True)
+    return render_tasks(plot_tasks(stats, directory, rows, **options), jobs)
+
+
+def export_plots_in_background(stats, directory, rows=None, jobs=None, **options):
+    """То же, что export_plots, но графики строятся в фоновом потоке.
+    Статистика переводится в массивы сразу, так что после возврата её можно менять.
+    Возвращает concurrent.futures.Future со списком имён файлов.
+    """
+    global _background
+    os.makedirs(directory, exist_ok=True)
+    tasks = plot_tasks(stats, directory, rows, **options)
+    if _background is None:
+        _background = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="plots")
+    return _background.submit(render_tasks, tasks, jobs)
+
+
+if __name__ == "__main__":
+    print("This module is not for direct call!")
@@ -0,0 +1,178 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Замер времени горячих участков: вычисления сил, шага интегратора, отрисовки, ввода-вывода.
+Участок оборачивается в ``with solar_profile.timer("force"):``, функция — декоратором timed.
+Пока замеры выключены, timer возвращает один и тот же пустой объект, так что цена участка — один вызов функции.
+
+Для каждого участка хранятся последние window длительностей (по ним считаются скользящие процентили)
+и общие количество и время. Интервалы также копятся для файла трассировки в формате Chrome Trace Event,
+который открывается в chrome://tracing или ui.perfetto.dev.
+"""
+
+import collections
+import functools
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+enabled = False
+"""Включены ли замеры"""
+
+window = 1024
+"""Число последних длительностей каждого участка для скользящих процентилей"""
+
+trace_capacity = 200000
+"""Наибольшее число интервалов, хранимых для файла трассировки"""
+
+
+class _Series:
+    """Длительности одного участка: последние window значений и общие счётчики."""
+
+    def __init__(self, size):
+        self.values = np.zeros(size)
+        self.position = 0
+        self.filled = 0
+        self.count = 0
+        self.total = 0.0
+        self.last = 0.0
+
+    def add(self, duration):
+        self.values[self.position] = duration
+        self.position = (self.position + 1) % len(self.values)
+        self.filled = min(self.filled + 1, len(self.values))
+        self.count += 1
+        self.total += duration
+        self.last = duration
+
+
+class Profiler:
+    """Накопитель замеров участков."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.series = {}
+        """Длительности участков: название -> _Series"""
+        self.trace = collections.deque(maxlen=trace_capacity)
+        """Интервалы для трассировки: кортежи (название, начало, конец, номер потока)"""
+        self.origin = time.perf_counter()
+        """Момент, от которого отсчитываются времена трассировки"""
+
+    def add(self, name, started, finished):
+        """Учитывает интервал участка **name** от **started** до **finished** (секунды time.perf_counter)."""
+        with self._lock:
+            series = self.series.get(name)
+            if series is None:
+                series = self.series[name] = _Series(window)
+            series.add(finished - started)
+            self.trace.append((name, started, finished, threading.get_ident()))
+
+    def reset(self):
+        """Забывает все замеры."""
+        with self._lock:
+            self.series = {}
+            self.trace.clear()
+            self.origin = time.perf_counter()
+
+    def summary(self, percentiles=(50, 95, 99)):
+        """Возвращает словарь: название участка -> словарь с count, total, mean, last
+        и скользящими процентилями p50, p95, p99 (в секундах)."""
+        with self._lock:
+            items = [(name, series, series.values[:series.filled].copy()) for name, series in self.series.items()]
+        result = {}
+        for name, series, recent in items:
+            row = {"count": series.count, "total": series.total, "mean": series.total / series.count,
+                   "last": series.last}
+            for q, value in zip(percentiles, np.percentile(recent, percentiles)):
+                row["p%d" % q] = float(value)
+            result[name] = row
+        return result
+
+    def write_trace(self, path):
+        """Сохраняет интервалы в файл трассировки Chrome Trace Event (JSON)."""
+        with self._lock:
+            intervals = list(self.trace)
+            origin = self.origin
+        threads = {}
+        events = []
+        for name, started, finished, thread in intervals:
+            tid = threads.setdefault(thread, len(threads))
+            events.append({"name": name, "ph": "X", "pid": os.getpid(), "tid": tid,
+                           "ts": (started - origin) * 1E6, "dur": (finished - started) * 1E6})
+        with open(path, "w") as trace_file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, trace_file)
+
+
+profiler = Profiler()
+"""Общий накопитель замеров"""
+
+
+class _Timer:
+    __slots__ = ("name", "started")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        profiler.add(self.name, self.started, time.perf_counter())
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_null_timer = _NullTimer()
+
+
+def timer(name):
+    """Возвращает контекстный менеджер, замеряющий участок **name** (пустой, если замеры выключены)."""
+    if not enabled:
+        return _null_timer
+    return _Timer(name)
+
+
+def timed(name):
+    """Декоратор: замеряет каждый вызов функции как участок **name**."""
+
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return function(*args, **kwargs)
+            with _Timer(name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def enable(flag=True):
+    """Включает или выключает замеры."""
+    global enabled
+    enabled = flag
+
+
+def overlay_lines(summary=None):
+    """Возвращает строки для вывода замеров поверх холста: участок, медиана, 95-й процентиль, число замеров."""
+    if summary is None:
+        summary = profiler.summary()
+    return ["%-9s p50 %7.2f ms  p95 %7.2f ms  n=%d" % (name, 1E3 * row["p50"], 1E3 * row["p95"], row["count"])
+            for name, row in sorted(summary.items())]
+
+
+if __name__ == "__main__":
+    print("This module is not for direct call!")
@@ -0,0 +1,300 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Статистика движения тел с ограниченным расходом памяти.
+Для каждого тела хранятся последние значения скорости и расстояния до первого тела
+в кольцевом буфере и вся история в прореженном виде (с сохранением минимумов и максимумов),
+а также накопительные величины: перигелий, афелий, оценка периода и средняя скорость.
+Объём памяти задаётся при создании и не растёт с длительностью расчёта.
+"""
+
+import numpy as np
+
+recent_capacity = 1024
+"""Число последних отсчётов, хранимых без прореживания"""
+
+history_capacity = 2048
+"""Число интервалов в прореженной истории"""
+
+
+class RingBuffer:
+    """Кольцевой буфер последних отсчётов нескольких величин."""
+
+    def __init__(self, channels, capacity=recent_capacity):
+        """
+        Параметры:
+
+        **channels** — число величин в одном отсчёте.
+        **capacity** — число хранимых отсчётов.
+        """
+        self.t = np.empty(capacity)
+        self.values = np.empty((channels, capacity))
+        self.count = 0
+        """Число хранимых отсчётов"""
+        self._position = 0
+
+    def append(self, t, values):
+        """Добавляет отсчёт, вытесняя самый старый при заполнении.
+
+        Параметры:
+
+        **t** — время отсчёта.
+        **values** — массив значений величин.
+        """
+        self.t[self._position] = t
+        self.values[:, self._position] = values
+        self._position = (self._position + 1) % len(self.t)
+        self.count = min(self.count + 1, len(self.t))
+
+    def arrays(self):
+        """Возвращает пару (t, values) с отсчётами в порядке времени."""
+        if self.count < len(self.t):
+            return self.t[:self.count].copy(), self.values[:, :self.count].copy()
+        order = np.roll(np.arange(len(self.t)), -self._position)
+        return self.t[order], self.values[:, order]
+
+
+class DecimatedSeries:
+    """Прореженная история нескольких величин.
+    Каждый интервал хранит время начала, минимум и максимум величин за интервал.
+    Когда интервалы заканчиваются, соседние пары сливаются, а длина интервала удваивается,
+    поэтому пики не теряются при любой длине истории.
+    Вместе с величинами можно хранить парные значения: взятые из того же отсчёта, что минимум и максимум
+    величины, так что пары (величина, парное значение) всегда встречались в расчёте на самом деле.
+    """
+
+    def __init__(self, channels, capacity=history_capacity, paired=False):
+        """
+        Параметры:
+
+        **channels** — число величин в одном отсчёте.
+        **capacity** — число интервалов (чётное).
+        **paired** — хранить ли парные значения.
+        """
+        capacity += capacity % 2
+        self.t = np.empty(capacity)
+        self.low = np.empty((channels, capacity))
+        self.high = np.empty((channels, capacity))
+        self.count = 0
+        """Число заполненных интервалов"""
+        self.stride = 1
+        """Число отсчётов в одном интервале"""
+        self._pending = 0
+        self._pending_t = 0.0
+        self._pending_low = np.empty(channels)
+        self._pending_high = np.empty(channels)
+        self.paired = paired
+        if paired:
+            self.low_paired = np.empty((channels, capacity))
+            """Парные значения из отсчётов, в которых достигнуты минимумы"""
+            self.high_paired = np.empty((channels, capacity))
+            """Парные значения из отсчётов, в которых достигнуты максимумы"""
+            self._pending_low_paired = np.empty(channels)
+            self._pending_high_paired = np.empty(channels)
+
+    def append(self, t, values, paired=None):
+        """Добавляет отсчёт.
+
+        Параметры:
+
+        **t** — время отсчёта.
+        **values** — массив значений величин.
+        **paired** — массив парных значений того же отсчёта (если история хранит парные значения).
+        """
+        if self._pending == 0:
+            self._pending_t = t
+            self._pending_low[:] = values
+            self._pending_high[:] = values
+            if self.paired:
+                self._pending_low_paired[:] = paired
+                self._pending_high_paired[:] = paired
+        else:
+            if self.paired:
+                paired = np.asarray(paired)
+                lower = _beats(values, self._pending_low, np.less)
+                higher = _beats(values, self._pending_high, np.greater)
+                self._pending_low_paired[lower] = paired[lower]
+                self._pending_high_paired[higher] = paired[higher]
+            np.fmin(self._pending_low, values, out=self._pending_low)
+            np.fmax(self._pending_high, values, out=self._pending_high)
+        self._pending += 1
+        if self._pending == self.stride:
+            self._push()
+
+    def _push(self):
+        """Переносит накопленный интервал в историю; заполненную историю сжимает, сливая пары интервалов."""
+        self.t[self.count] = self._pending_t
+        self.low[:, self.count] = self._pending_low
+        self.high[:, self.count] = self._pending_high
+        if self.paired:
+            self.low_paired[:, self.count] = self._pending_low_paired
+            self.high_paired[:, self.count] = self._pending_high_paired
+        self.count += 1
+        self._pending = 0
+        if self.count == len(self.t):
+            half = self.count // 2
+            self.t[:half] = self.t[0::2]
+            if self.paired:
+                later_low = _beats(self.low[:, 1::2], self.low[:, 0::2], np.less)
+                later_high = _beats(self.high[:, 1::2], self.high[:, 0::2], np.greater)
+                self.low_paired[:, :half] = np.where(later_low, self.low_paired[:, 1::2], self.low_paired[:, 0::2])
+                self.high_paired[:, :half] = np.where(later_high, self.high_paired[:, 1::2],
+                                                      self.high_paired[:, 0::2])
+            self.low[:, :half] = np.fmin(self.low[:, 0::2], self.low[:, 1::2])
+            self.high[:, :half] = np.fmax(self.high[:, 0::2], self.high[:, 1::2])
+            self.count = half
+            self.stride *= 2
+
+    def arrays(self):
+        """Возвращает тройку (t, low, high) вместе с незавершённым последним интервалом."""
+        t, low, high = self.t[:self.count], self.low[:, :self.count], self.high[:, :self.count]
+        if self._pending:
+            t = np.append(t, self._pending_t)
+            low = np.column_stack((low, self._pending_low))
+            high = np.column_stack((high, self._pending_high))
+        return t.copy(), low.copy(), high.copy()
+
+    def paired_arrays(self):
+        """Возвращает пару (low_paired, high_paired) с парными значениями минимумов и максимумов,
+        согласованную с arrays."""
+        low, high = self.low_paired[:, :self.count], self.high_paired[:, :self.count]
+        if self._pending:
+            low = np.column_stack((low, self._pending_low_paired))
+            high = np.column_stack((high, self._pending_high_paired))
+        return low.copy(), high.copy()
+
+
+def _beats(values, current, compare):
+    """Маска величин, которые становятся новым экстремумом: сравнение **compare** выполнено
+    или текущее значение отсутствует (NaN), как в np.fmin и np.fmax."""
+    return compare(values, current) | (np.isnan(current) & ~np.isnan(values))
+
+
+def envelope(t, low, high):
+    """Превращает прореженный ряд в последовательность точек для графика:
+    в каждом интервале сначала минимум, затем максимум.
+
+    Параметры:
+
+    **t** — времена интервалов.
+    **low**, **high** — минимумы и максимумы величины в интервалах.
+    """
+    return np.repeat(t, 2), np.column_stack((low, high)).ravel()
+
+
+class SystemStatistics:
+    """Статистика всех тел системы: скорость и расстояние до первого тела (предположительно звезды).
+    Тела отслеживаются по постоянным номерам, поэтому удаление тел не сбивает строки.
+    """
+
+    def __init__(self, space_objects, recent=recent_capacity, history=history_capacity):
+        """
+        Параметры:
+
+        **space_objects** — хранилище SpaceObjects.
+        **recent** — число последних отсчётов без прореживания.
+        **history** — число интервалов прореженной истории.
+        """
+        self.ids = space_objects.ids.copy()
+        """Постоянные номера тел в порядке строк статистики"""
+        n = len(self.ids)
+        self.speed_recent = RingBuffer(n, recent)
+        """Последние значения скорости"""
+        self.distance_recent = RingBuffer(n, recent)
+        """Последние значения расстояния до первого тела"""
+        self.speed_history = DecimatedSeries(n, history)
+        """Прореженная история скорости"""
+        self.distance_history = DecimatedSeries(n, history, paired=True)
+        """Прореженная история расстояния до первого тела вместе со скоростью в моменты минимума и максимума"""
+        self.samples = 0
+        """Число отсчётов"""
+        self.perihelion = np.full(n, np.inf)
+        """Наименьшее расстояние до первого тела"""
+        self.aphelion = np.full(n, -np.inf)
+        """Наибольшее расстояние до первого тела"""
+        self.speed_sum = np.zeros(n)
+        self.speed_count = np.zeros(n, dtype=np.int64)
+        self.first_minimum = np.full(n, np.nan)
+        """Время первого найденного минимума расстояния"""
+        self.last_minimum = np.full(n, np.nan)
+        """Время последнего найденного минимума расстояния"""
+        self.minima = np.zeros(n, dtype=np.int64)
+        """Число найденных минимумов расстояния"""
+        self._previous = np.full((2, n), np.nan)
+        self._previous_t = np.nan
+
+    def _rows(self, space_objects):
+        """Возвращает пару (строки статистики, маска тел хранилища, для которых строки есть)."""
+        n = len(self.ids)
+        if len(space_objects) == n and np.array_equal(space_objects.ids, self.ids):
+            return slice(None), slice(None)
+        order = np.argsort(self.ids)
+        rows = order[np.minimum(np.searchsorted(self.ids[order], space_objects.ids), n - 1)]
+        known = self.ids[rows] == space_objects.ids
+        return rows[known], known
+
+    def update(self, space_objects, t):
+        """Добавляет отсчёт для всех тел.
+
+        Параметры:
+
+        **space_objects** — хранилище SpaceObjects.
+        **t** — физическое время.
+        """
+        rows, known = self._rows(space_objects)
+        n = len(self.ids)
+        speed = np.full(n, np.nan)
+        distance = np.full(n, np.nan)
+        speed[rows] = np.hypot(space_objects.Vx, space_objects.Vy)[known]
+        distance[rows] = np.hypot(space_objects.x - space_objects.x[0], space_objects.y - space_objects.y[0])[known]
+
+        self.speed_recent.append(t, speed)
+        self.distance_recent.append(t, distance)
+        self.speed_history.append(t, speed)
+        self.distance_history.append(t, distance, speed)
+        self.samples += 1
+
+        present = ~np.isnan(distance)
+        np.fmin(self.perihelion, distance, out=self.perihelion)
+        np.fmax(self.aphelion, distance, out=self.aphelion)
+        self.speed_sum[present] += speed[present]
+        self.speed_count[present] += 1
+
+        before, last = self._previous
+        minimum = (last < before) & (last <= distance)
+        if minimum.any():
+            self.first_minimum[minimum & (self.minima == 0)] = self._previous_t
+            self.last_minimum[minimum] = self._previous_t
+            self.minima[minimum] += 1
+        self._previous[0] = last
+        self._previous[1] = distance
+        self._previous_t = t
+
+    @property
+    def mean_speed(self):
+        """Средняя скорость тел"""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self.speed_sum / self.speed_count
+
+    @property
+    def period(self):
+        """Оценка периода обращения по промежуткам между минимумами расстояния (NaN, если минимумов меньше двух)"""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.minima > 1, (self.last_minimum - self.first_minimum) / (self.minima - 1), np.nan)
+
+    def row(self, body_id):
+        """Возвращает строку статистики тела с постоянным номером **body_id**."""
+        return int(np.flatnonzero(self.ids == body_id)[0])
+
+    def summary(self):
+        """Возвращает список словарей с накопительными величинами для каждого тела."""
+        period, mean_speed = self.period, self.mean_speed
+        return [
+            {"id": int(body_id), "perihelion": float(self.perihelion[i]), "aphelion": float(self.aphelion[i]),
+             "period": float(period[i]), "mean_speed": float(mean_speed[i])}
+            for i, body_id in enumerate(self.ids)
+        ]
+
+
+if __name__ == "__main__":
+    print("This module is not for direct call!")
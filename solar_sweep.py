@@ -0,0 +1,303 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Прогон сетки вариантов одной системы тел на всех ядрах.
+Каждая точка сетки — сочетание файла системы, шага по времени, способа вычисления сил, интегратора
+и множителей для полей отдельных тел (например, скорости спутника). Точки считаются в пуле процессов,
+итоговые величины собираются в одну таблицу (CSV и текст на экране).
+
+Результаты хранятся в кэше, адресуемом содержимым: ключ — хэш содержимого файла системы, параметров точки
+и версии движка solar_model.engine_version. Повторный прогон считает только изменившиеся точки.
+
+Пример:
+
+    python solar_sweep.py one_satellite.txt one_oval_satellite.txt --dt 3600 7200 --steps 8760 \\
+        --integrator euler leapfrog --vary "Vy[1]=0.95,1,1.05" --output sweep.csv
+"""
+
+import argparse
+import concurrent.futures
+import csv
+import hashlib
+import itertools
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+
+import solar_input
+import solar_model as model
+
+cache_directory = ".sweep_cache"
+"""Каталог кэша результатов по умолчанию"""
+
+metric_names = ("perihelion", "aphelion", "period", "mean_speed", "max_energy_drift", "physical_time",
+                "steps", "wall_time")
+"""Итоговые величины точки сетки в порядке столбцов таблицы"""
+
+_variation = re.compile(r"^(\w+)\[(\d+)\]$")
+
+
+def parse_variation(text):
+    """Разбирает описание изменения поля тела вида "Vy[1]=0.95,1,1.05".
+    Возвращает пару (название параметра, список множителей).
+
+    Параметры:
+
+    **text** — описание из командной строки.
+    """
+    name, _, factors = text.partition("=")
+    match = _variation.match(name.strip())
+    if match is None or match.group(1) not in ("m", "x", "y", "Vx", "Vy", "R"):
+        raise argparse.ArgumentTypeError("expected FIELD[INDEX]=FACTOR,... with FIELD one of m, x, y, Vx, Vy, R")
+    try:
+        return name.strip(), [float(factor) for factor in factors.split(",")]
+    except ValueError:
+        raise argparse.ArgumentTypeError("factors must be numbers: %r" % factors) from None
+
+
+def parameter_grid(axes):
+    """Возвращает список точек сетки — словарей {параметр: значение} для всех сочетаний значений.
+
+    Параметры:
+
+    **axes** — словарь {параметр: список значений}; порядок ключей задаёт порядок перебора.
+    """
+    names = list(axes)
+    return [dict(zip(names, values)) for values in itertools.product(*(axes[name] for name in names))]
+
+
+def scenario_digest(filename):
+    """Возвращает хэш SHA-256 содержимого файла системы тел."""
+    with open(filename, "rb") as scenario_file:
+        return hashlib.sha256(scenario_file.read()).hexdigest()
+
+
+def point_key(point, settings, digest):
+    """Возвращает ключ кэша точки сетки: хэш содержимого системы, параметров точки,
+    общих параметров прогона и версии движка. Имя файла системы в ключ не входит.
+
+    Параметры:
+
+    **point** — точка сетки.
+    **settings** — общие параметры прогона (число шагов, время окончания, тело, частота замеров).
+    **digest** — хэш содержимого файла системы.
+    """
+    description = {
+        "scenario": digest,
+        "parameters": {name: value for name, value in point.items() if name != "scenario"},
+        "settings": settings,
+        "engine_version": model.engine_version,
+    }
+    return hashlib.sha256(json.dumps(description, sort_keys=True).encode()).hexdigest()
+
+
+class ResultCache:
+    """Кэш результатов точек сетки: по одному файлу JSON на ключ.
+    Файлы записываются атомарно, поэтому прерванный прогон не оставляет испорченных записей.
+    """
+
+    def __init__(self, directory=cache_directory):
+        """
+        Параметры:
+
+        **directory** — каталог кэша (создаётся при необходимости).
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".json")
+
+    def get(self, key):
+        """Возвращает сохранённые итоговые величины или None, если точка ещё не считалась."""
+        try:
+            with open(self._path(key)) as result_file:
+                return json.load(result_file)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key, metrics):
+        """Сохраняет итоговые величины точки."""
+        descriptor, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(descriptor, "w") as result_file:
+            json.dump(metrics, result_file)
+        os.replace(temporary, self._path(key))
+
+
+def run_point(point, settings):
+    """Считает одну точку сетки и возвращает словарь итоговых величин (см. metric_names).
+    Выполняется в процессе пула, поэтому получает и возвращает только простые данные.
+
+    Параметры:
+
+    **point** — точка сетки: scenario, dt, engine, integrator и множители вида "Vy[1]".
+    **settings** — общие параметры прогона: steps, until, body, monitor_every.
+    """
+    import solar_diagnostics
+    import solar_stats
+
+    space_objects = solar_input.read_space_objects_data_from_file(point["scenario"])
+    for name, factor in point.items():
+        match = _variation.match(name)
+        if match is not None:
+            space_objects.arrays[match.group(1)][int(match.group(2))] *= factor
+    simulation = model.Simulation(space_objects, point["dt"], point["engine"], point["integrator"])
+    simulation.monitor = solar_diagnostics.ConservationMonitor(settings["monitor_every"], budget=float("inf"))
+    statistics = solar_stats.SystemStatistics(simulation.space_objects)
+    steps, until = settings["steps"], settings["until"]
+    started = time.perf_counter()
+    done = 0
+    while (steps is None or done < steps) and (until is None or simulation.physical_time < until):
+        simulation.step()
+        statistics.update(simulation.space_objects, simulation.physical_time)
+        done += 1
+    elapsed = time.perf_counter() - started
+    body = statistics.summary()[settings["body"]]
+    return {
+        "perihelion": body["perihelion"],
+        "aphelion": body["aphelion"],
+        "period": body["period"],
+        "mean_speed": body["mean_speed"],
+        "max_energy_drift": simulation.monitor.max_drift,
+        "physical_time": simulation.physical_time,
+        "steps": done,
+        "wall_time": elapsed,
+    }
+
+
+def _row(point, metrics, cached):
+    """Собирает строку таблицы: параметры точки, итоговые величины в порядке metric_names и признак кэша."""
+    row = dict(point)
+    row.update((name, metrics[name]) for name in metric_names)
+    row["cached"] = cached
+    return row
+
+
+def sweep(points, settings, cache=None, jobs=None, progress=None):
+    """Считает все точки сетки и возвращает список строк таблицы (точка + итоговые величины + признак "cached")
+    в порядке точек. Точки, найденные в кэше, не пересчитываются; остальные считаются в пуле процессов.
+
+    Параметры:
+
+    **points** — список точек сетки.
+    **settings** — общие параметры прогона (см. run_point).
+    **cache** — кэш результатов ResultCache или None.
+    **jobs** — число процессов (по умолчанию число ядер); при 1 точки считаются в текущем процессе.
+    **progress** — функция, вызываемая со строкой таблицы после каждой посчитанной точки.
+    """
+    digests = {}
+    rows = [None] * len(points)
+    keys = []
+    pending = []
+    for index, point in enumerate(points):
+        if point["scenario"] not in digests:
+            digests[point["scenario"]] = scenario_digest(point["scenario"])
+        key = point_key(point, settings, digests[point["scenario"]])
+        keys.append(key)
+        metrics = cache.get(key) if cache is not None else None
+        if metrics is None:
+            pending.append(index)
+        else:
+            rows[index] = _row(point, metrics, True)
+
+    def finish(index, metrics):
+        if cache is not None:
+            cache.put(keys[index], metrics)
+        rows[index] = _row(points[index], metrics, False)
+        if progress is not None:
+            progress(rows[index])
+
+    if jobs == 1 or len(pending) <= 1:
+        for index in pending:
+            finish(index, run_point(points[index], settings))
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = {pool.submit(run_point, points[index], settings): index for index in pending}
+            for future in concurrent.futures.as_completed(futures):
+                finish(futures[future], future.result())
+    return rows
+
+
+def write_table(filename, rows):
+    """Сохраняет строки таблицы в файл CSV."""
+    columns = list(rows[0]) if rows else []
+    with open(filename, "w", newline="") as table_file:
+        writer = csv.DictWriter(table_file, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def format_table(rows):
+    """Возвращает таблицу в виде текста с выровненными столбцами."""
+    if not rows:
+        return ""
+    columns = list(rows[0])
+
+    def cell(value):
+        if isinstance(value, float):
+            return "%.6g" % value
+        return str(value)
+
+    cells = [columns] + [[cell(row[name]) for name in columns] for row in rows]
+    widths = [max(len(line[k]) for line in cells) for k in range(len(columns))]
+    return "\n".join("  ".join(text.rjust(width) for text, width in zip(line, widths)) for line in cells)
+
+
+def parse_arguments(argv=None):
+    """Разбирает аргументы командной строки.
+
+    Параметры:
+
+    **argv** — список аргументов (по умолчанию sys.argv[1:]).
+    """
+    parser = argparse.ArgumentParser(description="Прогон сетки вариантов системы тел в пуле процессов")
+    parser.add_argument("scenario", nargs="+", help="файлы с описанием системы тел (ось сетки)")
+    parser.add_argument("--dt", type=float, nargs="+", default=[1.0], help="шаги по времени, с")
+    limit = parser.add_mutually_exclusive_group(required=True)
+    limit.add_argument("--steps", type=int, help="число шагов каждого прогона")
+    limit.add_argument("--until", type=float, help="момент физического времени, до которого считать, с")
+    parser.add_argument("--engine", nargs="+", default=["direct"], choices=sorted(model.force_engines),
+                        help="способы вычисления сил")
+    parser.add_argument("--integrator", nargs="+", default=["euler"], choices=sorted(model.integrators),
+                        help="интеграторы")
+    parser.add_argument("--vary", type=parse_variation, action="append", default=[], metavar="FIELD[INDEX]=F,...",
+                        help="множители поля тела, например Vy[1]=0.95,1,1.05 (можно повторять)")
+    parser.add_argument("--body", type=int, default=1, help="тело, для которого собираются итоговые величины")
+    parser.add_argument("--monitor-every", type=int, default=100, help="частота замеров ухода энергии, шагов")
+    parser.add_argument("--jobs", type=int, help="число процессов (по умолчанию число ядер)")
+    parser.add_argument("--cache", default=cache_directory, help="каталог кэша результатов")
+    parser.add_argument("--no-cache", action="store_true", help="не читать и не сохранять результаты в кэше")
+    parser.add_argument("--output", help="файл CSV для таблицы результатов")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Точка входа прогона сетки.
+
+    Параметры:
+
+    **argv** — список аргументов (по умолчанию sys.argv[1:]).
+    """
+    args = parse_arguments(argv)
+    axes = {"scenario": args.scenario, "dt": args.dt, "engine": args.engine, "integrator": args.integrator}
+    axes.update(args.vary)
+    points = parameter_grid(axes)
+    settings = {"steps": args.steps, "until": args.until, "body": args.body, "monitor_every": args.monitor_every}
+    cache = None if args.no_cache else ResultCache(args.cache)
+    started = time.perf_counter()
+    rows = sweep(points, settings, cache, args.jobs,
+                 progress=lambda row: print("done %s dt=%g %s %s" % (row["scenario"], row["dt"], row["engine"],
+                                                                     row["integrator"]), file=sys.stderr))
+    cached = sum(row["cached"] for row in rows)
+    print(format_table(rows))
+    print("%d points (%d from cache) in %.2f s" % (len(rows), cached, time.perf_counter() - started))
+    if args.output:
+        write_table(args.output, rows)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,338 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Запись траекторий всех тел в двоичный файл и чтение через отображение в память.
+
+Траектория хранится в файле формата NumPy .npy — двумерном массиве float64, одна строка на запись:
+
+    t, x[0..N-1], y[0..N-1], Vx[0..N-1], Vy[0..N-1]
+
+Рядом лежит файл <имя>.json с описанием тел (номер, тип, цвет, масса, радиус) и шага по времени.
+Файл можно открыть и обычным numpy.load(path, mmap_mode="r").
+Тела, удалённые из системы во время записи, дальше записываются значениями NaN.
+"""
+
+import bisect
+import json
+import queue
+import threading
+import numpy as np
+import solar_profile
+
+header_size = 128
+"""Размер заголовка .npy в байтах; заголовок переписывается на месте при каждом сбросе буфера"""
+
+chunk_records = 1024
+"""Число записей в одном буфере, передаваемом потоку записи"""
+
+fields = ("x", "y", "Vx", "Vy")
+"""Поля тел, сохраняемые в каждой записи (после времени)"""
+
+keyframe_interval = 1024
+"""Через сколько записей берутся ключевые кадры указателя времени (см. TrajectoryIndex)"""
+
+
+def metadata_path(path):
+    """Возвращает имя файла с описанием тел для файла траектории **path**."""
+    return path + ".json"
+
+
+def _npy_header(records, record_length):
+    """Создаёт заголовок .npy фиксированной длины header_size для массива (records, record_length)."""
+    description = "{'descr': '<f8', 'fortran_order': False, 'shape': (%d, %d), }" % (records, record_length)
+    prefix = b"\x93NUMPY\x01\x00"
+    text_length = header_size - len(prefix) - 2
+    text = description.ljust(text_length - 1) + "\n"
+    return prefix + np.uint16(text_length).tobytes() + text.encode("latin1")
+
+
+class TrajectoryWriter:
+    """Потоковая запись траектории.
+    Записи накапливаются в буфере; заполненный буфер передаётся фоновому потоку,
+    который дописывает его в файл, так что шаг расчёта не ждёт диска.
+    """
+
+    def __init__(self, path, space_objects, dt=None, t0=0.0):
+        """Создаёт файл траектории и описание тел.
+
+        Параметры:
+
+        **path** — имя файла траектории (.npy).
+        **space_objects** — хранилище SpaceObjects с записываемыми телами.
+        **dt** — шаг по времени между записями (если он постоянный).
+        **t0** — начальное физическое время.
+        """
+        self.path = path
+        """Имя файла траектории"""
+        self.ids = space_objects.ids.copy()
+        """Постоянные номера записываемых тел; столбцы файла идут в этом порядке"""
+        self.n_bodies = len(self.ids)
+        self.record_length = 1 + len(fields) * self.n_bodies
+        """Число чисел в одной записи"""
+        self.records = 0
+        """Число сделанных записей"""
+        metadata = {
+            "version": 1,
+            "time_unit": "s",
+            "t0": t0,
+            "dt": dt,
+            "fields": ["t"] + list(fields),
+            "bodies": [
+                {"id": int(body.id), "type": body.type, "color": body.color, "m": body.m, "R": body.R}
+                for body in space_objects
+            ],
+        }
+        with open(metadata_path(path), "w") as metadata_file:
+            json.dump(metadata, metadata_file, indent=1)
+        self._file = open(path, "wb")
+        self._file.write(_npy_header(0, self.record_length))
+        self._buffer = np.empty((chunk_records, self.record_length))
+        self._filled = 0
+        self._queue = queue.Queue(maxsize=4)
+        self._error = None
+        self._thread = threading.Thread(target=self._write_chunks, daemon=True)
+        self._thread.start()
+
+    def record(self, physical_time, space_objects):
+        """Добавляет запись о текущем состоянии тел.
+
+        Параметры:
+
+        **physical_time** — физическое время.
+        **space_objects** — хранилище SpaceObjects.
+        """
+        row = self._buffer[self._filled]
+        row[0] = physical_time
+        n = self.n_bodies
+        if len(space_objects) == n and np.array_equal(space_objects.ids, self.ids):
+            for k, name in enumerate(fields):
+                row[1 + k * n:1 + (k + 1) * n] = space_objects.arrays[name]
+        else:
+            row[1:] = np.nan
+            order = np.argsort(self.ids)
+            position = np.minimum(np.searchsorted(self.ids[order], space_objects.ids), n - 1)
+            columns = order[position]
+            known = self.ids[columns] == space_objects.ids
+            for k, name in enumerate(fields):
+                row[1 + k * n + columns[known]] = space_objects.arrays[name][known]
+        self._filled += 1
+        self.records += 1
+        if self._filled == chunk_records:
+            self.flush()
+
+    def flush(self):
+        """Передаёт накопленные записи потоку записи."""
+        if self._error is not None:
+            raise self._error
+        if self._filled:
+            self._queue.put((self._buffer[:self._filled], self.records))
+            self._buffer = np.empty((chunk_records, self.record_length))
+            self._filled = 0
+
+    def close(self):
+        """Дописывает оставшиеся записи и закрывает файл."""
+        self.flush()
+        self._queue.put(None)
+        self._thread.join()
+        self._file.close()
+        if self._error is not None:
+            raise self._error
+
+    def _write_chunks(self):
+        """Фоновый поток: дописывает буферы в конец файла и обновляет заголовок."""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            if self._error is not None:
+                continue
+            chunk, records = item
+            try:
+                with solar_profile.timer("io"):
+                    self._file.seek(0, 2)
+                    self._file.write(chunk.tobytes())
+                    self._file.seek(0)
+                    self._file.write(_npy_header(records, self.record_length))
+                    self._file.flush()
+            except OSError as error:
+                self._error = error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _TimeColumn:
+    """Последовательность времён записей для bisect: читает только нужные строки отображённого файла."""
+
+    def __init__(self, data):
+        self.data = data
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, index):
+        return self.data[index, 0]
+
+
+class TrajectoryReader:
+    """Чтение траектории через отображение файла в память.
+    Файл не загружается целиком: срез по телам или интервалу времени читает только нужные строки.
+    """
+
+    def __init__(self, path):
+        """
+        Параметры:
+
+        **path** — имя файла траектории (.npy).
+        """
+        with open(metadata_path(path)) as metadata_file:
+            self.metadata = json.load(metadata_file)
+            """Описание тел и шага по времени"""
+        self.bodies = self.metadata["bodies"]
+        """Описания тел в порядке столбцов"""
+        self.n_bodies = len(self.bodies)
+        self.data = np.load(path, mmap_mode="r")
+        """Отображённый в память массив записей"""
+
+    def __len__(self):
+        return len(self.data)
+
+    @property
+    def times(self):
+        """Времена всех записей (читает весь столбец времени)"""
+        return np.asarray(self.data[:, 0])
+
+    def time_at(self, record):
+        """Возвращает время записи с номером **record**."""
+        return float(self.data[record, 0])
+
+    def record_at_time(self, t):
+        """Возвращает номер первой записи со временем не меньше **t** (двоичный поиск, O(log n) чтений)."""
+        return bisect.bisect_left(_TimeColumn(self.data), t)
+
+    def column(self, name, bodies=None):
+        """Возвращает столбцы поля **name** для тел **bodies**.
+
+        Параметры:
+
+        **name** — поле: "x", "y", "Vx" или "Vy".
+        **bodies** — индексы тел (по умолчанию все тела).
+        """
+        start = 1 + fields.index(name) * self.n_bodies
+        if bodies is None:
+            return slice(start, start + self.n_bodies)
+        return start + np.atleast_1d(np.asarray(bodies, dtype=np.intp))
+
+    def state(self, record):
+        """Возвращает словарь {время и поля тел} для записи с номером **record**."""
+        row = np.asarray(self.data[record])
+        result = {"t": float(row[0])}
+        for k, name in enumerate(fields):
+            result[name] = row[1 + k * self.n_bodies:1 + (k + 1) * self.n_bodies]
+        return result
+
+    def slice(self, bodies=None, t_start=None, t_end=None, names=("x", "y")):
+        """Возвращает срез траектории: словарь с массивом времён "t" и массивами (записи × тела)
+        для каждого поля из **names**.
+
+        Параметры:
+
+        **bodies** — индексы тел (по умолчанию все тела).
+        **t_start**, **t_end** — границы интервала времени (включительно); по умолчанию вся запись.
+        **names** — поля тел.
+        """
+        first = 0 if t_start is None else self.record_at_time(t_start)
+        last = len(self.data) if t_end is None else bisect.bisect_right(_TimeColumn(self.data), t_end)
+        rows = self.data[first:last]
+        result = {"t": np.asarray(rows[:, 0])}
+        for name in names:
+            result[name] = np.asarray(rows[:, self.column(name, bodies)])
+        return result
+
+
+class TrajectoryIndex:
+    """Указатель времени записанной траектории для воспроизведения.
+    Времена каждой keyframe_interval-й записи (ключевые кадры) держатся в памяти; поиск момента —
+    двоичный поиск по ключевым кадрам и затем по одному промежутку между ними в файле,
+    так что время поиска почти не зависит от длины записи. Положения тел между записями
+    восстанавливаются кубическим интерполянтом Эрмита по записанным координатам и скоростям.
+    """
+
+    def __init__(self, reader, interval=None):
+        """
+        Параметры:
+
+        **reader** — чтение траектории TrajectoryReader.
+        **interval** — через сколько записей брать ключевые кадры (по умолчанию keyframe_interval).
+        """
+        self.reader = reader
+        """Чтение траектории"""
+        self.interval = interval or keyframe_interval
+        """Число записей между ключевыми кадрами"""
+        self.keyframes = np.asarray(reader.data[::self.interval, 0])
+        """Времена ключевых кадров"""
+        self.t_start = reader.time_at(0) if len(reader) else 0.0
+        """Время первой записи"""
+        self.t_end = reader.time_at(len(reader) - 1) if len(reader) else 0.0
+        """Время последней записи"""
+
+    def locate(self, t):
+        """Возвращает пару (номер записи i, доля s): момент **t** лежит между записями i и i + 1
+        на доле s промежутка между ними. Момент вне записи прижимается к её краю.
+        """
+        last = len(self.reader) - 1
+        if t <= self.t_start or last <= 0:
+            return 0, 0.0
+        if t >= self.t_end:
+            return last, 0.0
+        frame = bisect.bisect_right(self.keyframes, t) - 1
+        low = frame * self.interval
+        high = min(low + self.interval, last) + 1
+        i = bisect.bisect_right(_TimeColumn(self.reader.data), t, low, high) - 1
+        rows = np.asarray(self.reader.data[i:i + 2, 0])
+        if len(rows) < 2 or not rows[1] > rows[0]:
+            return i, 0.0  # записи с одинаковым или убывающим временем не интерполируются
+        return i, (t - rows[0]) / (rows[1] - rows[0])
+
+    def positions(self, t):
+        """Возвращает пару массивов (x, y) положений всех тел в момент **t**.
+        Удалённые к этому моменту тела имеют координаты NaN.
+        """
+        i, s = self.locate(t)
+        rows = np.asarray(self.reader.data[i:i + 2])
+        n = self.reader.n_bodies
+        if s == 0.0 or len(rows) < 2:
+            return rows[0, 1:1 + n].copy(), rows[0, 1 + n:1 + 2 * n].copy()
+        h = rows[1, 0] - rows[0, 0]
+        h00 = 2 * s ** 3 - 3 * s ** 2 + 1
+        h10 = s ** 3 - 2 * s ** 2 + s
+        h01 = 3 * s ** 2 - 2 * s ** 3
+        h11 = s ** 3 - s ** 2
+        result = []
+        for k in (0, 1):
+            position = self.reader.column(fields[k])
+            velocity = self.reader.column(fields[k + 2])
+            result.append(h00 * rows[0, position] + h10 * h * rows[0, velocity]
+                          + h01 * rows[1, position] + h11 * h * rows[1, velocity])
+        return tuple(result)
+
+    def space_objects(self, t=None):
+        """Создаёт хранилище SpaceObjects с телами из описания траектории в их положениях в момент **t**
+        (по умолчанию в начале записи); нужно для создания изображений тел.
+        """
+        from solar_objects import SpaceObjects
+
+        bodies = self.reader.bodies
+        x, y = self.positions(self.t_start if t is None else t)
+        store = SpaceObjects(capacity=max(16, len(bodies)))
+        store.append_columns([body["type"] for body in bodies], [body["color"] for body in bodies],
+                             m=[body["m"] for body in bodies], R=[body["R"] for body in bodies],
+                             x=np.nan_to_num(x), y=np.nan_to_num(y))
+        return store
+
+
+if __name__ == "__main__":
+    print("This module is not for direct call!")
@@ -0,0 +1,322 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Вычисление гравитационных сил методом Барнса — Хата.
+Тела упорядочиваются по кодам Мортона, по ним строится квадродерево,
+обход дерева выполняется векторно сразу для группы тел.
+Сложность шага — O(N log N) вместо O(N²) при прямом суммировании.
+"""
+
+import time
+import numpy as np
+import solar_model as model
+from solar_objects import as_space_objects
+
+opening_angle = 0.5
+"""Угол раскрытия θ: узел размера s на расстоянии d считается точечной массой при s / d < θ.
+Чем меньше θ, тем точнее и медленнее расчёт"""
+
+max_depth = 16
+"""Максимальная глубина дерева. Тела, попавшие в одну ячейку последнего уровня, суммируются напрямую"""
+
+targets_per_pass = 1 << 14
+"""Число тел, для которых дерево обходится одновременно. Ограничивает объём временных массивов"""
+
+
+def _spread_bits(v):
+    """Раздвигает биты 32-битных целых, вставляя нули между ними."""
+    v = v.astype(np.uint64)
+    v = (v | (v << np.uint64(16))) & np.uint64(0x0000FFFF0000FFFF)
+    v = (v | (v << np.uint64(8))) & np.uint64(0x00FF00FF00FF00FF)
+    v = (v | (v << np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    v = (v | (v << np.uint64(2))) & np.uint64(0x3333333333333333)
+    v = (v | (v << np.uint64(1))) & np.uint64(0x5555555555555555)
+    return v
+
+
+class QuadTree:
+    """Квадродерево, построенное по набору тел.
+    Узлы хранятся в плоских массивах, дочерние узлы каждого узла идут подряд.
+    """
+
+    def __init__(self, x, y, m):
+        """Строит дерево по координатам и массам тел.
+
+        Параметры:
+
+        **x**, **y** — массивы координат тел.
+        **m** — массив масс тел.
+        """
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        m = np.asarray(m, dtype=float)
+        x0, y0 = x.min(), y.min()
+        size = max(x.max() - x0, y.max() - y0)
+        if size <= 0:
+            size = 1.0
+        size *= 1 + 1e-9
+        cells = 1 << max_depth
+        ix = np.minimum(((x - x0) / size * cells).astype(np.int64), cells - 1)
+        iy = np.minimum(((y - y0) / size * cells).astype(np.int64), cells - 1)
+        keys = _spread_bits(ix) | (_spread_bits(iy) << np.uint64(1))
+
+        self.order = np.argsort(keys, kind="stable")
+        """Перестановка тел в порядке кодов Мортона"""
+        self.keys = keys[self.order]
+        self.x = x[self.order]
+        self.y = y[self.order]
+        self.m = m[self.order]
+
+        levels = []
+        parent_multi = None
+        parent_start = parent_end = None
+        for level in range(max_depth + 1):
+            shift = np.uint64(2 * (max_depth - level))
+            prefix = self.keys >> shift
+            start = np.flatnonzero(np.concatenate(([True], prefix[1:] != prefix[:-1])))
+            end = np.append(start[1:], len(prefix))
+            if parent_multi is not None:
+                parent = np.searchsorted(parent_start, start, side="right") - 1
+                # ячейки левее первого родителя лежат в отброшенных узлах; индекс -1 указал бы на последний
+                found = parent >= 0
+                start, end, parent = start[found], end[found], parent[found]
+                keep = parent_multi[parent] & (start >= parent_start[parent]) & (start < parent_end[parent])
+                start, end, parent = start[keep], end[keep], parent[keep]
+            else:
+                parent = np.full(len(start), -1)
+            if len(start) == 0:
+                break
+            levels.append((level, start, end, prefix[start], parent))
+            parent_multi = (end - start) > 1
+            parent_start, parent_end = start, end
+            if not parent_multi.any():
+                break
+
+        offsets = np.cumsum([0] + [len(lv[1]) for lv in levels])
+        self.level = np.concatenate([np.full(len(lv[1]), lv[0]) for lv in levels])
+        self.start = np.concatenate([lv[1] for lv in levels])
+        self.end = np.concatenate([lv[2] for lv in levels])
+        self.prefix = np.concatenate([lv[3] for lv in levels])
+        self.shift = (2 * (max_depth - self.level)).astype(np.uint64)
+        self.size = size / (1 << self.level).astype(float)
+        self.count = self.end - self.start
+        self.leaf = (self.count == 1) | (self.level == max_depth)
+
+        self.child_first = np.zeros(len(self.level), dtype=np.int64)
+        self.child_count = np.zeros(len(self.level), dtype=np.int64)
+        for i in range(1, len(levels)):
+            parent = levels[i][4] + offsets[i - 1]
+            children = np.arange(offsets[i], offsets[i + 1])
+            parents, first, counts = np.unique(parent, return_index=True, return_counts=True)
+            self.child_first[parents] = children[first]
+            self.child_count[parents] = counts
+
+        cum_m = np.concatenate(([0.0], np.cumsum(self.m)))
+        cum_mx = np.concatenate(([0.0], np.cumsum(self.m * self.x)))
+        cum_my = np.concatenate(([0.0], np.cumsum(self.m * self.y)))
+        self.mass = cum_m[self.end] - cum_m[self.start]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.cx = (cum_mx[self.end] - cum_mx[self.start]) / self.mass
+            self.cy = (cum_my[self.end] - cum_my[self.start]) / self.mass
+        empty = ~np.isfinite(self.cx)
+        self.cx[empty] = self.x[self.start[empty]]
+        self.cy[empty] = self.y[self.start[empty]]
+
+    def accelerations(self, theta=None, softening=None, targets=None, potential=False):
+        """Вычисляет ускорения тел обходом дерева.
+        Возвращает пару массивов (ax, ay) в исходном порядке тел,
+        а при **potential** — тройку (ax, ay, phi) с потенциалом, вычисленным при том же обходе.
+
+        Параметры:
+
+        **theta** — угол раскрытия, по умолчанию opening_angle.
+        **softening** — длина сглаживания, по умолчанию model.softening_length.
+        **targets** — индексы тел, для которых нужны ускорения (по умолчанию все тела).
+        **potential** — вычислить ли также потенциал.
+        """
+        if theta is None:
+            theta = opening_angle
+        if softening is None:
+            softening = model.softening_length
+        n = len(self.x)
+        inverse = np.empty(n, dtype=np.int64)
+        inverse[self.order] = np.arange(n)
+        if targets is None:
+            sorted_targets = np.arange(n)
+        else:
+            sorted_targets = inverse[np.asarray(targets, dtype=np.intp)]
+        result = np.zeros((3, len(sorted_targets)))
+        for first in range(0, len(sorted_targets), targets_per_pass):
+            chunk = sorted_targets[first:first + targets_per_pass]
+            result[:, first:first + len(chunk)] = self._walk(chunk, theta * theta, softening ** 2)
+        if targets is None:
+            unsorted = np.empty_like(result)
+            unsorted[:, self.order] = result
+            result = unsorted
+        if potential:
+            return result[0], result[1], result[2]
+        return result[0], result[1]
+
+    def _walk(self, chunk, theta2, eps2):
+        """Обходит дерево для группы тел (индексы в упорядоченном массиве).
+        Возвращает тройку (ax, ay, phi)."""
+        k = len(chunk)
+        ax = np.zeros(k)
+        ay = np.zeros(k)
+        phi = np.zeros(k)
+        g = model.gravitational_constant
+        t = np.arange(k)
+        node = np.zeros(k, dtype=np.int64)
+        while len(t):
+            body = chunk[t]
+            dx = self.cx[node] - self.x[body]
+            dy = self.cy[node] - self.y[body]
+            d2 = dx * dx + dy * dy
+            inside = (self.keys[body] >> self.shift[node]) == self.prefix[node]
+            far = ~inside & (self.size[node] ** 2 < theta2 * d2)
+
+            r2 = d2[far] + eps2
+            gm_r = g * self.mass[node[far]] / np.sqrt(r2)
+            factor = gm_r / r2
+            ax += np.bincount(t[far], weights=factor * dx[far], minlength=k)
+            ay += np.bincount(t[far], weights=factor * dy[far], minlength=k)
+            phi -= np.bincount(t[far], weights=gm_r, minlength=k)
+
+            near_leaf = ~far & self.leaf[node]
+            if near_leaf.any():
+                leaf_t = t[near_leaf]
+                leaf_node = node[near_leaf]
+                counts = self.count[leaf_node]
+                pair_t = np.repeat(leaf_t, counts)
+                offsets = np.arange(len(pair_t)) - np.repeat(np.cumsum(counts) - counts, counts)
+                pair_b = np.repeat(self.start[leaf_node], counts) + offsets
+                other = pair_b != chunk[pair_t]  # тело не действует гравитационной силой на само себя!
+                pair_t, pair_b = pair_t[other], pair_b[other]
+                bdx = self.x[pair_b] - self.x[chunk[pair_t]]
+                bdy = self.y[pair_b] - self.y[chunk[pair_t]]
+                r2 = bdx * bdx + bdy * bdy + eps2
+                gm_r = g * self.m[pair_b] / np.sqrt(r2)
+                factor = gm_r / r2
+                ax += np.bincount(pair_t, weights=factor * bdx, minlength=k)
+                ay += np.bincount(pair_t, weights=factor * bdy, minlength=k)
+                phi -= np.bincount(pair_t, weights=gm_r, minlength=k)
+
+            opened = ~far & ~self.leaf[node]
+            open_t = t[opened]
+            open_node = node[opened]
+            counts = self.child_count[open_node]
+            t = np.repeat(open_t, counts)
+            node = np.repeat(self.child_first[open_node], counts) + \
+                np.arange(len(t)) - np.repeat(np.cumsum(counts) - counts, counts)
+        return ax, ay, phi
+
+
+def tree_accelerations(x, y, m, theta=None, softening=None, targets=None, potential=False):
+    """Строит дерево и вычисляет ускорения тел методом Барнса — Хата.
+    Возвращает пару массивов (ax, ay) для тел из **targets**
+    или тройку (ax, ay, phi) вместе с потенциалом при **potential**.
+
+    Параметры:
+
+    **x**, **y** — массивы координат всех тел.
+    **m** — массив масс всех тел.
+    **theta** — угол раскрытия, по умолчанию opening_angle.
+    **softening** — длина сглаживания, по умолчанию model.softening_length.
+    **targets** — индексы тел, для которых нужны ускорения (по умолчанию все тела).
+    **potential** — вычислить ли также потенциал.
+    """
+    return QuadTree(x, y, m).accelerations(theta, softening, targets, potential)
+
+
+def calculate_forces_barnes_hut(space_objects, theta=None, softening=None):
+    """Вычисляет силы, действующие на все тела, методом Барнса — Хата.
+    Дерево перестраивается при каждом вызове.
+
+    Параметры:
+
+    **space_objects** — хранилище или список объектов, для которых нужно вычислить силы.
+    **theta** — угол раскрытия, по умолчанию opening_angle.
+    **softening** — длина сглаживания, по умолчанию model.softening_length.
+    """
+    store = as_space_objects(space_objects)
+    ax, ay = tree_accelerations(store.x, store.y, store.m, theta, softening)
+    store.Fx[:] = store.m * ax
+    store.Fy[:] = store.m * ay
+    store.copy_to(space_objects)
+
+
+def accuracy_report(x, y, m, thetas=(0.3, 0.5, 0.7, 1.0), softening=None):
+    """Сравнивает метод Барнса — Хата с прямым суммированием по точности и времени.
+    Возвращает список словарей с полями theta, time, direct_time, speedup,
+    median_error и max_error (относительные ошибки модуля ускорения).
+
+    Параметры:
+
+    **x**, **y** — массивы координат тел.
+    **m** — массив масс тел.
+    **thetas** — проверяемые значения угла раскрытия.
+    **softening** — длина сглаживания, по умолчанию model.softening_length.
+    """
+    started = time.perf_counter()
+    ax, ay = model.calculate_accelerations(x, y, m, softening)
+    direct_time = time.perf_counter() - started
+    norm = np.hypot(ax, ay)
+    norm[norm == 0] = 1.0
+    report = []
+    for theta in thetas:
+        started = time.perf_counter()
+        tx, ty = tree_accelerations(x, y, m, theta, softening)
+        elapsed = time.perf_counter() - started
+        error = np.hypot(tx - ax, ty - ay) / norm
+        report.append({
+            "theta": theta,
+            "time": elapsed,
+            "direct_time": direct_time,
+            "speedup": direct_time / elapsed,
+            "median_error": float(np.median(error)),
+            "max_error": float(error.max()),
+        })
+    return report
+
+
+def random_disc(n, radius=1E12, central_mass=1.98892E30, seed=0):
+    """Создаёт массивы (x, y, m) для синтетического диска из **n** тел вокруг центральной массы.
+
+    Параметры:
+
+    **n** — число тел вместе с центральным.
+    **radius** — радиус диска.
+    **central_mass** — масса центрального тела.
+    **seed** — зерно генератора случайных чисел.
+    """
+    rng = np.random.default_rng(seed)
+    r = radius * np.sqrt(rng.uniform(0.01, 1.0, n))
+    phi = rng.uniform(0, 2 * np.pi, n)
+    x = r * np.cos(phi)
+    y = r * np.sin(phi)
+    m = rng.uniform(1E18, 1E22, n)
+    x[0] = y[0] = 0.0
+    m[0] = central_mass
+    return x, y, m
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Точность и скорость метода Барнса — Хата по сравнению с прямой суммой")
+    parser.add_argument("scenario", nargs="?", help="файл с описанием системы (по умолчанию синтетический диск)")
+    parser.add_argument("-n", type=int, default=5000, help="число тел синтетического диска")
+    parser.add_argument("--theta", type=float, nargs="+", default=[0.3, 0.5, 0.7, 1.0])
+    args = parser.parse_args()
+    if args.scenario:
+        import solar_input
+        objects = solar_input.read_space_objects_data_from_file(args.scenario)
+        bodies = (np.array([obj.x for obj in objects]), np.array([obj.y for obj in objects]),
+                  np.array([obj.m for obj in objects]))
+    else:
+        bodies = random_disc(args.n)
+    print("%6s %10s %10s %9s %12s %12s" % ("theta", "tree, s", "direct, s", "speedup", "median err", "max err"))
+    for row in accuracy_report(*bodies, thetas=args.theta):
+        print("%6.2f %10.4f %10.4f %9.2f %12.2e %12.2e" % (row["theta"], row["time"], row["direct_time"],
+                                                             row["speedup"], row["median_error"], row["max_error"]))
@@ -6,9 +6,16 @@
 Функции, создающие графические объекты и перемещающие их на экране, принимают физические координаты
 """
 
+import time
+import numpy as np
+import solar_profile
+
 header_font = "Arial-16"
 """Шрифт в заголовке"""
 
+overlay_font = "Courier-10"
+"""Шрифт вывода замеров времени поверх холста"""
+
 window_width = 800
 """Ширина окна"""
 
@@ -107,7 +114,25 @@ def update_system_name(space, system_name, space_writing=0):
     return space.create_text(window_width / 2, 20, tag="header", text=system_name, font=header_font, fill="magenta")
 
 
-def update_object_position(space, body, scale_factor):
+def update_profile_overlay(space, lines, overlay=0):
+    """Выводит в левом верхнем углу холста строки с замерами времени (см. solar_profile.overlay_lines).
+    Возвращает номер текста на холсте; если текст уже был, обновляет его содержание.
+
+    Параметры:
+
+    **space** — холст для рисования.
+    **lines** — выводимые строки.
+    **overlay** - номер уже выведенного текста или 0
+    """
+    if overlay != 0:
+        space.itemconfigure(overlay, text="\n".join(lines))
+        space.tag_raise(overlay)
+        return overlay
+    return space.create_text(10, 40, anchor="nw", tag="profile", text="\n".join(lines), font=overlay_font,
+                             fill="yellow")
+
+
+def update_object_position(space, body, scale_factor, position=None):
     """Перемещает отображаемый объект на холсте.
 
     Параметры:
@@ -115,15 +140,149 @@ def update_object_position(space, body, scale_factor):
     **space** — холст для рисования.
     **body** — тело, которое нужно переместить.
     **scale_factor** - коэффициент масштабирования.
+    **position** - физические координаты (x, y), в которые нужно поместить изображение;
+    по умолчанию берутся координаты тела
     """
-    x = scale_x(body.x, scale_factor)
-    y = scale_y(body.y, scale_factor)
+    if position is None:
+        position = (body.x, body.y)
+    x = scale_x(position[0], scale_factor)
+    y = scale_y(position[1], scale_factor)
     r = body.R
     if x + r < 0 or x - r > window_width or y + r < 0 or y - r > window_height:
         space.coords(body.image, window_width + r, window_height + r,
                      window_width + 2 * r, window_height + 2 * r)  # положить за пределы окна
+        return
     space.coords(body.image, x - r, y - r, x + r, y + r)
 
 
+point_radius = 1.5
+"""Тела с радиусом меньше этого числа пикселов рисуются точкой (прямоугольником 1×1 без контура)"""
+
+
+def create_point_image(space, body, scale_factor):
+    """Создаёт упрощённый отображаемый объект маленького тела — точку.
+
+    Параметры:
+
+    **space** — холст для рисования.
+    **body** — тело.
+    **scale_factor** - коэффициент масштабирования.
+    """
+    x = scale_x(body.x, scale_factor)
+    y = scale_y(body.y, scale_factor)
+    body.image = space.create_rectangle([x, y], [x + 1, y + 1], fill=body.color, outline="")
+
+
+class CanvasRenderer:
+    """Пакетная отрисовка тел на холсте.
+    Экранные координаты всех тел вычисляются одним векторным проходом,
+    изображения неподвижных на экране тел не трогаются, ушедшие за край окна прячутся,
+    а все изменения за кадр отправляются в Tcl одним вызовом.
+    """
+
+    def __init__(self, space, scale_factor):
+        """
+        Параметры:
+
+        **space** — холст для рисования.
+        **scale_factor** - коэффициент масштабирования.
+        """
+        self.space = space
+        """Холст для рисования"""
+        self.scale_factor = scale_factor
+        """Коэффициент масштабирования"""
+        self.images = np.zeros(0, dtype=np.int64)
+        """Номера изображений тел на холсте"""
+        self.ids = np.zeros(0, dtype=np.int64)
+        """Постоянные номера тел в порядке изображений"""
+        self.radius = np.zeros(0)
+        """Экранные радиусы тел (0 для точек)"""
+        self.last_x = self.last_y = np.zeros(0, dtype=np.int64)
+        self.hidden = np.zeros(0, dtype=bool)
+        self.last_render_time = 0.0
+        """Время отрисовки последнего кадра в секундах"""
+        self.last_updated = 0
+        """Число изображений, изменённых в последнем кадре"""
+
+    def create_images(self, space_objects):
+        """Создаёт изображения всех тел и запоминает их.
+
+        Параметры:
+
+        **space_objects** — хранилище или список космических объектов.
+        """
+        for obj in space_objects:
+            if obj.R < point_radius:
+                create_point_image(self.space, obj, self.scale_factor)
+            elif obj.type == 'star':
+                create_star_image(self.space, obj, self.scale_factor)
+            elif obj.type == 'planet':
+                create_planet_image(self.space, obj, self.scale_factor)
+            else:
+                raise AssertionError()
+        self.images = np.array([obj.image for obj in space_objects], dtype=np.int64)
+        self.ids = np.array([getattr(obj, "id", k) for k, obj in enumerate(space_objects)], dtype=np.int64)
+        self.radius = np.array([0 if obj.R < point_radius else obj.R for obj in space_objects])
+        self.last_x = np.array([scale_x(obj.x, self.scale_factor) for obj in space_objects], dtype=np.int64)
+        self.last_y = np.array([scale_y(obj.y, self.scale_factor) for obj in space_objects], dtype=np.int64)
+        self.hidden = np.zeros(len(self.images), dtype=bool)
+
+    def sync(self, ids):
+        """Удаляет изображения тел, которых больше нет в хранилище, и переставляет остальные
+        в порядке хранилища (удаление тела переносит на его место последнее тело).
+
+        Параметры:
+
+        **ids** — постоянные номера тел хранилища в текущем порядке.
+        """
+        if np.array_equal(ids, self.ids):
+            return
+        order = np.argsort(self.ids)
+        kept = order[np.searchsorted(self.ids[order], ids)]
+        gone = np.setdiff1d(np.arange(len(self.ids)), kept)
+        if len(gone):
+            self.space.tk.eval("%s delete %s" % (self.space._w, " ".join(str(item) for item in self.images[gone])))
+        self.images = self.images[kept]
+        self.ids = self.ids[kept]
+        self.radius = self.radius[kept]
+        self.last_x = self.last_x[kept]
+        self.last_y = self.last_y[kept]
+        self.hidden = self.hidden[kept]
+
+    def render(self, x, y):
+        """Переносит изображения тел в новые физические координаты.
+
+        Параметры:
+
+        **x**, **y** — массивы физических координат тел (в том же порядке, что и при create_images).
+        """
+        started = time.perf_counter()
+        sx = (np.asarray(x) * self.scale_factor).astype(np.int64) + window_width // 2
+        sy = (window_height / 2 - np.asarray(y) * self.scale_factor).astype(np.int64)
+        r = self.radius
+        visible = (sx + r >= 0) & (sx - r <= window_width) & (sy + r >= 0) & (sy - r <= window_height)
+        moved = visible & ((sx != self.last_x) | (sy != self.last_y))
+        path = self.space._w
+        commands = []
+        for i in np.flatnonzero(visible & self.hidden):
+            commands.append("%s itemconfigure %d -state normal" % (path, self.images[i]))
+        for i in np.flatnonzero(~visible & ~self.hidden):
+            commands.append("%s itemconfigure %d -state hidden" % (path, self.images[i]))
+        x0 = np.where(r > 0, sx - r, sx)
+        y0 = np.where(r > 0, sy - r, sy)
+        x1 = np.where(r > 0, sx + r, sx + 1)
+        y1 = np.where(r > 0, sy + r, sy + 1)
+        for i in np.flatnonzero(moved):
+            commands.append("%s coords %d %g %g %g %g" % (path, self.images[i], x0[i], y0[i], x1[i], y1[i]))
+        if commands:
+            with solar_profile.timer("canvas"):
+                self.space.tk.eval("\n".join(commands))
+        self.last_x = np.where(moved, sx, self.last_x)
+        self.last_y = np.where(moved, sy, self.last_y)
+        self.hidden = ~visible
+        self.last_updated = len(commands)
+        self.last_render_time = time.perf_counter() - started
+
+
 if __name__ == "__main__":
     print("This module is not for direct call!")
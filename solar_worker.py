@@ -0,0 +1,185 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Расчёт в фоновом потоке.
+Поток расчёта выполняет шаги модели и публикует снимки положений тел в двойной буфер,
+графический интерфейс с постоянной частотой кадров читает из буфера последний снимок.
+"""
+
+import threading
+import numpy as np
+
+
+class Snapshot:
+    """Снимок состояния системы, опубликованный потоком расчёта."""
+
+    x = None
+    """Координаты тел по оси **x**"""
+
+    y = None
+    """Координаты тел по оси **y**"""
+
+    ids = None
+    """Постоянные номера тел (меняются, когда тела удаляются из хранилища)"""
+
+    physical_time = 0
+    """Физическое время снимка"""
+
+    steps = 0
+    """Число шагов, выполненных к моменту снимка"""
+
+    version = 0
+    """Номер публикации; растёт с каждым новым снимком"""
+
+
+class SnapshotBuffer:
+    """Двойной буфер снимков.
+    Писатель заполняет задний снимок без блокировки и под блокировкой меняет его местами с передним,
+    читатель под той же блокировкой копирует передний снимок.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._front = Snapshot()
+        self._back = Snapshot()
+
+    def publish(self, space_objects, physical_time, steps):
+        """Публикует положения тел.
+
+        Параметры:
+
+        **space_objects** — хранилище SpaceObjects.
+        **physical_time** — физическое время.
+        **steps** — число выполненных шагов.
+        """
+        back = self._back
+        if back.x is None or len(back.x) != len(space_objects):
+            back.x = np.empty(len(space_objects))
+            back.y = np.empty(len(space_objects))
+            back.ids = np.empty(len(space_objects), dtype=np.int64)
+        back.x[:] = space_objects.x
+        back.y[:] = space_objects.y
+        back.ids[:] = space_objects.ids
+        back.physical_time = physical_time
+        back.steps = steps
+        with self._lock:
+            back.version = self._front.version + 1
+            self._front, self._back = back, self._front
+
+    def latest(self):
+        """Возвращает копию последнего опубликованного снимка или None, если снимков ещё не было."""
+        with self._lock:
+            front = self._front
+            if front.x is None:
+                return None
+            snapshot = Snapshot()
+            snapshot.x = front.x.copy()
+            snapshot.y = front.y.copy()
+            snapshot.ids = front.ids.copy()
+            snapshot.physical_time = front.physical_time
+            snapshot.steps = front.steps
+            snapshot.version = front.version
+            return snapshot
+
+
+class SimulationWorker(threading.Thread):
+    """Поток, выполняющий шаги модели solar_model.Simulation и публикующий снимки в SnapshotBuffer.
+    Создаётся приостановленным; управляется методами resume, pause и stop.
+    Без квоты считает без остановки, с квотой (см. grant) — не больше выданного числа шагов.
+    Исключение в шаге расчёта не завершает поток: оно сохраняется в error, а расчёт приостанавливается.
+    """
+
+    def __init__(self, simulation, buffer, stats=None):
+        """
+        Параметры:
+
+        **simulation** — расчёт solar_model.Simulation.
+        **buffer** — буфер снимков SnapshotBuffer.
+        **stats** — статистика solar_stats.SystemStatistics, обновляемая после каждого шага.
+        """
+        super().__init__(daemon=True)
+        self.simulation = simulation
+        """Расчёт, выполняемый потоком"""
+        self.buffer = buffer
+        """Буфер снимков"""
+        self.stats = stats
+        """Статистика тел"""
+        self.steps = 0
+        """Число выполненных шагов"""
+        self.error = None
+        """Исключение, на котором остановился расчёт (None, пока ошибок не было)"""
+        self._condition = threading.Condition()
+        self._running = False
+        self._stopped = False
+        self._quota = None
+        self._step_lock = threading.Lock()
+        buffer.publish(simulation.space_objects, simulation.physical_time, 0)
+
+    def run(self):
+        while True:
+            with self._condition:
+                while not self._stopped and not (self._running and self._quota != 0):
+                    self._condition.wait()
+                if self._stopped:
+                    return
+            with self._step_lock:
+                if self._stopped or not self._running:
+                    continue
+                try:
+                    self.simulation.step()
+                except Exception as error:
+                    with self._condition:
+                        self.error = error
+                        self._running = False
+                    continue
+                self.steps += 1
+                with self._condition:
+                    if self._quota:
+                        self._quota -= 1
+                if self.stats is not None:
+                    self.stats.update(self.simulation.space_objects, self.simulation.physical_time)
+                self.buffer.publish(self.simulation.space_objects, self.simulation.physical_time, self.steps)
+
+    def grant(self, steps):
+        """Разрешает выполнить ещё **steps** шагов (неизрасходованная квота заменяется новой).
+        При **steps** равном None поток считает без ограничений.
+
+        Параметры:
+
+        **steps** — число разрешённых шагов или None.
+        """
+        with self._condition:
+            self._quota = steps
+            self._condition.notify()
+
+    @property
+    def pending(self):
+        """Число ещё не выполненных шагов из выданной квоты (0, если квоты нет)"""
+        with self._condition:
+            return self._quota or 0
+
+    def resume(self):
+        """Запускает или продолжает расчёт, забывая прошлую ошибку."""
+        with self._condition:
+            self.error = None
+            self._running = True
+            self._condition.notify()
+        if not self.is_alive():
+            self.start()
+
+    def pause(self):
+        """Приостанавливает расчёт и дожидается окончания текущего шага.
+        После возврата состояние модели можно безопасно читать и менять.
+        """
+        with self._condition:
+            self._running = False
+        with self._step_lock:
+            pass
+
+    def stop(self):
+        """Завершает поток расчёта."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        if self.is_alive():
+            self.join()
@@ -0,0 +1,20 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Общие настройки тестов: модули программы и файлы сценариев лежат в корне репозитория."""
+
+import os
+import sys
+
+import pytest
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+"""Корень репозитория"""
+
+sys.path.insert(0, root)
+
+
+@pytest.fixture
+def scenario():
+    """Возвращает функцию, дающую полное имя файла сценария из корня репозитория."""
+    return lambda name: os.path.join(root, name)
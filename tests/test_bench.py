@@ -0,0 +1,41 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Проверки набора замеров."""
+
+import pytest
+
+import solar_bench
+
+
+def test_compare_flags_slowdowns_and_memory_growth():
+    baseline = {"benchmarks": {"a": {"steps_per_second": 100.0, "peak_memory": 1000},
+                               "b": {"steps_per_second": 10.0, "peak_memory": 1000},
+                               "c": {"skipped": "too many pairs"}}}
+    current = {"benchmarks": {"a": {"steps_per_second": 80.0, "peak_memory": 1050},
+                              "b": {"steps_per_second": 30.0, "peak_memory": 2000},
+                              "c": {"steps_per_second": 1.0, "peak_memory": 1}}}
+    rows = {(row["name"], row["metric"]): row for row in solar_bench.compare(baseline, current)}
+    assert set(rows) == {("a", "steps_per_second"), ("a", "peak_memory"), ("b", "steps_per_second"),
+                         ("b", "peak_memory")}
+    assert rows["a", "steps_per_second"]["change"] == pytest.approx(-0.2)
+    assert [name for name, row in sorted(rows.items()) if row["regression"]] == [("a", "steps_per_second"),
+                                                                                ("b", "peak_memory")]
+
+
+def test_compare_flags_slower_startup():
+    baseline = {"benchmarks": {"startup/headless": {"startup_time": 0.1}}}
+    current = {"benchmarks": {"startup/headless": {"startup_time": 0.15}}}
+    assert solar_bench.compare(baseline, current)[0]["regression"]
+    assert not solar_bench.compare(baseline, current, threshold=0.6)[0]["regression"]
+
+
+def test_suite_skips_integrators_unsuitable_for_scenario(monkeypatch):
+    """Схема Уиздома — Холмана на двойной звезде не обрывает замеры, а отмечается пропущенной."""
+    monkeypatch.setattr(solar_bench, "scenarios", ("double_star.txt",))
+    monkeypatch.setattr(solar_bench, "run_startup", lambda progress=None: {})
+    monkeypatch.setattr(solar_bench, "min_time", 0.0)
+    monkeypatch.setattr(solar_bench, "max_steps", 2)
+    results = solar_bench.run_suite(["numpy"], ["leapfrog", "wisdom_holman"], sizes=[])["benchmarks"]
+    assert "dominant body" in results["recalculate/double_star.txt/numpy/wisdom_holman"]["skipped"]
+    assert results["recalculate/double_star.txt/numpy/leapfrog"]["steps"] > 0
@@ -0,0 +1,36 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Проверки блочных шагов по времени."""
+
+import numpy as np
+
+import solar_input
+import solar_model as model
+
+
+def _run(scenario, integrator, dt, steps):
+    store = solar_input.read_space_objects_data_from_file(scenario("solar_system.txt"))
+    state = model.IntegratorState()
+    for step in range(steps):
+        model.recalculate_space_objects_positions(store, dt, step * dt, "numpy", integrator, state)
+    return store, state
+
+
+def test_block_steps_save_pair_evaluations(scenario):
+    """Дальние планеты шагают реже ближних, и сил вычисляется заметно меньше, чем при общем мелком шаге."""
+    store, state = _run(scenario, "block", 86400.0, 30)
+    report = model.block_time_step_report(state)
+    assert report["pair_evaluations"] < report["reference_pair_evaluations"]
+    assert report["saved"] > 0.5
+    assert state.levels.max() > state.levels.min()
+
+
+def test_block_steps_follow_fine_leapfrog(scenario):
+    """Результат близок к схеме leapfrog с самым мелким из блочных шагов для всех тел."""
+    store, state = _run(scenario, "block", 86400.0, 30)
+    substeps = 1 << int(state.levels.max())
+    reference, _ = _run(scenario, "leapfrog", 86400.0 / substeps, 30 * substeps)
+    distance = np.hypot(reference.x[1:] - reference.x[0], reference.y[1:] - reference.y[0])
+    error = np.hypot(store.x[1:] - reference.x[1:], store.y[1:] - reference.y[1:])
+    assert np.all(error < 1E-3 * distance)
@@ -0,0 +1,64 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Проверки контрольных точек."""
+
+import numpy as np
+import pytest
+
+import solar_checkpoint
+import solar_input
+import solar_model as model
+import solar_stats
+
+
+def _simulation(scenario, integrator):
+    space_objects = solar_input.read_space_objects_data_from_file(scenario("solar_system.txt"))
+    return model.Simulation(space_objects, 3600.0, "numpy", integrator)
+
+
+def _advance(simulation, stats, steps):
+    for _ in range(steps):
+        simulation.step()
+        stats.update(simulation.space_objects, simulation.physical_time)
+
+
+@pytest.mark.parametrize("integrator", ["leapfrog", "yoshida4", "rk45", "block", "wisdom_holman"])
+def test_resume_is_bit_exact(scenario, tmp_path, integrator):
+    """Расчёт, продолженный с контрольной точки, совпадает с непрерывным до последнего бита."""
+    path = str(tmp_path / "run.ckpt")
+    simulation = _simulation(scenario, integrator)
+    stats = solar_stats.SystemStatistics(simulation.space_objects)
+    _advance(simulation, stats, 20)
+    solar_checkpoint.save_checkpoint(path, simulation, stats, {"steps": 20})
+    _advance(simulation, stats, 20)
+
+    resumed, resumed_stats, extra = solar_checkpoint.load_checkpoint(path)
+    assert extra == {"steps": 20}
+    _advance(resumed, resumed_stats, 20)
+
+    assert resumed.physical_time == simulation.physical_time
+    for name in ("x", "y", "Vx", "Vy", "m"):
+        np.testing.assert_array_equal(getattr(resumed.space_objects, name), getattr(simulation.space_objects, name))
+    np.testing.assert_equal(resumed_stats.summary(), stats.summary())
+    np.testing.assert_equal(resumed_stats.distance_history.arrays(), stats.distance_history.arrays())
+
+
+@pytest.mark.parametrize("content", [b"", b"not a checkpoint", b"\x80\x04\x95", b"\x80\x04csolar_missing\nThing\n."])
+def test_unreadable_file_is_checkpoint_error(tmp_path, content):
+    """Обрезанный файл и чужой pickle дают CheckpointError, которую перехватывают вызывающие программы."""
+    path = tmp_path / "broken.ckpt"
+    path.write_bytes(content)
+    with pytest.raises(solar_checkpoint.CheckpointError):
+        solar_checkpoint.load_checkpoint(str(path))
+
+
+def test_truncated_checkpoint_is_checkpoint_error(scenario, tmp_path):
+    path = str(tmp_path / "run.ckpt")
+    solar_checkpoint.save_checkpoint(path, _simulation(scenario, "leapfrog"))
+    with open(path, "rb") as checkpoint_file:
+        content = checkpoint_file.read()
+    with open(path, "wb") as checkpoint_file:
+        checkpoint_file.write(content[:len(content) // 2])
+    with pytest.raises(solar_checkpoint.CheckpointError):
+        solar_checkpoint.load_checkpoint(path)
@@ -0,0 +1,62 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Проверки поиска и обработки столкновений."""
+
+import numpy as np
+import pytest
+
+import solar_collisions
+import solar_model as model
+from solar_objects import SpaceObjects
+
+
+def test_close_pairs_find_every_near_pair():
+    """Кандидаты из сетки содержат все пары ближе размера ячейки, найденные полным перебором."""
+    rng = np.random.default_rng(0)
+    x, y = rng.uniform(-1E3, 1E3, 500), rng.uniform(-1E3, 1E3, 500)
+    i, j = solar_collisions.close_pairs(x, y, 40.0)
+    found = set(zip(i.tolist(), j.tolist()))
+    distance = np.hypot(x[:, np.newaxis] - x, y[:, np.newaxis] - y)
+    expected = {(a, b) for a, b in zip(*np.nonzero(distance < 40.0)) if a < b}
+    assert expected <= found
+    assert all(a < b for a, b in found)
+
+
+def _pair(policy):
+    store = SpaceObjects()
+    store.append_columns(["planet"] * 3, ["red", "blue", "green"], m=np.array([3E20, 1E20, 1E20]),
+                         x=np.array([0.0, 1.5E3, 1E9]), y=np.array([0.0, 500.0, 0.0]),
+                         Vx=np.array([10.0, -20.0, 0.0]), Vy=np.array([1.0, 2.0, 5.0]), R=np.full(3, 5.0))
+    simulation = model.Simulation(store, 1.0)
+    detector = solar_collisions.CollisionDetector(policy, radius=1E3)
+    return store, simulation, detector
+
+
+def _momentum(store):
+    return (store.m * store.Vx).sum(), (store.m * store.Vy).sum()
+
+
+def _kinetic_energy(store):
+    return 0.5 * (store.m * (store.Vx ** 2 + store.Vy ** 2)).sum()
+
+
+def test_merge_conserves_mass_and_momentum():
+    store, simulation, detector = _pair("merge")
+    mass, momentum = store.m.sum(), _momentum(store)
+    removed = detector.after_step(simulation)
+    assert len(removed) == 1 and len(store) == 2
+    assert store.m.sum() == mass
+    np.testing.assert_allclose(_momentum(store), momentum, rtol=1E-15)
+    assert store.x[0] == (3E20 * 0.0 + 1E20 * 1.5E3) / 4E20
+    assert detector.counts["collision"] == 1
+
+
+def test_bounce_conserves_momentum_and_energy():
+    store, simulation, detector = _pair("bounce")
+    momentum = _momentum(store)
+    energy = _kinetic_energy(store)
+    detector.after_step(simulation)
+    assert len(store) == 3 and store.Vx[1] > -20.0
+    np.testing.assert_allclose(_momentum(store), momentum, rtol=1E-15)
+    assert _kinetic_energy(store) == pytest.approx(energy, rel=1E-14)
@@ -0,0 +1,64 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Проверки монитора сохраняющихся величин."""
+
+import warnings
+
+import numpy as np
+import pytest
+
+import solar_diagnostics
+import solar_input
+import solar_model as model
+
+
+def _simulation(scenario, name, dt, integrator, monitor):
+    space_objects = solar_input.read_space_objects_data_from_file(scenario(name))
+    simulation = model.Simulation(space_objects, dt, "numpy", integrator)
+    simulation.monitor = monitor
+    return simulation
+
+
+def test_energy_matches_pairwise_sum(scenario):
+    space_objects = solar_input.read_space_objects_data_from_file(scenario("solar_system.txt"))
+    m, x, y = space_objects.m, space_objects.x, space_objects.y
+    expected = 0.0
+    for i in range(len(m)):
+        for j in range(i):
+            expected -= model.gravitational_constant * m[i] * m[j] / np.hypot(x[i] - x[j], y[i] - y[j])
+    simulation = _simulation(scenario, "solar_system.txt", 3600.0, "leapfrog", None)
+    potential = model.current_potential(simulation.space_objects, simulation.engine, simulation.state)
+    quantities = solar_diagnostics.conserved_quantities(simulation.space_objects, potential)
+    assert quantities["potential"] == pytest.approx(expected, rel=1E-12)
+
+
+def test_symplectic_run_stays_within_budget(scenario):
+    monitor = solar_diagnostics.ConservationMonitor(cadence=50, budget=1E-6)
+    simulation = _simulation(scenario, "solar_system.txt", 3600.0, "leapfrog", monitor)
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        for _ in range(200):
+            simulation.step()
+    summary = monitor.summary()
+    assert summary["samples"] == 5  # начальный замер и каждые 50 шагов
+    assert summary["max_energy_drift"] < 1E-6
+    assert summary["last"]["momentum_drift"] < 1E-12
+    assert summary["last"]["angular_momentum_drift"] < 1E-12
+
+
+def test_drift_policies(scenario):
+    """Уход энергии сверх допустимого даёт предупреждение или уменьшение шага, в зависимости от политики."""
+    monitor = solar_diagnostics.ConservationMonitor(cadence=5, budget=1E-9)
+    simulation = _simulation(scenario, "one_oval_satellite.txt", 86400.0, "euler", monitor)
+    with pytest.warns(solar_diagnostics.EnergyDriftWarning):
+        for _ in range(20):
+            simulation.step()
+    assert simulation.dt == 86400.0
+
+    monitor = solar_diagnostics.ConservationMonitor(cadence=5, budget=1E-9, policy="reduce")
+    simulation = _simulation(scenario, "one_oval_satellite.txt", 86400.0, "euler", monitor)
+    for _ in range(20):
+        simulation.step()
+    assert monitor.reductions > 0
+    assert simulation.dt == 86400.0 / 2 ** monitor.reductions
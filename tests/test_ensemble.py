@@ -0,0 +1,41 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Проверки ансамбля независимых систем."""
+
+import numpy as np
+import pytest
+
+import solar_input
+import solar_model as model
+
+
+@pytest.mark.parametrize("integrator", ["leapfrog", "yoshida4"])
+def test_each_system_follows_single_simulation(scenario, integrator):
+    """Каждая система ансамбля движется так же, как та же система, посчитанная отдельно."""
+    space_objects = solar_input.read_space_objects_data_from_file(scenario("solar_system.txt"))
+    ensemble = model.Ensemble.from_space_objects(space_objects, 3, dt=3600.0, integrator=integrator)
+    ensemble.Vy[1, 3] *= 1.01
+    ensemble.run(steps=50)
+    for k in range(len(ensemble)):
+        single = solar_input.read_space_objects_data_from_file(scenario("solar_system.txt"))
+        if k == 1:
+            single.Vy[3] *= 1.01
+        simulation = model.Simulation(single, 3600.0, "numpy", integrator)
+        for _ in range(50):
+            simulation.step()
+        distance = np.hypot(single.x - single.x[0], single.y - single.y[0])
+        error = np.hypot(ensemble.x[k] - single.x, ensemble.y[k] - single.y)
+        assert np.all(error <= 1E-9 * np.maximum(distance, 1.0))
+    assert list(ensemble.steps) == [50] * 3
+
+
+def test_diverged_systems_are_dropped(scenario):
+    space_objects = solar_input.read_space_objects_data_from_file(scenario("one_satellite.txt"))
+    ensemble = model.Ensemble.from_space_objects(space_objects, 2, dt=3600.0, escape_distance=3E11)
+    ensemble.Vy[1, 1] *= 2.0  # скорость больше второй космической: спутник уходит
+    ensemble.run(until=200 * 86400.0)
+    results = ensemble.results()
+    assert [row["status"] for row in results] == ["finished", "diverged"]
+    assert results[0]["physical_time"] >= 200 * 86400.0
+    assert results[1]["physical_time"] < results[0]["physical_time"]
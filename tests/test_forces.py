@@ -0,0 +1,41 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Проверки способов вычисления сил."""
+
+import numpy as np
+
+import solar_input
+import solar_model as model
+
+
+def _forces(scenario, engine):
+    space_objects = solar_input.read_space_objects_data_from_file(scenario("solar_system.txt"))
+    model.force_engines[engine](space_objects)
+    return np.array([[body.Fx, body.Fy] for body in space_objects])
+
+
+def test_numpy_engine_matches_direct(scenario):
+    """Векторный проход даёт те же силы, что и попарный перебор, с точностью до ошибок округления."""
+    direct = _forces(scenario, "direct")
+    numpy = _forces(scenario, "numpy")
+    scale = np.hypot(direct[:, 0], direct[:, 1])[:, np.newaxis]
+    assert np.all(np.abs(numpy - direct) <= 1E-12 * scale)
+
+
+def test_row_blocks_do_not_change_result(scenario, monkeypatch):
+    """Разбиение на блоки строк ограничивает память, но не меняет результат."""
+    expected = _forces(scenario, "numpy")
+    monkeypatch.setattr(model, "block_elements", 7)
+    np.testing.assert_array_equal(_forces(scenario, "numpy"), expected)
+
+
+def test_softening_keeps_coincident_bodies_finite():
+    x = np.array([0.0, 0.0, 1E3])
+    y = np.zeros(3)
+    m = np.full(3, 1E20)
+    ax, ay = model.calculate_accelerations(x, y, m, softening=10.0)
+    assert np.all(np.isfinite(ax)) and np.all(np.isfinite(ay))
+    assert ax[0] == ax[1] > 0
+    plain, _ = model.calculate_accelerations(x[1:], y[1:], m[1:], softening=0.0)
+    assert 0 > ax[2] > 2 * plain[1]  # сглаживание ослабляет притяжение двух тел на малых расстояниях
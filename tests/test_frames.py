@@ -0,0 +1,28 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Проверки планировщика кадров графического интерфейса."""
+
+import pytest
+
+pytest.importorskip("tkinter")
+
+import solar_main
+
+
+def test_steps_ramp_up_to_slider_value():
+    scheduler = solar_main.FrameScheduler()
+    granted = [scheduler.steps_for_frame(40, 0) for _ in range(30)]
+    assert granted[0] < 40 and granted[-1] == 40
+    assert granted == sorted(granted)
+    assert scheduler.overruns == 0
+
+
+def test_overrun_shrinks_grant_to_finished_steps():
+    """Если поток расчёта не успел выполнить выданные шаги, на следующий кадр выдаётся столько, сколько он успел."""
+    scheduler = solar_main.FrameScheduler()
+    while scheduler.steps_for_frame(40, 0) < 40:
+        pass
+    assert scheduler.steps_for_frame(40, 30) == 10
+    assert scheduler.overruns == 1
+    assert scheduler.steps_for_frame(40, 0) > 10
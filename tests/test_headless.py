@@ -0,0 +1,57 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Проверки расчёта без графического интерфейса."""
+
+import subprocess
+import sys
+
+import pytest
+
+import solar_headless
+
+
+def _run(*argv):
+    return solar_headless.run(solar_headless.parse_arguments(list(argv)))
+
+
+def test_run_stops_at_requested_time(scenario):
+    summary = _run(scenario("one_satellite.txt"), "--dt", "600", "--until", "6000", "--engine", "numpy",
+                   "--integrator", "leapfrog")
+    assert summary["steps"] == 10
+    assert summary["physical_time"] == 6000.0
+    assert summary["force_evaluations"] == 11  # leapfrog переиспользует силы с конца предыдущего шага
+
+
+def test_does_not_import_gui_modules(scenario, tmp_path):
+    """Расчёт без графического интерфейса работает там, где нет tkinter и дисплея."""
+    code = ("import sys, solar_headless; solar_headless.main(%r); "
+            "assert 'tkinter' not in sys.modules and 'matplotlib' not in sys.modules"
+            % [scenario("one_satellite.txt"), "--dt", "600", "--steps", "10", "--output", str(tmp_path / "out.txt")])
+    subprocess.run([sys.executable, "-c", code], cwd=scenario(""), check=True, stdout=subprocess.DEVNULL)
+
+
+def test_resume_reports_checkpoint_time_step(scenario, tmp_path):
+    """После --resume в сводке шаг из контрольной точки, а не значение --dt по умолчанию."""
+    checkpoint = str(tmp_path / "run.ckpt")
+    _run(scenario("one_satellite.txt"), "--dt", "500", "--steps", "10", "--integrator", "leapfrog",
+         "--checkpoint", checkpoint)
+    summary = _run("--resume", checkpoint, "--steps", "20")
+    assert summary["dt"] == 500.0
+    assert summary["total_steps"] == 20
+
+
+def test_resume_applies_monitor_and_collisions(scenario, tmp_path, capsys):
+    checkpoint = str(tmp_path / "run.ckpt")
+    _run(scenario("one_satellite.txt"), "--dt", "500", "--steps", "10", "--checkpoint", checkpoint)
+    summary = _run("--resume", checkpoint, "--steps", "20", "--monitor-every", "5",
+                   "--collisions", "flag", "--collision-radius", "1")
+    assert summary["conservation"] is not None
+    assert summary["collisions"] is not None
+    assert "--monitor-every" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("option", [["--engine", "numpy"], ["--integrator", "leapfrog"]])
+def test_resume_rejects_engine_and_integrator(tmp_path, option):
+    with pytest.raises(SystemExit):
+        solar_headless.parse_arguments(["--resume", str(tmp_path / "run.ckpt"), "--steps", "1"] + option)
@@ -0,0 +1,54 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Проверки чтения и записи файлов системы тел."""
+
+import numpy as np
+
+import solar_input
+
+fields = ("m", "x", "y", "Vx", "Vy", "R")
+
+
+def _assert_same(result, expected):
+    assert len(result) == len(expected)
+    for name in fields:
+        np.testing.assert_array_equal(getattr(result, name), getattr(expected, name))
+    assert [body.type for body in result] == [body.type for body in expected]
+    assert [body.color for body in result] == [body.color for body in expected]
+
+
+def test_text_round_trip_is_exact(scenario, tmp_path):
+    """Записанный текстовый файл читается обратно без потери точности."""
+    system = solar_input.read_space_objects_data_from_file(scenario("solar_system.txt"))
+    system.x[:] += np.linspace(0.1, 0.7, len(system)) / 3  # числа, не представимые коротко
+    path = str(tmp_path / "saved.txt")
+    solar_input.write_space_objects_data_to_file(path, system, 12345.678)
+    _assert_same(solar_input.read_space_objects_data_from_file(path), system)
+
+
+def test_physical_time_is_read_back(scenario, tmp_path):
+    system = solar_input.read_space_objects_data_from_file(scenario("solar_system.txt"))
+    path = str(tmp_path / "saved.txt")
+    solar_input.write_space_objects_data_to_file(path, system, 12345.678)
+    assert solar_input.read_physical_time_from_file(path) == 12345.678
+
+
+def test_binary_round_trip_is_exact(scenario, tmp_path):
+    system = solar_input.read_space_objects_data_from_file(scenario("solar_system.txt"))
+    path = str(tmp_path / "saved.npy")
+    solar_input.write_space_objects_binary(path, system)
+    _assert_same(solar_input.read_space_objects_data_from_file(path), system)
+    _assert_same(solar_input.read_space_objects_binary(path, mmap=False), system)
+
+
+def test_indented_comments_are_skipped(tmp_path):
+    path = tmp_path / "commented.txt"
+    path.write_text("# система из двух тел\n"
+                    "    # комментарий с отступом\n"
+                    "Star 30 red 1.98892E30 0 0 0 0\n"
+                    "\t#Planet 5 blue 1 2 3 4 5\n"
+                    "Planet 5 green 5.974E24 149.60E9 0 0 29.76E3\n")
+    system = solar_input.read_space_objects_data_from_file(str(path))
+    assert [body.type for body in system] == ["star", "planet"]
+    assert solar_input.read_physical_time_from_file(str(path)) == 0.0
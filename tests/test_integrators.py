@@ -0,0 +1,57 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Проверки интеграторов уравнений движения."""
+
+import numpy as np
+import pytest
+
+import solar_input
+import solar_model as model
+from solar_objects import SpaceObjects
+
+
+def _relative_position(scenario, integrator, dt, duration):
+    store = solar_input.read_space_objects_data_from_file(scenario("one_oval_satellite.txt"))
+    state = model.IntegratorState()
+    for step in range(int(round(duration / dt))):
+        model.recalculate_space_objects_positions(store, dt, step * dt, "numpy", integrator, state)
+    return np.array([store.x[1] - store.x[0], store.y[1] - store.y[0]]), state
+
+
+@pytest.mark.parametrize("integrator, order", [("leapfrog", 2), ("yoshida4", 4)])
+def test_convergence_order(scenario, monkeypatch, integrator, order):
+    """При уменьшении шага вдвое ошибка уменьшается в 2 ** order раз."""
+    monkeypatch.setattr(model, "rk45_tolerance", 1E-13)
+    reference, _ = _relative_position(scenario, "rk45", 86400.0, 30 * 86400.0)
+    errors = [np.hypot(*(_relative_position(scenario, integrator, dt, 30 * 86400.0)[0] - reference))
+              for dt in (21600.0, 10800.0)]
+    assert errors[0] / errors[1] == pytest.approx(2 ** order, rel=0.05)
+
+
+def test_rk45_error_follows_tolerance(scenario, monkeypatch):
+    """Ошибка адаптивного интегратора следует допуску, а число вычислений сил растёт с точностью."""
+    monkeypatch.setattr(model, "rk45_tolerance", 1E-13)
+    reference, _ = _relative_position(scenario, "rk45", 30 * 86400.0, 360 * 86400.0)
+    evaluations = []
+    for tolerance in (1E-7, 1E-9):
+        monkeypatch.setattr(model, "rk45_tolerance", tolerance)
+        position, state = _relative_position(scenario, "rk45", 30 * 86400.0, 360 * 86400.0)
+        assert np.hypot(*(position - reference)) < 1E3 * tolerance * np.hypot(*reference)
+        evaluations.append(state.force_evaluations)
+    assert evaluations[0] < evaluations[1]
+
+
+def test_rk45_finishes_interval_without_ulp_steps():
+    """Интервал, который после сложения шагов недобран на несколько ULP, не кончается ошибкой
+    «step size underflow», а подобранный шаг не сокращается из-за последнего укороченного шага."""
+    rng = np.random.default_rng(0)
+    for _ in range(400):
+        store = SpaceObjects()
+        store.append_columns(["star", "planet"], ["red", "blue"], m=np.array([1.0, 1.0]),
+                             x=np.array([0.0, 1E6]), Vy=np.array([0.0, 1E-3]))
+        dt = float(rng.uniform(1, 1E4))
+        state = model.IntegratorState()
+        state.h = dt * rng.uniform(1 / 6, 1 / 2)
+        model.integrate_rk45(store, dt, "numpy", state)
+        assert state.h >= dt
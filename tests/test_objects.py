@@ -0,0 +1,52 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Проверки хранилища тел и исходной схемы расчёта над ним."""
+
+import solar_input
+import solar_model as model
+from solar_objects import Planet, SpaceObjects
+
+
+def _bodies(store):
+    """Копирует тела хранилища в отдельные объекты, как до появления хранилища."""
+    bodies = []
+    for view in store:
+        body = Planet()
+        for name in SpaceObjects.numeric_fields:
+            setattr(body, name, getattr(view, name))
+        bodies.append(body)
+    return bodies
+
+
+def test_views_read_and_write_store(scenario):
+    store = solar_input.read_space_objects_data_from_file(scenario("solar_system.txt"))
+    body = store[3]
+    body.x = 1.5
+    body.Vy += 2.0
+    assert store.x[3] == 1.5 and body.x == 1.5
+    assert store.Vy[3] == body.Vy
+
+
+def test_direct_engine_matches_per_body_forces(scenario):
+    """Прямое суммирование над хранилищем даёт те же биты, что calculate_force для отдельных тел."""
+    store = solar_input.read_space_objects_data_from_file(scenario("solar_system.txt"))
+    bodies = _bodies(store)
+    for body in bodies:
+        model.calculate_force(body, bodies)
+    model.calculate_forces_direct(store)
+    assert store.Fx.tolist() == [body.Fx for body in bodies]
+    assert store.Fy.tolist() == [body.Fy for body in bodies]
+
+
+def test_euler_substeps_do_not_depend_on_system_size(scenario, monkeypatch):
+    """1000 малых шагов над числами Python и над массивами дают одинаковые биты."""
+    results = []
+    for limit in (0, 1000):
+        monkeypatch.setattr(model, "scalar_bodies", limit)
+        store = solar_input.read_space_objects_data_from_file(scenario("solar_system.txt"))
+        simulation = model.Simulation(store, 3600.0)
+        for _ in range(3):
+            simulation.step()
+        results.append([getattr(store, name).tolist() for name in ("x", "y", "Vx", "Vy")])
+    assert results[0] == results[1]
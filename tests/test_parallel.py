@@ -0,0 +1,43 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Проверки вычисления сил пулом процессов."""
+
+import numpy as np
+import pytest
+
+import solar_model as model
+import solar_parallel
+
+
+@pytest.fixture
+def pool():
+    pool = solar_parallel.TiledForcePool(processes=2, capacity=2048)
+    yield pool
+    pool.close()
+
+
+def _system(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.uniform(-1E12, 1E12, n), rng.uniform(-1E12, 1E12, n), rng.uniform(1E20, 1E24, n)
+
+
+def test_pool_matches_numpy_engine_bit_for_bit(pool):
+    """Результат не зависит от числа процессов и совпадает с движком "numpy" до последнего бита."""
+    x, y, m = _system(1500)
+    expected = model.calculate_accelerations(x, y, m, potential=True)
+    for _ in range(2):
+        result = pool.accelerations(x, y, m, potential=True)
+        for values, reference in zip(result, expected):
+            np.testing.assert_array_equal(values, reference)
+
+
+def test_pool_computes_selected_targets(pool):
+    x, y, m = _system(1000, seed=1)
+    targets = np.arange(3, 1000, 3)
+    ax, ay = pool.accelerations(x, y, m, targets=targets)
+    expected = model.calculate_accelerations(x, y, m, targets=targets)
+    np.testing.assert_array_equal(ax, expected[0])
+    np.testing.assert_array_equal(ay, expected[1])
+    with pytest.raises(ValueError):
+        pool.accelerations(*_system(3000))
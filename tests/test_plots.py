@@ -0,0 +1,41 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Проверки построения графиков."""
+
+import os
+
+import numpy as np
+import pytest
+
+import solar_input
+import solar_model as model
+import solar_plots
+import solar_stats
+
+
+def test_decimation_keeps_peaks():
+    """Прореживание сокращает ряд до нескольких точек на пиксел, но не теряет ни одного пика."""
+    rng = np.random.default_rng(0)
+    x = np.arange(100000.0)
+    y = np.cumsum(rng.normal(size=len(x)))
+    y[[123, 54321, 99998]] = [1E6, -1E6, 5E5]
+    dx, dy = solar_plots.decimate(x, y, 800)
+    assert len(dx) <= 6 * 800
+    assert np.all(np.diff(dx) > 0)
+    assert dx[0] == x[0] and dx[-1] == x[-1]
+    assert {123.0, 54321.0, 99998.0} <= set(dx.tolist())
+    assert dy.max() == y.max() and dy.min() == y.min()
+
+
+def test_plots_are_written_for_every_body(scenario, tmp_path):
+    pytest.importorskip("matplotlib")
+    space_objects = solar_input.read_space_objects_data_from_file(scenario("one_oval_satellite.txt"))
+    simulation = model.Simulation(space_objects, 3600.0, "numpy", "leapfrog")
+    stats = solar_stats.SystemStatistics(simulation.space_objects)
+    for _ in range(50):
+        simulation.step()
+        stats.update(simulation.space_objects, simulation.physical_time)
+    paths = solar_plots.export_plots(stats, str(tmp_path), jobs=1, width=200, height=150)
+    assert len(paths) == len(solar_plots.plots)
+    assert all(os.path.getsize(path) > 0 for path in paths)
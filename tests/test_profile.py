@@ -0,0 +1,56 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Проверки замеров времени участков."""
+
+import json
+
+import pytest
+
+import solar_input
+import solar_model as model
+import solar_profile
+
+
+@pytest.fixture
+def profiler(monkeypatch):
+    """Отдельный включённый накопитель замеров, не задевающий общий."""
+    profiler = solar_profile.Profiler()
+    monkeypatch.setattr(solar_profile, "profiler", profiler)
+    monkeypatch.setattr(solar_profile, "enabled", True)
+    return profiler
+
+
+def test_disabled_timer_records_nothing(monkeypatch):
+    monkeypatch.setattr(solar_profile, "profiler", solar_profile.Profiler())
+    monkeypatch.setattr(solar_profile, "enabled", False)
+    with solar_profile.timer("force"):
+        pass
+    assert solar_profile.profiler.summary() == {}
+
+
+def test_percentiles_follow_recent_window(profiler, monkeypatch):
+    """Процентили считаются по последним window замерам, а количество и сумма — по всем."""
+    monkeypatch.setattr(solar_profile, "window", 4)
+    for duration in (10.0, 10.0, 10.0, 1.0, 2.0, 3.0, 4.0):
+        profiler.add("step", 0.0, duration)
+    row = profiler.summary()["step"]
+    assert row["count"] == 7 and row["total"] == 40.0 and row["last"] == 4.0
+    assert row["p50"] == 2.5
+
+
+def test_simulation_sections_are_traced(scenario, profiler, tmp_path):
+    space_objects = solar_input.read_space_objects_data_from_file(scenario("solar_system.txt"))
+    simulation = model.Simulation(space_objects, 3600.0, "numpy", "leapfrog")
+    for _ in range(5):
+        simulation.step()
+    summary = profiler.summary()
+    assert summary["integrate"]["count"] == 5
+    assert summary["force"]["count"] >= 5
+    path = str(tmp_path / "trace.json")
+    profiler.write_trace(path)
+    with open(path) as trace_file:
+        events = json.load(trace_file)["traceEvents"]
+    assert {event["name"] for event in events} >= {"integrate", "force"}
+    assert all(event["ph"] == "X" and event["dur"] >= 0 for event in events)
+    assert len(solar_profile.overlay_lines(summary)) == len(summary)
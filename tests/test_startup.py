@@ -0,0 +1,24 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Проверки холодного запуска: модули, нужные не всегда, загружаются при первом использовании."""
+
+import pytest
+
+import solar_bench
+
+deferred = ("tkinter.filedialog", "solar_checkpoint", "solar_collisions", "solar_tree", "solar_parallel",
+            "matplotlib")
+
+
+def test_gui_module_defers_optional_imports():
+    pytest.importorskip("tkinter")
+    code = ("import sys, solar_main; loaded = [name for name in %r if name in sys.modules]; "
+            "sys.exit('loaded: %%s' %% loaded if loaded else None)" % (deferred,))
+    result = solar_bench.bench_startup(code, repeats=1)
+    assert "skipped" not in result, result["skipped"]
+
+
+def test_failed_startup_is_skipped():
+    result = solar_bench.bench_startup("import solar_missing_module", repeats=3)
+    assert "solar_missing_module" in result["skipped"]
@@ -0,0 +1,76 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Проверки статистики движения и рядов для графиков."""
+
+import numpy as np
+import pytest
+
+import solar_plots
+import solar_stats
+from solar_objects import Planet, SpaceObjects, Star
+
+
+def _orbit(samples=5000, period=700.0, eccentricity=0.6):
+    """Возвращает хранилище из звезды и планеты и функцию, ставящую планету в точку орбиты в момент t.
+    Скорость и расстояние на эллипсе однозначно связаны интегралом энергии v² = 2 / r - 1."""
+    store = SpaceObjects([Star(), Planet()])
+    store.m[:] = [1.0, 1E-6]
+
+    def place(t):
+        mean_anomaly = 2 * np.pi * t / period
+        anomaly = mean_anomaly
+        for _ in range(50):
+            anomaly = mean_anomaly + eccentricity * np.sin(anomaly)
+        store.x[1] = np.cos(anomaly) - eccentricity
+        store.y[1] = np.sqrt(1 - eccentricity ** 2) * np.sin(anomaly)
+        r = 1 - eccentricity * np.cos(anomaly)
+        store.Vx[1] = -np.sin(anomaly) / r
+        store.Vy[1] = np.sqrt(1 - eccentricity ** 2) * np.cos(anomaly) / r
+
+    return store, place, samples
+
+
+def test_statistics_stay_bounded_and_keep_extremes():
+    """Память под статистику не растёт с числом отсчётов, а перигелий, афелий и период не теряются."""
+    store, place, samples = _orbit()
+    stats = solar_stats.SystemStatistics(store, recent=16, history=64)
+    speeds = []
+    for t in range(samples):
+        place(t)
+        stats.update(store, float(t))
+        speeds.append(np.hypot(store.Vx[1], store.Vy[1]))
+    t, values = stats.speed_recent.arrays()
+    np.testing.assert_array_equal(t, np.arange(samples - 16, samples))
+    t, low, high = stats.distance_history.arrays()
+    assert len(t) <= 64 and t[0] == 0
+    assert low[1].min() == stats.perihelion[1] == 0.4
+    assert high[1].max() == stats.aphelion[1] == 1.6
+    assert stats.period[1] == 700.0
+    assert stats.mean_speed[1] == pytest.approx(np.mean(speeds), rel=1E-12)
+
+
+def test_phase_plot_pairs_survive_decimation():
+    """После многократного прореживания каждая точка графика скорость — расстояние взята из одного отсчёта."""
+    store, place, samples = _orbit()
+    stats = solar_stats.SystemStatistics(store, recent=16, history=64)
+    for t in range(samples):
+        place(t)
+        stats.update(store, float(t))
+    assert stats.distance_history.stride > 1
+
+    ids, t, speed, distance, paired_speed = solar_plots.statistics_series(stats)
+    np.testing.assert_allclose(paired_speed[1] ** 2, 2 / distance[1] - 1, rtol=1E-9)
+    # независимые минимумы и максимумы скорости и расстояния таким парам не соответствуют
+    assert not np.allclose(speed[1] ** 2, 2 / distance[1] - 1, rtol=1E-3)
+
+
+def test_paired_values_follow_missing_samples():
+    """Отсутствующие значения (NaN) не становятся экстремумами и не сбивают парные значения."""
+    series = solar_stats.DecimatedSeries(1, capacity=2, paired=True)
+    for value, paired in ((np.nan, np.nan), (3.0, 30.0), (1.0, 10.0), (2.0, 20.0), (np.nan, np.nan)):
+        series.append(0.0, [value], [paired])
+    t, low, high = series.arrays()
+    low_paired, high_paired = series.paired_arrays()
+    np.testing.assert_array_equal(low * 10, low_paired)
+    np.testing.assert_array_equal(high * 10, high_paired)
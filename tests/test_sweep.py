@@ -0,0 +1,61 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Проверки прогона сетки вариантов и кэша результатов."""
+
+import argparse
+
+import numpy as np
+import pytest
+
+import solar_model as model
+import solar_sweep
+
+
+settings = {"steps": 20, "until": None, "body": 1, "monitor_every": 10}
+
+
+def _points(scenario):
+    return [{"scenario": scenario("one_satellite.txt"), "dt": 3600.0, "engine": "numpy", "integrator": integrator}
+            for integrator in ("leapfrog", "yoshida4")]
+
+
+def test_grid_covers_all_variations():
+    name, factors = solar_sweep.parse_variation("Vy[1]=0.95,1,1.05")
+    assert (name, factors) == ("Vy[1]", [0.95, 1.0, 1.05])
+    grid = solar_sweep.parameter_grid({"dt": [1.0, 2.0], name: factors})
+    assert len(grid) == 6
+    assert grid[1] == {"dt": 1.0, "Vy[1]": 1.0}
+    with pytest.raises(argparse.ArgumentTypeError):
+        solar_sweep.parse_variation("Q[1]=2")
+
+
+def test_pool_gives_same_results_as_serial_run(scenario):
+    """Точки, посчитанные в процессах пула, совпадают с посчитанными подряд в одном процессе."""
+    serial = solar_sweep.sweep(_points(scenario), settings, jobs=1)
+    pooled = solar_sweep.sweep(_points(scenario), settings, jobs=2)
+    for row in serial + pooled:
+        del row["wall_time"]
+    np.testing.assert_equal(pooled, serial)
+
+
+def test_repeated_sweep_is_served_from_cache(scenario, tmp_path):
+    cache = solar_sweep.ResultCache(str(tmp_path))
+    first = solar_sweep.sweep(_points(scenario), settings, cache, jobs=1)
+    second = solar_sweep.sweep(_points(scenario), settings, cache, jobs=1)
+    assert [row["cached"] for row in first] == [False, False]
+    assert [row["cached"] for row in second] == [True, True]
+    assert [row["aphelion"] for row in second] == [row["aphelion"] for row in first]
+
+
+def test_engine_version_invalidates_cache(scenario, tmp_path, monkeypatch):
+    """Результаты, посчитанные другой версией движка, из кэша не берутся."""
+    point = _points(scenario)[0]
+    digest = solar_sweep.scenario_digest(point["scenario"])
+    key = solar_sweep.point_key(point, settings, digest)
+    cache = solar_sweep.ResultCache(str(tmp_path))
+    solar_sweep.sweep([point], settings, cache, jobs=1)
+
+    monkeypatch.setattr(model, "engine_version", model.engine_version + 1)
+    assert solar_sweep.point_key(point, settings, digest) != key
+    assert solar_sweep.sweep([point], settings, cache, jobs=1)[0]["cached"] is False
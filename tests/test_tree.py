@@ -0,0 +1,42 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Проверки метода Барнса — Хата."""
+
+import numpy as np
+
+import solar_model as model
+import solar_tree
+
+
+def test_zero_opening_angle_matches_direct_sum():
+    """При θ = 0 ни один узел не заменяется точечной массой, и результат совпадает с прямым суммированием."""
+    x, y, m = solar_tree.random_disc(600, seed=3)
+    ax, ay = model.calculate_accelerations(x, y, m)
+    tx, ty = solar_tree.tree_accelerations(x, y, m, theta=0)
+    error = np.hypot(tx - ax, ty - ay) / np.hypot(ax, ay)
+    assert error.max() < 1E-12
+
+
+def test_error_grows_with_opening_angle():
+    x, y, m = solar_tree.random_disc(2000, seed=1)
+    report = solar_tree.accuracy_report(x, y, m, thetas=(0.3, 0.5, 1.0))
+    errors = [row["median_error"] for row in report]
+    assert errors == sorted(errors)
+    assert errors[1] < 1E-5
+
+
+def test_every_body_is_reached_once():
+    """Листья, достижимые из корня, покрывают каждое тело ровно один раз."""
+    x, y, m = solar_tree.random_disc(3000)
+    tree = solar_tree.QuadTree(x, y, m)
+    covered = np.zeros(len(x), dtype=int)
+    stack = [0]
+    while stack:
+        node = stack.pop()
+        if tree.leaf[node]:
+            covered[tree.start[node]:tree.end[node]] += 1
+        else:
+            first = tree.child_first[node]
+            stack.extend(range(first, first + tree.child_count[node]))
+    assert np.all(covered == 1)
@@ -0,0 +1,62 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Проверки отрисовки тел на холсте."""
+
+import solar_input
+import solar_vis as vis
+
+
+class _Tcl:
+    def __init__(self):
+        self.commands = []
+
+    def eval(self, script):
+        self.commands.extend(script.split("\n"))
+
+
+class _Canvas:
+    """Холст, запоминающий команды вместо рисования."""
+
+    _w = ".space"
+
+    def __init__(self):
+        self.tk = _Tcl()
+        self.items = 0
+
+    def _create(self, *args, **options):
+        self.items += 1
+        return self.items
+
+    create_oval = create_rectangle = _create
+
+
+def _renderer(scenario):
+    store = solar_input.read_space_objects_data_from_file(scenario("one_satellite.txt"))
+    canvas = _Canvas()
+    max_distance = max(max(abs(body.x), abs(body.y)) for body in store)
+    renderer = vis.CanvasRenderer(canvas, vis.calculate_scale_factor(max_distance))
+    renderer.create_images(store)
+    return store, canvas, renderer
+
+
+def test_unmoved_bodies_are_not_redrawn(scenario):
+    store, canvas, renderer = _renderer(scenario)
+    renderer.render(store.x, store.y)
+    assert canvas.tk.commands == [] and renderer.last_updated == 0
+    store.x[1] *= 1.5
+    renderer.render(store.x, store.y)
+    assert len(canvas.tk.commands) == 1
+    assert canvas.tk.commands[0].startswith(".space coords %d " % store[1].image)
+
+
+def test_off_screen_bodies_are_hidden_and_shown_again(scenario):
+    """Ушедшее за край окна тело прячется, а не переносится; вернувшееся показывается на прежнем месте."""
+    store, canvas, renderer = _renderer(scenario)
+    x = store.x.copy()
+    x[1] = 1E3 * x[1]
+    renderer.render(x, store.y)
+    assert canvas.tk.commands == [".space itemconfigure %d -state hidden" % store[1].image]
+    canvas.tk.commands = []
+    renderer.render(store.x, store.y)
+    assert canvas.tk.commands == [".space itemconfigure %d -state normal" % store[1].image]
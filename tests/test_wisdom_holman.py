@@ -0,0 +1,63 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Проверки схемы Уиздома — Холмана."""
+
+import numpy as np
+import pytest
+
+import solar_input
+import solar_model as model
+
+
+def _kepler_position(store, t):
+    """Положение второго тела относительно первого через время **t** по решению задачи двух тел
+    в кеплеровых элементах (независимо от kepler_drift)."""
+    mu = model.gravitational_constant * store.m.sum()
+    rx, ry = store.x[1] - store.x[0], store.y[1] - store.y[0]
+    wx, wy = store.Vx[1] - store.Vx[0], store.Vy[1] - store.Vy[0]
+    r = np.hypot(rx, ry)
+    a = 1 / (2 / r - (wx * wx + wy * wy) / mu)
+    h = rx * wy - ry * wx
+    ex, ey = wy * h / mu - rx / r, -wx * h / mu - ry / r
+    e = np.hypot(ex, ey)
+    px, py = ex / e, ey / e
+    anomaly0 = np.arctan2((rx * wx + ry * wy) / (e * np.sqrt(mu * a)), (1 - r / a) / e)
+    mean_anomaly = anomaly0 - e * np.sin(anomaly0) + np.sqrt(mu / a ** 3) * t
+    anomaly = mean_anomaly
+    for _ in range(100):
+        anomaly -= (anomaly - e * np.sin(anomaly) - mean_anomaly) / (1 - e * np.cos(anomaly))
+    along, across = a * (np.cos(anomaly) - e), a * np.sqrt(1 - e * e) * np.sin(anomaly)
+    return along * px - across * py, along * py + across * px
+
+
+def _distance_to_kepler(scenario, steps=360, dt=86400.0):
+    store = solar_input.read_space_objects_data_from_file(scenario("one_satellite.txt"))
+    expected = _kepler_position(store, steps * dt)
+    simulation = model.Simulation(store, dt, integrator="wisdom_holman")
+    for _ in range(steps):
+        simulation.step()
+    result = simulation.space_objects
+    return np.hypot(result.x[1] - result.x[0] - expected[0], result.y[1] - result.y[0] - expected[1])
+
+
+def test_two_body_orbit_is_nearly_exact(scenario):
+    """Задача двух тел решается почти точно даже с шагом в сутки: за год ошибка порядка метра."""
+    assert _distance_to_kepler(scenario) < 5.0
+
+
+def test_kepler_fallback_halves_time(scenario, monkeypatch):
+    """Если метод Ньютона не сходится, перенос делится пополам, а без такой возможности — ошибка."""
+    expected = _distance_to_kepler(scenario, steps=30)
+    monkeypatch.setattr(model, "kepler_iterations", 2)
+    assert _distance_to_kepler(scenario, steps=30) == pytest.approx(expected, abs=1E-2)
+    monkeypatch.setattr(model, "kepler_halvings", 0)
+    with pytest.raises(ArithmeticError):
+        _distance_to_kepler(scenario, steps=1)
+
+
+def test_refuses_system_without_dominant_body(scenario):
+    space_objects = solar_input.read_space_objects_data_from_file(scenario("double_star.txt"))
+    simulation = model.Simulation(space_objects, 3600.0, integrator="wisdom_holman")
+    with pytest.raises(ValueError):
+        simulation.step()
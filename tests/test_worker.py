@@ -0,0 +1,68 @@
+# coding: utf-8
+# license: GPLv3
+
+"""Проверки потока расчёта."""
+
+import time
+
+import solar_input
+import solar_model as model
+import solar_worker
+
+
+def _wait(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_snapshot_matches_paused_simulation(scenario):
+    """После паузы последний снимок совпадает с состоянием модели, а читатель получает копию."""
+    space_objects = solar_input.read_space_objects_data_from_file(scenario("one_satellite.txt"))
+    simulation = model.Simulation(space_objects, 600.0, "numpy", "leapfrog")
+    buffer = solar_worker.SnapshotBuffer()
+    worker = solar_worker.SimulationWorker(simulation, buffer)
+    first = buffer.latest()
+    worker.resume()
+    _wait(lambda: worker.steps >= 5)
+    worker.pause()
+    snapshot = buffer.latest()
+    worker.stop()
+    assert snapshot.steps == worker.steps >= 5
+    assert snapshot.version > first.version
+    assert snapshot.physical_time == simulation.physical_time
+    assert snapshot.x.tolist() == simulation.space_objects.x.tolist()
+    snapshot.x[:] = 0
+    assert buffer.latest().x.tolist() == simulation.space_objects.x.tolist()
+
+
+def test_worker_stops_at_granted_steps(scenario):
+    space_objects = solar_input.read_space_objects_data_from_file(scenario("one_satellite.txt"))
+    worker = solar_worker.SimulationWorker(model.Simulation(space_objects, 600.0), solar_worker.SnapshotBuffer())
+    worker.grant(7)
+    worker.resume()
+    _wait(lambda: worker.pending == 0)
+    time.sleep(0.05)
+    assert worker.steps == 7
+    worker.grant(2)
+    _wait(lambda: worker.pending == 0)
+    worker.stop()
+    assert worker.steps == 9
+
+
+def test_step_error_is_kept_and_worker_survives(scenario):
+    """Ошибка шага сохраняется в error, расчёт приостанавливается, а поток можно продолжить после исправления."""
+    space_objects = solar_input.read_space_objects_data_from_file(scenario("double_star.txt"))
+    simulation = model.Simulation(space_objects, 3600.0, integrator="wisdom_holman")
+    worker = solar_worker.SimulationWorker(simulation, solar_worker.SnapshotBuffer())
+    worker.grant(3)
+    worker.resume()
+    _wait(lambda: worker.error is not None)
+    assert isinstance(worker.error, ValueError)
+    assert worker.steps == 0 and worker.is_alive()
+
+    simulation.integrator = "leapfrog"
+    worker.resume()
+    _wait(lambda: worker.steps >= 3)
+    worker.stop()
+    assert worker.error is None and worker.steps == 3